@@ -0,0 +1,106 @@
+"""
+Async read endpoints for the ASGI deployment.
+
+These mirror the property list (including ?q= search), detail and facets
+endpoints of PropertyViewSet but run as native coroutines, so a request
+waiting on the database does not hold a worker thread. Responses are
+the same JSON as the DRF views, including ?fields=/?expand= and the
+compact encodings selected with ?format=.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .encoding import COLUMNAR_MEDIA_TYPE, MSGPACK_MEDIA_TYPE, columnar, msgpack, pack
+from .conditional import acollection_validators, add_validators, not_modified, object_validators
+from .facets import facet_querysets, format_facets, merge_facet_rows
+from .filters import filter_properties
+from .models import Property
+from .pagination import PropertyCursorPagination
+from .serializers import aserialize_properties, parse_fieldset
+
+
+def json_response(data, status=200):
+    # Same encoder and compact separators as DRF's JSONRenderer
+    return JsonResponse(
+        data, status=status, safe=False, encoder=JSONEncoder,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+
+
+def exception_response(exc):
+    """The response DRF's exception handler gives an APIException"""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(data, status=exc.status_code)
+
+
+def encoded_response(request, data):
+    """JSON, or the compact encoding named by ?format=columnar|msgpack"""
+    encoding = request.GET.get('format')
+    if encoding == 'columnar':
+        response = json_response(columnar(data))
+        response['Content-Type'] = COLUMNAR_MEDIA_TYPE
+        return response
+    if encoding == 'msgpack' and msgpack is not None:
+        return HttpResponse(pack(data), content_type=MSGPACK_MEDIA_TYPE)
+    if encoding not in (None, 'json'):
+        return json_response({'detail': f'Unsupported format: {encoding}.'}, status=404)
+    return json_response(data)
+
+
+def lean_properties():
+    return Property.objects.only('id', 'price', 'created_at', 'updated_at')
+
+
+async def property_list(request):
+    try:
+        fieldset = parse_fieldset(request.GET)
+        queryset = filter_properties(lean_properties(), request.GET)
+    except APIException as exc:
+        return exception_response(exc)
+    etag, last_modified = await acollection_validators(request, queryset)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    paginator = PropertyCursorPagination()
+    # The cursor paginator evaluates one LIMIT query; run it off the event loop
+    try:
+        page = await sync_to_async(paginator.paginate_queryset)(queryset, Request(request))
+    except APIException as exc:
+        # e.g. NotFound for a malformed ?cursor=
+        return exception_response(exc)
+    results = await aserialize_properties(page, fieldset)
+    response = encoded_response(request, {
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
+        'results': results,
+    })
+    return add_validators(response, etag, last_modified)
+
+
+async def property_detail(request, pk):
+    try:
+        fieldset = parse_fieldset(request.GET)
+    except APIException as exc:
+        return exception_response(exc)
+    try:
+        property_obj = await Property.objects.only('id', 'updated_at').aget(pk=pk)
+    except Property.DoesNotExist:
+        return json_response({'detail': 'No Property matches the given query.'}, status=404)
+    etag, last_modified = object_validators(property_obj, request)
+    response = not_modified(request, etag, last_modified)
+    if response is not None:
+        return response
+    results = await aserialize_properties([property_obj], fieldset)
+    return add_validators(encoded_response(request, results[0]), etag, last_modified)
+
+
+async def property_facets(request):
+    try:
+        querysets = facet_querysets(request.GET)
+    except APIException as exc:
+        return exception_response(exc)
+    parts = [[[row async for row in queryset] for queryset in part] for part in querysets]
+    return json_response(format_facets(*merge_facet_rows(parts)))
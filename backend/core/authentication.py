@@ -0,0 +1,133 @@
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils import timezone
+from rest_framework import authentication, exceptions
+
+from .models import AuthToken
+
+TOKEN_SALT = 'core.authentication'
+KEYWORD = 'Bearer'
+
+
+def token_settings():
+    config = getattr(settings, 'AUTH_TOKEN', {})
+    return {
+        'TTL': config.get('TTL', 7 * 24 * 3600),
+        'CACHE_ALIAS': config.get('CACHE_ALIAS', 'default'),
+        'CACHE_TIMEOUT': config.get('CACHE_TIMEOUT', 300),
+    }
+
+
+def token_cache_key(key):
+    return f'auth:token:{key}'
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def issue_token(user):
+    """
+    Records a new token for `user` and returns (signed token, expiry).
+
+    The signed value carries the user id, the token key and the issue time,
+    so expiry and tampering are rejected with one HMAC check and no lookup.
+    """
+    config = token_settings()
+    key = secrets.token_hex(16)
+    expires_at = timezone.now() + timedelta(seconds=config['TTL'])
+    AuthToken.objects.create(key=key, user=user, expires_at=expires_at)
+    token = signing.TimestampSigner(salt=TOKEN_SALT).sign_object({'u': user.pk, 'k': key})
+    return token, expires_at
+
+
+def decode_token(token):
+    """Returns (user id, token key) for a valid, unexpired token, else None"""
+    try:
+        payload = signing.TimestampSigner(salt=TOKEN_SALT).unsign_object(token, max_age=token_settings()['TTL'])
+        return int(payload['u']), str(payload['k'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+
+
+def revoke_tokens(keys):
+    keys = list(keys)
+    if not keys:
+        return 0
+    revoked = AuthToken.objects.filter(key__in=keys, revoked_at__isnull=True).update(revoked_at=timezone.now())
+    caches[token_settings()['CACHE_ALIAS']].delete_many([token_cache_key(key) for key in keys])
+    return revoked
+
+
+def revoke_user_tokens(user):
+    return revoke_tokens(user.auth_tokens.filter(revoked_at__isnull=True).values_list('key', flat=True))
+
+
+def forget_user(user_id):
+    """Drops the cached user so the next request reloads it"""
+    caches[token_settings()['CACHE_ALIAS']].delete(user_cache_key(user_id))
+
+
+def purge_expired_tokens():
+    return AuthToken.objects.filter(expires_at__lt=timezone.now()).delete()[0]
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    Authenticates `Authorization: Bearer <token>` headers issued by issue_token.
+
+    A request costs one HMAC check plus a cache hit; on a miss, one lookup on
+    the unique token key. Revoked tokens are cached as 0 so they stay cheap
+    to reject.
+    """
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            token = header[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        decoded = decode_token(token)
+        if decoded is None:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        user_id, key = decoded
+
+        config = token_settings()
+        cache = caches[config['CACHE_ALIAS']]
+        cached = cache.get_many([token_cache_key(key), user_cache_key(user_id)])
+        token_state = cached.get(token_cache_key(key))
+        user = cached.get(user_cache_key(user_id))
+        if token_state is None or (token_state and user is None):
+            token_state, user = self.load(key, user_id, cache, config['CACHE_TIMEOUT'])
+
+        if not token_state or user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed('Invalid or expired token.')
+        return (user, key)
+
+    def load(self, key, user_id, cache, timeout):
+        record = (
+            AuthToken.objects.select_related('user')
+            .filter(key=key, user_id=user_id)
+            .first()
+        )
+        if record is None or record.revoked_at is not None or record.expires_at <= timezone.now():
+            cache.set(token_cache_key(key), 0, timeout)
+            return 0, None
+        remaining = int((record.expires_at - timezone.now()).total_seconds())
+        cache.set_many({
+            token_cache_key(key): user_id,
+            user_cache_key(user_id): record.user,
+        }, min(timeout, remaining))
+        return user_id, record.user
+
+    def authenticate_header(self, request):
+        return KEYWORD
@@ -0,0 +1,182 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import Feature, Property
+
+KINDS = ('city', 'area', 'feature')
+MAX_SUGGESTIONS = 20
+
+
+def normalize(value):
+    return ' '.join((value or '').split()).casefold()
+
+
+class Node:
+    __slots__ = ('children', 'display', 'count', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.display = None
+        self.count = 0
+        # Best (count, display) pairs in this subtree, highest count first
+        self.top = []
+
+
+class PrefixIndex:
+    """
+    Trie over normalized terms where every node caches the best
+    MAX_SUGGESTIONS terms beneath it, so a lookup walks only the prefix.
+
+    Writers hold a lock and replace `top` lists wholesale, so readers never
+    need one.
+    """
+
+    def __init__(self, limit=MAX_SUGGESTIONS):
+        self.root = Node()
+        self.limit = limit
+        self._lock = threading.Lock()
+
+    def adjust(self, value, delta):
+        key = normalize(value)
+        if not key:
+            return
+        with self._lock:
+            path = [self.root]
+            node = self.root
+            for char in key:
+                node = node.children.setdefault(char, Node())
+                path.append(node)
+            if node.display is None or delta > 0:
+                node.display = value.strip()
+            node.count = max(node.count + delta, 0)
+            if node.count == 0 and delta < 0:
+                node.display = None
+            # Re-rank bottom-up; each node merges its children's cached lists
+            for depth in range(len(path) - 1, -1, -1):
+                current = path[depth]
+                candidates = [entry for child in current.children.values() for entry in child.top]
+                if current.display is not None:
+                    candidates.append((current.count, current.display))
+                candidates.sort(key=lambda entry: (-entry[0], entry[1]))
+                current.top = candidates[:self.limit]
+                if depth and not current.top and not current.children:
+                    del path[depth - 1].children[key[depth - 1]]
+
+    def count(self, value):
+        node = self.root
+        for char in normalize(value):
+            node = node.children.get(char)
+            if node is None:
+                return 0
+        return node.count if node.display is not None else 0
+
+    def discard(self, value):
+        self.adjust(value, -self.count(value) or -1)
+
+    def search(self, prefix, limit):
+        node = self.root
+        for char in normalize(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+
+class Autocomplete:
+    """
+    In-process suggestion index for cities, areas and feature names, ranked
+    by listing count.
+
+    Built from three aggregate queries on first use and kept current by the
+    signal handlers. Their adjustments apply when the surrounding
+    transaction commits, so a rollback leaves the counts untouched. Each
+    worker only sees its own writes, so the index is also rebuilt in the
+    background every AUTOCOMPLETE_REFRESH seconds.
+    """
+
+    def __init__(self):
+        self.indexes = None
+        self.built_at = 0.0
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+
+    def build(self):
+        indexes = {kind: PrefixIndex() for kind in KINDS}
+        for kind, field in (('city', 'city'), ('area', 'area')):
+            rows = Property.objects.exclude(**{field: ''}).order_by().values_list(field).annotate(count=Count('id'))
+            for value, count in rows:
+                if value:
+                    indexes[kind].adjust(value, count)
+        for name, count in Feature.objects.annotate(count=Count('property')).values_list('name', 'count'):
+            # Features without listings still complete, ranked last
+            indexes['feature'].adjust(name, count)
+        return indexes
+
+    def rebuild(self):
+        indexes = self.build()
+        self.indexes, self.built_at = indexes, time.monotonic()
+
+    def ensure_built(self):
+        if self.indexes is None:
+            with self._build_lock:
+                if self.indexes is None:
+                    self.rebuild()
+        elif time.monotonic() - self.built_at > getattr(settings, 'AUTOCOMPLETE_REFRESH', 300):
+            self.refresh_in_background()
+
+    def refresh_in_background(self):
+        with self._build_lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild()
+            finally:
+                self._rebuilding = False
+                connection.close()
+
+        threading.Thread(target=run, name='autocomplete-rebuild', daemon=True).start()
+
+    def adjust(self, kind, value, delta):
+        if value:
+            transaction.on_commit(lambda: self._adjust(kind, value, delta))
+
+    def _adjust(self, kind, value, delta):
+        # Nothing to maintain until the first lookup builds the index
+        if self.indexes is not None:
+            self.indexes[kind].adjust(value, delta)
+
+    def adjust_features(self, feature_ids, delta):
+        if feature_ids:
+            feature_ids = list(feature_ids)
+            transaction.on_commit(lambda: self._adjust_features(feature_ids, delta))
+
+    def _adjust_features(self, feature_ids, delta):
+        if self.indexes is not None:
+            for name in Feature.objects.filter(pk__in=feature_ids).values_list('name', flat=True):
+                self.indexes['feature'].adjust(name, delta)
+
+    def discard(self, kind, value):
+        if value:
+            transaction.on_commit(lambda: self._discard(kind, value))
+
+    def _discard(self, kind, value):
+        if self.indexes is not None:
+            self.indexes[kind].discard(value)
+
+    def suggest(self, prefix, kinds=KINDS, limit=8):
+        self.ensure_built()
+        matches = []
+        for kind in kinds:
+            matches.extend((count, display, kind) for count, display in self.indexes[kind].search(prefix, limit))
+        matches.sort(key=lambda entry: (-entry[0], entry[1]))
+        return [{'value': display, 'kind': kind, 'count': count} for count, display, kind in matches[:limit]]
+
+
+autocomplete = Autocomplete()
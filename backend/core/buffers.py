@@ -0,0 +1,139 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+
+from .dashboard import invalidate_dashboards
+from .models import ContactMessage
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Queues unsaved model instances and inserts them with bulk_create.
+
+    A batch is flushed as soon as it reaches `max_size` rows, or by a
+    background thread once the oldest queued row is `max_delay` seconds old.
+    Pending rows are flushed at interpreter exit, so a graceful shutdown
+    (SIGTERM to a gunicorn/uvicorn worker) never drops accepted writes.
+    """
+
+    def __init__(self, model, max_size=100, max_delay=1.0, on_flush=None):
+        self.model = model
+        self.on_flush = on_flush
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._pending = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        atexit.register(self.flush)
+
+    def add(self, instance):
+        with self._lock:
+            self._pending.append(instance)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            full = len(self._pending) >= self.max_size
+            self._ensure_thread()
+        if full:
+            self.flush()
+        else:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=f'{self.model.__name__}-write-behind', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                oldest = self._oldest
+                if oldest is None:
+                    self._wakeup.clear()
+            if oldest is None:
+                continue
+            remaining = oldest + self.max_delay - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+                continue
+            try:
+                self.flush()
+            finally:
+                # The worker thread holds its own connection; drop it between batches
+                close_old_connections()
+
+    def _take(self):
+        with self._lock:
+            batch, self._pending, self._oldest = self._pending, [], None
+            return batch
+
+    def flush(self):
+        """Inserts everything queued so far; returns the number of rows saved"""
+        with self._flush_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create(batch, batch_size=self.max_size)
+                saved = len(batch)
+            except DatabaseError:
+                # One bad row (e.g. its property was deleted meanwhile) must not
+                # lose the rest of the batch
+                saved = self._save_individually(batch)
+            if self.on_flush is not None:
+                # bulk_create sends no post_save signals
+                self.on_flush(batch)
+            self.flushed += saved
+            self.failed += len(batch) - saved
+            self.batches += 1
+            return saved
+
+    def _save_individually(self, batch):
+        saved = 0
+        for instance in batch:
+            instance.pk = None
+            try:
+                with transaction.atomic():
+                    instance.save(force_insert=True)
+                saved += 1
+            except DatabaseError:
+                logger.exception('Dropping buffered %s', self.model.__name__)
+        return saved
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'flushed': self.flushed,
+            'failed': self.failed,
+            'batches': self.batches,
+            'max_size': self.max_size,
+            'max_delay': self.max_delay,
+        }
+
+
+def build_contact_buffer():
+    config = getattr(settings, 'CONTACT_MESSAGE_BUFFER', {})
+    if not config.get('ENABLED', False):
+        return None
+    return WriteBehindBuffer(
+        ContactMessage, config.get('MAX_SIZE', 100), config.get('MAX_DELAY', 1.0),
+        on_flush=lambda batch: invalidate_dashboards({message.owner_id for message in batch}),
+    )
+
+
+contact_buffer = build_contact_buffer()
@@ -0,0 +1,154 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class LRUCache:
+    """Thread-safe in-process LRU mapping with a fixed number of entries"""
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def get_many(self, keys):
+        with self._lock:
+            found = {}
+            for key in keys:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[key] = self._data[key]
+            return found
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = value
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class DjangoCacheBackend:
+    """Adapter exposing a configured Django cache alias with the LRUCache interface"""
+
+    evictions = 0
+
+    def __init__(self, alias, timeout=None):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def set_many(self, items):
+        self.cache.set_many(items, self.timeout)
+
+    def delete_many(self, keys):
+        self.cache.delete_many(keys)
+
+    def clear(self):
+        self.cache.clear()
+
+    def __len__(self):
+        return 0
+
+
+class FragmentCache:
+    """
+    Cache of serialized dicts keyed by object id.
+
+    Each entry stores the `updated_at` it was built from, so a stale entry is
+    treated as a miss even if an invalidation was lost.
+    """
+
+    def __init__(self, prefix, backend):
+        self.prefix = prefix
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, object_id):
+        return f'{self.prefix}:{object_id}'
+
+    def get_many(self, stamps):
+        """Returns {id: data} for ids in `stamps` ({id: updated_at}) with a fresh entry"""
+        if not stamps:
+            return {}
+        entries = self.backend.get_many([self.key(object_id) for object_id in stamps])
+        found = {}
+        for object_id, updated_at in stamps.items():
+            entry = entries.get(self.key(object_id))
+            if entry is not None and entry[0] == updated_at:
+                found[object_id] = entry[1]
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(stamps) - len(found)
+        return found
+
+    def set_many(self, fragments):
+        """Stores {id: (updated_at, data)}"""
+        if fragments:
+            self.backend.set_many({self.key(object_id): entry for object_id, entry in fragments.items()})
+
+    def invalidate(self, object_ids):
+        object_ids = list(object_ids)
+        if object_ids:
+            self.backend.delete_many([self.key(object_id) for object_id in object_ids])
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'size': len(self.backend),
+        }
+
+
+def build_fragment_cache(prefix):
+    config = getattr(settings, 'PROPERTY_CACHE', {})
+    if config.get('BACKEND', 'local') == 'django':
+        backend = DjangoCacheBackend(config.get('ALIAS', 'default'), config.get('TIMEOUT'))
+    else:
+        backend = LRUCache(config.get('MAX_ENTRIES', 5000))
+    return FragmentCache(prefix, backend)
+
+
+property_cache = build_fragment_cache('property')
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from .authentication import token_settings
+
+# Backends whose entries are invisible to other worker processes
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches)
+def check_token_cache(app_configs, **kwargs):
+    """Token revocations are only seen by other workers through a shared cache"""
+    if not getattr(settings, 'REQUIRE_SHARED_CACHE', False):
+        return []
+    alias = token_settings()['CACHE_ALIAS']
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'The {alias!r} cache holding auth token state uses {backend}, which each worker keeps to itself.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis or Memcached.',
+        id='core.E001',
+    )]
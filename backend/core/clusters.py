@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Left
+
+from . import geo
+from .models import MapCluster, Property
+
+
+def adjust_clusters(geohash, latitude, longitude, delta):
+    """Adds (delta=1) or removes (delta=-1) one marker from every cluster containing it"""
+    if not geohash:
+        return
+    cells = geo.cluster_cells(geohash)
+    latitude = float(latitude)
+    longitude = float(longitude)
+    with transaction.atomic():
+        if delta > 0:
+            MapCluster.objects.bulk_create(
+                [MapCluster(cell=cell, precision=len(cell), center_latitude=lat, center_longitude=lng)
+                 for cell, (lat, lng) in ((cell, geo.center(cell)) for cell in cells)],
+                ignore_conflicts=True,
+            )
+        MapCluster.objects.filter(cell__in=cells).update(
+            count=F('count') + delta,
+            latitude_sum=F('latitude_sum') + latitude * delta,
+            longitude_sum=F('longitude_sum') + longitude * delta,
+        )
+
+
+def rebuild_clusters():
+    """Recomputes every cluster row from the Property table"""
+    located = Property.objects.exclude(geohash='')
+    with transaction.atomic():
+        MapCluster.objects.all().delete()
+        for precision in range(1, geo.MAX_CLUSTER_PRECISION + 1):
+            rows = []
+            buckets = (
+                located.annotate(cell=Left('geohash', precision))
+                .values('cell')
+                .annotate(count=Count('id'), latitude_sum=Sum('latitude'), longitude_sum=Sum('longitude'))
+            )
+            for bucket in buckets:
+                lat, lng = geo.center(bucket['cell'])
+                rows.append(MapCluster(
+                    cell=bucket['cell'], precision=precision,
+                    center_latitude=lat, center_longitude=lng, count=bucket['count'],
+                    latitude_sum=float(bucket['latitude_sum']), longitude_sum=float(bucket['longitude_sum']),
+                ))
+            MapCluster.objects.bulk_create(rows, batch_size=1000)
+
+
+def add_to_clusters(properties):
+    """Adds many located properties to the clusters, one UPDATE per touched cell"""
+    totals = {}
+    for property_obj in properties:
+        if not property_obj.geohash:
+            continue
+        latitude = float(property_obj.latitude)
+        longitude = float(property_obj.longitude)
+        for cell in geo.cluster_cells(property_obj.geohash):
+            count, latitude_sum, longitude_sum = totals.get(cell, (0, 0.0, 0.0))
+            totals[cell] = (count + 1, latitude_sum + latitude, longitude_sum + longitude)
+    if not totals:
+        return
+    with transaction.atomic():
+        existing = set(MapCluster.objects.filter(cell__in=list(totals)).values_list('cell', flat=True))
+        new_rows = []
+        for cell, (count, latitude_sum, longitude_sum) in totals.items():
+            if cell in existing:
+                MapCluster.objects.filter(cell=cell).update(
+                    count=F('count') + count,
+                    latitude_sum=F('latitude_sum') + latitude_sum,
+                    longitude_sum=F('longitude_sum') + longitude_sum,
+                )
+            else:
+                lat, lng = geo.center(cell)
+                new_rows.append(MapCluster(
+                    cell=cell, precision=len(cell), center_latitude=lat, center_longitude=lng,
+                    count=count, latitude_sum=latitude_sum, longitude_sum=longitude_sum,
+                ))
+        MapCluster.objects.bulk_create(new_rows, batch_size=1000)
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False)
+    return f'"{digest.hexdigest()}"'
+
+
+def collection_validators(request, queryset):
+    """
+    ETag and Last-Modified for a filtered listing, from one aggregate query.
+
+    The query string and negotiated media type are part of the ETag so each
+    page, filter set, fieldset and encoding has its own validator; the row
+    count catches deletions that leave the newest `updated_at` unchanged.
+    """
+    stats = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    last_modified = stats['last_modified']
+    etag = make_etag(
+        representation(request), last_modified.isoformat() if last_modified else '', stats['count']
+    )
+    return etag, last_modified
+
+
+async def acollection_validators(request, queryset):
+    stats = await queryset.order_by().aaggregate(last_modified=Max('updated_at'), count=Count('id'))
+    last_modified = stats['last_modified']
+    etag = make_etag(
+        representation(request), last_modified.isoformat() if last_modified else '', stats['count']
+    )
+    return etag, last_modified
+
+
+def object_validators(property_obj, request=None):
+    variant = representation(request) if request is not None else ''
+    return make_etag(property_obj.pk, property_obj.updated_at.isoformat(), variant), property_obj.updated_at
+
+
+def representation(request):
+    """Path, query string and negotiated media type (DRF requests only)"""
+    return f"{request.get_full_path()}|{getattr(request, 'accepted_media_type', '')}"
+
+
+def not_modified(request, etag, last_modified):
+    """Returns a 304 (or 412) response if the request's validators match, else None"""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        add_validators(response, etag, last_modified)
+    return response
+
+
+def add_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Compact encodings may be negotiated with Accept
+    patch_vary_headers(response, ['Accept'])
+    # Clients revalidate every time (cheap 304s); shared caches may reuse for s-maxage
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=getattr(settings, 'PROPERTY_HTTP_MAX_AGE', 0),
+        s_maxage=getattr(settings, 'PROPERTY_HTTP_S_MAXAGE', 60),
+    )
+    return response
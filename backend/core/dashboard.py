@@ -0,0 +1,142 @@
+from django.db.models import Avg, Count, Max, Q, Sum
+
+from .cache import build_fragment_cache
+from .models import ContactMessage, Property, PropertyImage
+from .serializers import PRICE_QUANTUM, format_datetime, format_decimal
+
+RECENT_ACTIVITY_LIMIT = 10
+TOP_ENQUIRED_LIMIT = 20
+
+# Bumped when the dashboard format changes
+DASHBOARD_VERSION = 1
+
+dashboard_cache = build_fragment_cache('dashboard')
+
+
+def invalidate_dashboards(owner_ids):
+    dashboard_cache.invalidate({owner_id for owner_id in owner_ids if owner_id is not None})
+
+
+def invalidate_property_dashboards(property_ids):
+    property_ids = list(property_ids)
+    if property_ids:
+        invalidate_dashboards(
+            Property.objects.filter(pk__in=property_ids).values_list('owner_id', flat=True).distinct()
+        )
+
+
+def coverage(count, total):
+    return {'count': count, 'percent': round(100 * count / total, 1) if total else 0.0}
+
+
+def build_dashboard(owner_id):
+    """
+    Listing summary for one owner in six aggregate queries: per-type price
+    stats, image coverage, feature coverage, enquiries per listing and the
+    latest listing changes and enquiries.
+    """
+    listings = Property.objects.filter(owner_id=owner_id)
+    by_type = list(
+        listings.order_by().values('type').annotate(
+            count=Count('id'),
+            total_price=Sum('price'),
+            average_price=Avg('price'),
+            with_location=Count('id', filter=Q(latitude__isnull=False, longitude__isnull=False)),
+        )
+    )
+    images = PropertyImage.objects.filter(property__owner_id=owner_id).aggregate(
+        images=Count('id'), listings=Count('property_id', distinct=True),
+    )
+    features = Property.features.through.objects.filter(property__owner_id=owner_id).aggregate(
+        links=Count('id'), listings=Count('property_id', distinct=True),
+    )
+    messages = ContactMessage.objects.filter(owner_id=owner_id)
+    enquiries = list(
+        messages.order_by().values('property_id', 'property__title')
+        .annotate(count=Count('id'), last_at=Max('created_at'))
+        .order_by('-count', '-last_at')
+    )
+    recent_listings = list(
+        listings.order_by('-updated_at', '-id').values('id', 'title', 'created_at', 'updated_at')[:RECENT_ACTIVITY_LIMIT]
+    )
+    recent_messages = list(
+        messages.order_by('-created_at', '-id').values('id', 'property_id', 'property__title', 'name', 'created_at')[:RECENT_ACTIVITY_LIMIT]
+    )
+
+    total = sum(row['count'] for row in by_type)
+    total_price = sum((row['total_price'] for row in by_type if row['total_price'] is not None), start=0)
+    total_enquiries = sum(row['count'] for row in enquiries)
+
+    activity = [{
+        'kind': 'listing_created' if row['created_at'] == row['updated_at'] else 'listing_updated',
+        'property': row['id'],
+        'title': row['title'],
+        'at': row['updated_at'],
+    } for row in recent_listings] + [{
+        'kind': 'enquiry',
+        'property': row['property_id'],
+        'title': row['property__title'],
+        'name': row['name'],
+        'at': row['created_at'],
+    } for row in recent_messages]
+    activity.sort(key=lambda item: item['at'], reverse=True)
+    for item in activity:
+        item['at'] = format_datetime(item['at'])
+
+    return {
+        'owner': owner_id,
+        'total': total,
+        'by_type': {
+            row['type']: {
+                'count': row['count'],
+                'total_price': format_decimal(row['total_price'], PRICE_QUANTUM),
+                'average_price': format_decimal(row['average_price'], PRICE_QUANTUM),
+            } for row in by_type
+        },
+        'total_price': format_decimal(total_price, PRICE_QUANTUM),
+        'average_price': format_decimal(total_price / total, PRICE_QUANTUM) if total else None,
+        'coverage': {
+            'images': coverage(images['listings'], total),
+            'features': coverage(features['listings'], total),
+            'location': coverage(sum(row['with_location'] for row in by_type), total),
+            'images_per_listing': round(images['images'] / total, 2) if total else 0.0,
+            'features_per_listing': round(features['links'] / total, 2) if total else 0.0,
+        },
+        'enquiries': {
+            'total': total_enquiries,
+            'per_listing': round(total_enquiries / total, 2) if total else 0.0,
+            'listings_with_enquiries': len(enquiries),
+            'top_listings': [{
+                'property': row['property_id'],
+                'title': row['property__title'],
+                'count': row['count'],
+                'last_at': format_datetime(row['last_at']),
+            } for row in enquiries[:TOP_ENQUIRED_LIMIT]],
+        },
+        'recent_activity': activity[:RECENT_ACTIVITY_LIMIT],
+    }
+
+
+def dashboard_stamp(owner_id):
+    """
+    Cheap validator for one owner's dashboard, from two indexed aggregates.
+
+    Local invalidation only reaches this process's cache; the stamp also
+    catches writes made by other workers, management commands and the
+    importer. Image and feature changes bump the listing's updated_at.
+    """
+    listings = Property.objects.filter(owner_id=owner_id).aggregate(count=Count('id'), latest=Max('updated_at'))
+    messages = ContactMessage.objects.filter(owner_id=owner_id).aggregate(count=Count('id'), latest=Max('id'))
+    latest = listings['latest'].isoformat() if listings['latest'] else ''
+    return f"{DASHBOARD_VERSION}:{listings['count']}:{latest}:{messages['count']}:{messages['latest'] or 0}"
+
+
+def owner_dashboard(owner_id):
+    """Returns the cached dashboard for `owner_id`, building it on a miss"""
+    stamp = dashboard_stamp(owner_id)
+    cached = dashboard_cache.get_many({owner_id: stamp})
+    if owner_id in cached:
+        return cached[owner_id]
+    data = build_dashboard(owner_id)
+    dashboard_cache.set_many({owner_id: (stamp, data)})
+    return data
@@ -0,0 +1,68 @@
+"""
+Opt-in compact encodings for property lists.
+
+Columnar JSON replaces a list of objects with one shared key header and a
+row of values per object; MessagePack (when the msgpack package is
+installed) packs that same columnar layout in binary. Clients opt in with
+?format=columnar / ?format=msgpack or the matching Accept header.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; only the binary encoding requires it
+    msgpack = None
+
+COLUMNAR_MEDIA_TYPE = 'application/vnd.propvista.columnar+json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+
+
+def columnar(data):
+    """
+    Rewrites a list of dicts, or the `results` of a paginated response, as
+    {'fields': [...], 'rows': [[...], ...]}. Other data is returned as is.
+    """
+    if isinstance(data, dict) and isinstance(data.get('results'), list):
+        return {**{k: v for k, v in data.items() if k != 'results'}, **columnar(data['results'])}
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        return data
+    fields = list(dict.fromkeys(key for item in data for key in item))
+    return {'fields': fields, 'rows': [[item.get(field) for field in fields] for item in data]}
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    media_type = COLUMNAR_MEDIA_TYPE
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(columnar(data), accepted_media_type, renderer_context)
+
+
+def msgpack_default(value):
+    # Serializers already emit strings for decimals and datetimes; this
+    # covers values from hand-built responses
+    if isinstance(value, (Decimal, datetime, date)):
+        return str(value) if isinstance(value, Decimal) else value.isoformat()
+    raise TypeError(f'Cannot pack {type(value).__name__}')
+
+
+def pack(data):
+    return msgpack.packb(columnar(data), default=msgpack_default, use_bin_type=True)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MSGPACK_MEDIA_TYPE
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return pack(data)
+
+
+COMPACT_RENDERERS = [ColumnarJSONRenderer] + ([MessagePackRenderer] if msgpack is not None else [])
@@ -0,0 +1,78 @@
+import csv
+import json
+
+from .serializers import build_property_dicts
+
+EXPORT_CHUNK_SIZE = 500
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# Feature and image separators match core.ingest.normalize_record so an
+# exported CSV can be fed back into import_properties
+CSV_COLUMNS = [
+    'id', 'title', 'price', 'city', 'address', 'area', 'latitude', 'longitude', 'full_address',
+    'has_location', 'type', 'features', 'images', 'description', 'owner_id', 'owner_email',
+    'owner_name', 'created_at', 'updated_at',
+]
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def iter_property_batches(queryset, after=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields lists of serialized properties in id order, `chunk_size` at a time.
+
+    Each chunk is one keyset query for the next ids (`id > last id`) plus the
+    three fast-path queries for their rows, features and images, so memory
+    stays bounded by the chunk size. Passing the last exported id as `after`
+    resumes the export.
+    """
+    ids_queryset = queryset.order_by('id').values_list('id', flat=True)
+    while True:
+        page = ids_queryset.filter(id__gt=after) if after is not None else ids_queryset
+        ids = list(page[:chunk_size])
+        if not ids:
+            return
+        data = build_property_dicts(ids)
+        batch = []
+        for property_id in ids:
+            item = data.get(property_id)
+            if item is not None:
+                item.pop('_updated_at', None)
+                batch.append(item)
+        yield batch
+        after = ids[-1]
+
+
+def csv_row(item):
+    owner = item['owner']
+    return [
+        item['id'], item['title'], item['price'], item['city'], item['address'], item['area'],
+        item['latitude'] or '', item['longitude'] or '', item['full_address'], item['has_location'],
+        item['type'],
+        ','.join(feature['name'] for feature in item['features']),
+        '|'.join(image['image'] for image in item['images']),
+        item['description'], owner['id'], owner['email'], owner['name'],
+        item['created_at'], item['updated_at'],
+    ]
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def stream_export(queryset, export_format='ndjson', after=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields the export as text, one chunk of lines at a time"""
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        if after is None:
+            yield writer.writerow(CSV_COLUMNS)
+        for batch in iter_property_batches(queryset, after, chunk_size):
+            yield ''.join(writer.writerow(csv_row(item)) for item in batch)
+    else:
+        for batch in iter_property_batches(queryset, after, chunk_size):
+            yield ''.join(json.dumps(item, separators=(',', ':')) + '\n' for item in batch)
@@ -0,0 +1,296 @@
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+
+from .filters import filter_properties, parse_decimal_param
+from .models import FacetCount, FeatureFacetCount, Property
+
+# Lower bound of each price bucket; the last bucket is open-ended
+PRICE_BUCKETS = [
+    Decimal(0), Decimal(10000), Decimal(25000), Decimal(50000), Decimal(100000),
+    Decimal(500000), Decimal(1000000), Decimal(5000000), Decimal(10000000), Decimal(50000000),
+]
+
+# Parameters filter_properties narrows listings by; the rest (format,
+# ordering, paging) do not change the counts
+FILTER_PARAMS = {'owner', 'city', 'type', 'min_price', 'max_price', 'features', 'q'}
+# Filters the aggregate tables can answer; any other falls back to a live query
+CUBE_FILTERS = {'city', 'type', 'min_price', 'max_price'}
+# Prices are stored to the cent, so a bucket's highest price is one quantum
+# below the next bucket's lower bound
+PRICE_QUANTUM = Decimal('0.01')
+
+
+def price_bucket(price):
+    return max(bisect_right(PRICE_BUCKETS, Decimal(price)) - 1, 0)
+
+
+def bucket_range(bucket):
+    upper = PRICE_BUCKETS[bucket + 1] if bucket + 1 < len(PRICE_BUCKETS) else None
+    return PRICE_BUCKETS[bucket], upper
+
+
+def facet_key(type, city, price):
+    return type, city, price_bucket(price)
+
+
+def adjust_facets(key, feature_ids, delta):
+    """Adds or removes one listing from the counts for `key` and each of its features"""
+    property_type, city, bucket = key
+    with transaction.atomic():
+        if delta > 0:
+            FacetCount.objects.bulk_create(
+                [FacetCount(type=property_type, city=city, price_bucket=bucket)], ignore_conflicts=True
+            )
+        FacetCount.objects.filter(type=property_type, city=city, price_bucket=bucket).update(
+            count=F('count') + delta
+        )
+        adjust_feature_facets(key, feature_ids, delta)
+
+
+def adjust_feature_facets(key, feature_ids, delta):
+    if not feature_ids:
+        return
+    property_type, city, bucket = key
+    with transaction.atomic():
+        if delta > 0:
+            FeatureFacetCount.objects.bulk_create(
+                [FeatureFacetCount(feature_id=feature_id, type=property_type, city=city, price_bucket=bucket)
+                 for feature_id in feature_ids],
+                ignore_conflicts=True,
+            )
+        FeatureFacetCount.objects.filter(
+            feature_id__in=feature_ids, type=property_type, city=city, price_bucket=bucket
+        ).update(count=F('count') + delta)
+
+
+def price_bucket_expression(field='price'):
+    """SQL expression mapping a price column to its bucket index"""
+    whens = [
+        When(**{f'{field}__gte': lower}, then=Value(index))
+        for index, lower in reversed(list(enumerate(PRICE_BUCKETS)))
+    ]
+    return Case(*whens, default=Value(0), output_field=IntegerField())
+
+
+def rebuild_facets():
+    """Recomputes both aggregate tables from Property with two GROUP BY queries"""
+    through = Property.features.through
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FeatureFacetCount.objects.all().delete()
+        rows = (
+            Property.objects.annotate(bucket=price_bucket_expression())
+            .values('type', 'city', 'bucket')
+            .annotate(total=Count('id'))
+        )
+        FacetCount.objects.bulk_create(
+            [FacetCount(type=r['type'], city=r['city'], price_bucket=r['bucket'], count=r['total']) for r in rows],
+            batch_size=1000,
+        )
+        rows = (
+            through.objects.annotate(
+                type=F('property__type'),
+                city=F('property__city'),
+                bucket=price_bucket_expression('property__price'),
+            )
+            .values('feature_id', 'type', 'city', 'bucket')
+            .annotate(total=Count('id'))
+        )
+        FeatureFacetCount.objects.bulk_create(
+            [FeatureFacetCount(feature_id=r['feature_id'], type=r['type'], city=r['city'],
+                               price_bucket=r['bucket'], count=r['total']) for r in rows],
+            batch_size=1000,
+        )
+
+
+def covered_buckets(min_price, max_price):
+    """
+    Splits a price filter into the buckets it covers whole and a Q for the
+    prices it admits outside them, which the aggregate tables cannot count.
+
+    Returns (None, None) without a price filter, and a None Q when the
+    buckets cover the whole filter.
+    """
+    if min_price is None and max_price is None:
+        return None, None
+    buckets = []
+    for bucket in range(len(PRICE_BUCKETS)):
+        lower, upper = bucket_range(bucket)
+        if min_price is not None and lower < min_price:
+            continue
+        if max_price is not None and (upper is None or upper - PRICE_QUANTUM > max_price):
+            continue
+        buckets.append(bucket)
+    bounds = Q()
+    if min_price is not None:
+        bounds &= Q(price__gte=min_price)
+    if max_price is not None:
+        bounds &= Q(price__lte=max_price)
+    if not buckets:
+        return [], bounds
+    covered_lower, _ = bucket_range(buckets[0])
+    _, covered_upper = bucket_range(buckets[-1])
+    remainder = []
+    if min_price is not None and min_price < covered_lower:
+        remainder.append(Q(price__lt=covered_lower))
+    if max_price is not None and max_price >= covered_upper:
+        remainder.append(Q(price__gte=covered_upper))
+    if not remainder:
+        return buckets, None
+    return buckets, bounds & (remainder[0] | remainder[1] if len(remainder) > 1 else remainder[0])
+
+
+def format_facets(type_rows, city_rows, bucket_rows, feature_rows):
+    price = []
+    for bucket, count in sorted(bucket_rows):
+        lower, upper = bucket_range(bucket)
+        price.append({'bucket': bucket, 'min': lower, 'max': upper, 'count': count})
+    return {
+        'total': sum(count for _, count in type_rows),
+        'type': [{'value': v, 'count': c} for v, c in sorted(type_rows, key=lambda r: -r[1]) if c],
+        'city': [{'value': v, 'count': c} for v, c in sorted(city_rows, key=lambda r: -r[1]) if c],
+        'price': [row for row in price if row['count']],
+        'features': [{'name': v, 'count': c} for v, c in sorted(feature_rows, key=lambda r: -r[1]) if c],
+    }
+
+
+def cube_facet_querysets(city, property_type, buckets):
+    """Grouped querysets over the aggregate tables for type, city, price and features"""
+    lookup = Q()
+    if city:
+        lookup &= Q(city=city)
+    if property_type:
+        lookup &= Q(type=property_type)
+    if buckets is not None:
+        lookup &= Q(price_bucket__in=buckets)
+    counts = FacetCount.objects.filter(lookup, count__gt=0)
+    features = FeatureFacetCount.objects.filter(lookup, count__gt=0)
+    return (
+        counts.values_list('type').annotate(total=Sum('count')),
+        counts.values_list('city').annotate(total=Sum('count')),
+        counts.values_list('price_bucket').annotate(total=Sum('count')),
+        features.values_list('feature__name').annotate(total=Sum('count')),
+    )
+
+
+def live_facet_querysets(queryset):
+    """Grouped querysets computing the same counts from a filtered Property queryset"""
+    queryset = queryset.order_by()
+    ids = queryset.values('id')
+    return (
+        queryset.values_list('type').annotate(total=Count('id')),
+        queryset.values_list('city').annotate(total=Count('id')),
+        queryset.annotate(bucket=price_bucket_expression()).values_list('bucket').annotate(total=Count('id')),
+        Property.features.through.objects.filter(property_id__in=ids)
+        .values_list('feature__name').annotate(total=Count('id')),
+    )
+
+
+def cube_facets(city, property_type, buckets):
+    """Facet counts read from the aggregate tables"""
+    return format_facets(*cube_facet_querysets(city, property_type, buckets))
+
+
+def live_facets(queryset):
+    """Facet counts computed from an already-filtered Property queryset"""
+    return format_facets(*live_facet_querysets(queryset))
+
+
+def add_to_facets(properties, feature_ids):
+    """
+    Counts many new properties at once.
+
+    `feature_ids` maps property id to the ids of its features. Combinations not
+    yet in the tables are inserted with their final counts; existing ones that
+    gain the same number of listings share one UPDATE.
+    """
+    key_counts = {}
+    feature_counts = {}
+    for property_obj in properties:
+        key = facet_key(property_obj.type, property_obj.city, property_obj.price)
+        key_counts[key] = key_counts.get(key, 0) + 1
+        for feature_id in feature_ids.get(property_obj.id, []):
+            feature_counts[(feature_id,) + key] = feature_counts.get((feature_id,) + key, 0) + 1
+    if not key_counts:
+        return
+
+    types = {key[0] for key in key_counts}
+    cities = {key[1] for key in key_counts}
+    with transaction.atomic():
+        existing = set(
+            FacetCount.objects.filter(type__in=types, city__in=cities)
+            .values_list('type', 'city', 'price_bucket')
+        )
+        FacetCount.objects.bulk_create(
+            [FacetCount(type=t, city=c, price_bucket=b, count=n)
+             for (t, c, b), n in key_counts.items() if (t, c, b) not in existing],
+            batch_size=1000,
+        )
+        for key, count in key_counts.items():
+            if key in existing:
+                adjust_facets(key, [], count)
+
+        existing = set(
+            FeatureFacetCount.objects.filter(
+                feature_id__in={key[0] for key in feature_counts}, type__in=types, city__in=cities
+            ).values_list('feature_id', 'type', 'city', 'price_bucket')
+        )
+        FeatureFacetCount.objects.bulk_create(
+            [FeatureFacetCount(feature_id=f, type=t, city=c, price_bucket=b, count=n)
+             for (f, t, c, b), n in feature_counts.items() if (f, t, c, b) not in existing],
+            batch_size=1000,
+        )
+        grouped = {}
+        for (feature_id, *key), count in feature_counts.items():
+            if (feature_id, *key) in existing:
+                grouped.setdefault((tuple(key), count), []).append(feature_id)
+        for (key, count), ids in grouped.items():
+            adjust_feature_facets(key, ids, count)
+
+
+def facet_querysets(params):
+    """
+    Returns the grouped querysets answering `params`, as a list of (type,
+    city, price, feature) tuples whose counts add up: the aggregate tables
+    for the buckets a price filter covers whole, plus a live query for any
+    prices outside them. Filters the tables cannot answer use a single
+    live query.
+    """
+    active = {name for name in FILTER_PARAMS if params.get(name)}
+    if not active <= CUBE_FILTERS:
+        return [live_facet_querysets(filter_properties(Property.objects.all(), params))]
+    city, property_type = params.get('city'), params.get('type')
+    buckets, remainder = covered_buckets(
+        parse_decimal_param(params, 'min_price'), parse_decimal_param(params, 'max_price'),
+    )
+    parts = []
+    if buckets is None or buckets:
+        parts.append(cube_facet_querysets(city, property_type, buckets))
+    if remainder is not None:
+        queryset = Property.objects.filter(remainder)
+        if city:
+            queryset = queryset.filter(city=city)
+        if property_type:
+            queryset = queryset.filter(type=property_type)
+        parts.append(live_facet_querysets(queryset))
+    return parts
+
+
+def merge_facet_rows(parts):
+    """Sums the (value, count) rows of each facet across the parts from facet_querysets"""
+    merged = [{}, {}, {}, {}]
+    for part in parts:
+        for totals, rows in zip(merged, part):
+            for value, count in rows:
+                totals[value] = totals.get(value, 0) + count
+    return [list(totals.items()) for totals in merged]
+
+
+def property_facets(params):
+    """Counts by type, city, price bucket and feature for the filters in `params`"""
+    return format_facets(*merge_facet_rows(
+        [[list(queryset) for queryset in part] for part in facet_querysets(params)]
+    ))
@@ -0,0 +1,89 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import Property
+from .search import search_properties
+
+
+def parse_decimal_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: 'A valid number is required.'})
+
+
+def parse_coordinate_params(params, names, limits):
+    values = []
+    for name, limit in zip(names, limits):
+        value = parse_decimal_param(params, name)
+        if value is None:
+            raise ValidationError({name: 'This parameter is required.'})
+        if abs(value) > limit:
+            raise ValidationError({name: f'Must be between -{limit} and {limit}.'})
+        values.append(float(value))
+    return values
+
+
+def parse_int_param(params, name, default, minimum, maximum):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: 'A valid integer is required.'})
+    return max(minimum, min(value, maximum))
+
+
+def parse_list_param(params, name):
+    values = []
+    for value in params.getlist(name):
+        values.extend(v.strip() for v in value.split(',') if v.strip())
+    return values
+
+
+def longitude_range(west, east, field='longitude'):
+    """Q for longitudes from `west` to `east`, split in two when the range crosses the antimeridian"""
+    if west <= east:
+        return Q(**{f'{field}__range': (west, east)})
+    return Q(**{f'{field}__gte': west}) | Q(**{f'{field}__lte': east})
+
+
+def filter_properties(queryset, params):
+    """Applies the listing filters from the query string to a Property queryset"""
+    owner = parse_int_param(params, 'owner', None, 1, 2 ** 63 - 1)
+    if owner is not None:
+        queryset = queryset.filter(owner_id=owner)
+    city = params.get('city')
+    if city:
+        queryset = queryset.filter(city=city)
+    property_type = params.get('type')
+    if property_type:
+        queryset = queryset.filter(type=property_type)
+    min_price = parse_decimal_param(params, 'min_price')
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    max_price = parse_decimal_param(params, 'max_price')
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+    features = set(parse_list_param(params, 'features'))
+    if features:
+        # Properties that have every requested feature, resolved in one subquery
+        matching = (
+            Property.features.through.objects
+            .filter(feature__name__in=features)
+            .values('property_id')
+            .annotate(matched=Count('feature__name', distinct=True))
+            .filter(matched=len(features))
+            .values('property_id')
+        )
+        queryset = queryset.filter(id__in=matching)
+    query = params.get('q', '').strip()
+    if query:
+        queryset = search_properties(queryset, query)
+    return queryset
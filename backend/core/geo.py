@@ -0,0 +1,147 @@
+import math
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+MAX_CLUSTER_PRECISION = 7
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Map zoom level (Google Maps scale, 0-21) to the geohash precision used for clusters
+ZOOM_PRECISION = [1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4, 5, 5, 5, 6, 6, 6, 7, 7, 7, 7]
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encodes a coordinate pair as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def bounds(geohash):
+    """Returns the (south, west, north, east) bounds of a geohash cell"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def center(geohash):
+    south, west, north, east = bounds(geohash)
+    return (south + north) / 2, (west + east) / 2
+
+
+def cell_size_km(precision, latitude=0.0):
+    """Returns the (height, width) of a geohash cell in kilometres"""
+    total_bits = precision * 5
+    lat_bits = total_bits // 2
+    lng_bits = total_bits - lat_bits
+    height = 180.0 / (2 ** lat_bits) * KM_PER_DEGREE
+    width = 360.0 / (2 ** lng_bits) * KM_PER_DEGREE * math.cos(math.radians(latitude))
+    return height, width
+
+
+def wrap_longitude(longitude):
+    return (longitude + 180) % 360 - 180
+
+
+def neighbours(geohash):
+    """Returns the cell itself plus its eight surrounding cells"""
+    south, west, north, east = bounds(geohash)
+    height = north - south
+    width = east - west
+    lat, lng = (south + north) / 2, (west + east) / 2
+    cells = []
+    for dlat in (-height, 0, height):
+        for dlng in (-width, 0, width):
+            n_lat = lat + dlat
+            if not -90 <= n_lat <= 90:
+                continue
+            n_lng = wrap_longitude(lng + dlng)
+            cells.append(encode(n_lat, n_lng, len(geohash)))
+    return list(dict.fromkeys(cells))
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Returns geohash prefixes whose union covers a circle of `radius_km`.
+
+    Picks the finest precision whose cells are at least as large as the radius,
+    so the centre cell and its neighbours always contain the whole circle.
+    """
+    precision = 1
+    for p in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size_km(p, float(latitude))
+        if min(height, width) >= radius_km:
+            precision = p
+            break
+    return neighbours(encode(latitude, longitude, precision))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Returns the (south, west, north, east) box enclosing a circle. West is
+    greater than east when the box crosses the antimeridian.
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    dlat = radius_km / KM_PER_DEGREE
+    dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    if dlng >= 180:
+        return latitude - dlat, -180.0, latitude + dlat, 180.0
+    return latitude - dlat, wrap_longitude(longitude - dlng), latitude + dlat, wrap_longitude(longitude + dlng)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, map(float, (lat1, lng1, lat2, lng2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def precision_for_zoom(zoom):
+    zoom = max(0, min(int(zoom), len(ZOOM_PRECISION) - 1))
+    return ZOOM_PRECISION[zoom]
+
+
+def cluster_cells(geohash):
+    """Returns the prefixes of a geohash used as cluster keys, one per precision"""
+    return [geohash[:p] for p in range(1, MAX_CLUSTER_PRECISION + 1)]
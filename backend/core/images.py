@@ -0,0 +1,123 @@
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; uploads are rejected without it
+    Image = ImageOps = None
+
+IMAGE_PREFIX = 'images'
+RENDITION_FORMAT = 'jpg'
+# Longest-edge bounds; images are scaled down to fit, never up
+RENDITIONS = {
+    'thumb': (160, 120),
+    'card': (480, 360),
+    'full': (1600, 1200),
+}
+
+_executor = None
+
+
+class ImageProcessingError(Exception):
+    pass
+
+
+def processing_available():
+    return Image is not None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_WORKERS', 4), thread_name_prefix='image-rendition'
+        )
+    return _executor
+
+
+def rendition_name(content_hash, rendition):
+    return f'{IMAGE_PREFIX}/{content_hash[:2]}/{content_hash}/{rendition}.{RENDITION_FORMAT}'
+
+
+def rendition_urls(content_hash):
+    """Returns {rendition: url} for an uploaded image, or None for an external URL"""
+    if not content_hash:
+        return None
+    return {rendition: default_storage.url(rendition_name(content_hash, rendition)) for rendition in RENDITIONS}
+
+
+def max_pixels():
+    return getattr(settings, 'IMAGE_MAX_PIXELS', 40_000_000)
+
+
+def open_image(data):
+    """
+    Decodes and verifies uploaded bytes, raising ImageProcessingError if
+    unusable. The pixel count is checked from the header before any pixel
+    data is decoded.
+    """
+    try:
+        Image.open(io.BytesIO(data)).verify()
+        # verify() leaves the image unusable, so decode again for rendering
+        image = Image.open(io.BytesIO(data))
+        width, height = image.size
+        if width * height > max_pixels():
+            image.close()
+            raise ImageProcessingError(f'Images may have at most {max_pixels()} pixels; this one has {width * height}.')
+        image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as exc:
+        raise ImageProcessingError(f'Not a valid image: {exc}')
+    return image
+
+
+def render(image, size):
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    image.thumbnail(size, Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def write_rendition(image, content_hash, rendition):
+    name = rendition_name(content_hash, rendition)
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(render(image, RENDITIONS[rendition])))
+
+
+def store_images(blobs):
+    """
+    Stores uploaded image bytes under their SHA-256 and returns the hashes.
+
+    `blobs` is consumed one image at a time: each is decoded, its missing
+    renditions rendered in parallel on the worker pool (Pillow releases the
+    GIL while resizing and encoding) and the decoded image released before
+    the next is read. Images already stored by any listing are not decoded
+    again.
+    """
+    if not processing_available():
+        raise ImageProcessingError('Image uploads require Pillow to be installed.')
+    hashes = []
+    executor = get_executor()
+    for data in blobs:
+        content_hash = hashlib.sha256(data).hexdigest()
+        if content_hash not in hashes:
+            missing = [r for r in RENDITIONS if not default_storage.exists(rendition_name(content_hash, r))]
+            if missing:
+                image = open_image(data)
+                try:
+                    for future in [executor.submit(write_rendition, image, content_hash, r) for r in missing]:
+                        future.result()
+                finally:
+                    image.close()
+        hashes.append(content_hash)
+    return hashes
@@ -0,0 +1,204 @@
+import csv
+import json
+import uuid
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .autocomplete import autocomplete
+from .clusters import add_to_clusters
+from .dashboard import invalidate_dashboards
+from .facets import add_to_facets
+from .listings import refresh_listings
+from .models import Feature, Property, PropertyImage, User
+from .saved_searches import queue_alerts
+from .search import index_properties
+from .similar import schedule_refresh
+from .trends import record_prices
+from .serializers import PropertyImportSerializer
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def split_values(value, separator):
+    """Accepts a list or a delimited string (as found in CSV cells)"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(separator) if v.strip()]
+    return [v.strip() for v in value if isinstance(v, str) and v.strip()]
+
+
+def normalize_record(record):
+    record = dict(record)
+    record['features'] = split_values(record.get('features'), ',')
+    record['images'] = split_values(record.get('images'), '|')
+    # CSV cells are always strings; treat blanks as missing values
+    for field in ('latitude', 'longitude', 'address', 'area', 'description'):
+        if record.get(field) == '':
+            record.pop(field)
+    return record
+
+
+def resolve_features(names):
+    """Returns {name: feature id}, creating missing features in one INSERT"""
+    if not names:
+        return {}
+    existing = dict(Feature.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in names if name not in existing]
+    if missing:
+        Feature.objects.bulk_create([Feature(name=name) for name in missing])
+        existing.update(Feature.objects.filter(name__in=missing).values_list('name', 'id'))
+    return existing
+
+
+def insert_properties(properties):
+    """
+    Inserts properties in one multi-row INSERT and sets their primary keys.
+
+    Backends that cannot return ids from it (MySQL) tag the rows with a batch
+    marker and read the ids back; auto-increment values follow row order
+    within a statement, so sorting by id restores the insert order.
+    """
+    now = timezone.now()
+    for property_obj in properties:
+        property_obj.created_at = property_obj.updated_at = now
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Property.objects.bulk_create(properties)
+    batch = uuid.uuid4()
+    for property_obj in properties:
+        property_obj.import_batch = batch
+    Property.objects.bulk_create(properties)
+    ids = Property.objects.filter(import_batch=batch).order_by('id').values_list('id', flat=True)
+    for property_obj, property_id in zip(properties, ids):
+        property_obj.pk = property_id
+    return properties
+
+
+def import_chunk(records, start_index, default_owner=None):
+    """Validates and stores one chunk; returns (created ids, errors)"""
+    errors = []
+    valid = []
+    owner_ids = set()
+    for offset, record in enumerate(records):
+        index = start_index + offset
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': ['Expected an object.']}})
+            continue
+        record = normalize_record(record)
+        serializer = PropertyImportSerializer(data=record)
+        if not serializer.is_valid():
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+        owner_id = record.get('owner') or (default_owner.id if default_owner else None)
+        if not owner_id:
+            errors.append({'index': index, 'errors': {'owner': ['This field is required.']}})
+            continue
+        owner_ids.add(str(owner_id))
+        valid.append((index, str(owner_id), serializer.validated_data))
+
+    known_owners = {
+        str(pk) for pk in User.objects.filter(pk__in=[o for o in owner_ids if o.isdigit()]).values_list('pk', flat=True)
+    }
+    rows = []
+    for index, owner_id, data in valid:
+        if owner_id not in known_owners:
+            errors.append({'index': index, 'errors': {'owner': ['User not found.']}})
+            continue
+        rows.append((owner_id, data))
+    if not rows:
+        return [], errors
+
+    properties = store_properties(rows)
+    return [p.id for p in properties], errors
+
+
+def store_properties(rows):
+    """
+    Writes already-validated rows in one transaction and returns the properties.
+
+    `rows` is a list of (owner id, data) pairs where data holds Property fields
+    plus optional `features` (names) and `images` (URLs).
+    """
+    with transaction.atomic():
+        feature_ids = resolve_features(sorted({name for _, data in rows for name in data.get('features', [])}))
+        properties = []
+        for owner_id, data in rows:
+            fields = {k: v for k, v in data.items() if k not in ('features', 'images')}
+            property_obj = Property(owner_id=int(owner_id), **fields)
+            property_obj.compute_geohash()
+            properties.append(property_obj)
+        insert_properties(properties)
+
+        through = Property.features.through
+        links = []
+        images = []
+        property_features = {}
+        for property_obj, (_, data) in zip(properties, rows):
+            ids = list(dict.fromkeys(feature_ids[name] for name in data.get('features', [])))
+            property_features[property_obj.id] = ids
+            links.extend(through(property_id=property_obj.id, feature_id=feature_id) for feature_id in ids)
+            images.extend(PropertyImage(property_id=property_obj.id, image=url) for url in data.get('images', []))
+        through.objects.bulk_create(links, batch_size=1000)
+        PropertyImage.objects.bulk_create(images, batch_size=1000)
+
+        # bulk_create does not send signals, so keep the derived tables in step here
+        refresh_listings(property_obj.id for property_obj in properties)
+        record_prices((property_obj, None) for property_obj in properties)
+        index_properties(properties)
+        add_to_facets(properties, property_features)
+        add_to_clusters(properties)
+        queue_alerts(properties, property_features)
+        schedule_refresh(property_obj.id for property_obj in properties)
+        for property_obj in properties:
+            autocomplete.adjust('city', property_obj.city, 1)
+            autocomplete.adjust('area', property_obj.area, 1)
+        for name, feature_id in feature_ids.items():
+            uses = sum(feature_id in ids for ids in property_features.values())
+            if uses:
+                autocomplete.adjust('feature', name, uses)
+    invalidate_dashboards({property_obj.owner_id for property_obj in properties})
+    return properties
+
+
+def import_properties(records, default_owner=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Imports an iterable of property dicts in chunks of `chunk_size`.
+
+    Each chunk is written in its own transaction. Invalid rows are reported by
+    their position in `records` and do not stop the import.
+    """
+    result = {'created': 0, 'failed': 0, 'errors': []}
+    chunk = []
+    start = 0
+    for index, record in enumerate(records):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            _merge(result, import_chunk(chunk, start, default_owner))
+            start = index + 1
+            chunk = []
+    if chunk:
+        _merge(result, import_chunk(chunk, start, default_owner))
+    return result
+
+
+def _merge(result, chunk_result):
+    created, errors = chunk_result
+    result['created'] += len(created)
+    result['failed'] += len(errors)
+    result['errors'].extend(errors)
+
+
+def read_records(path):
+    """Yields records from a .csv, .ndjson/.jsonl (streamed) or .json array file"""
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+    elif path.endswith(('.ndjson', '.jsonl')):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
@@ -0,0 +1,130 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+
+from .models import Property, PropertyImage, PropertyListing
+
+REBUILD_CHUNK_SIZE = 1000
+
+# Columns the serializer fast path reads besides property_id; owner_id
+# rather than owner so values() and model instances yield the same keys
+LISTING_FIELDS = (
+    'title', 'price', 'city', 'address', 'area', 'latitude', 'longitude', 'full_address',
+    'has_location', 'type', 'description', 'owner_id', 'owner_email', 'owner_name', 'owner_first_name',
+    'owner_last_name', 'features', 'images', 'created_at', 'updated_at',
+)
+
+
+def build_listings(property_ids):
+    """Returns unsaved PropertyListing rows for `property_ids`, read from the source tables in three queries"""
+    features = {}
+    for property_id, feature_id, name in (
+        Property.features.through.objects.filter(property_id__in=property_ids)
+        .order_by('feature_id')
+        .values_list('property_id', 'feature_id', 'feature__name')
+    ):
+        features.setdefault(property_id, []).append([feature_id, name])
+    images = {}
+    for image_id, property_id, url, content_hash in (
+        PropertyImage.objects.filter(property_id__in=property_ids)
+        .order_by('id')
+        .values_list('id', 'property_id', 'image', 'content_hash')
+    ):
+        images.setdefault(property_id, []).append([image_id, url, content_hash])
+
+    listings = []
+    for row in Property.objects.filter(id__in=property_ids).values(
+        'id', 'title', 'price', 'city', 'address', 'area', 'latitude', 'longitude', 'type', 'description',
+        'created_at', 'updated_at', 'owner_id', 'owner__email', 'owner__name', 'owner__first_name',
+        'owner__last_name',
+    ):
+        property_images = images.get(row['id'], [])
+        listings.append(PropertyListing(
+            property_id=row['id'],
+            title=row['title'],
+            price=row['price'],
+            city=row['city'],
+            address=row['address'],
+            area=row['area'],
+            latitude=row['latitude'],
+            longitude=row['longitude'],
+            full_address=Property.format_full_address(row['address'], row['area'], row['city']),
+            has_location=row['latitude'] is not None and row['longitude'] is not None,
+            type=row['type'],
+            description=row['description'],
+            owner_id=row['owner_id'],
+            owner_email=row['owner__email'],
+            owner_name=row['owner__name'],
+            owner_first_name=row['owner__first_name'],
+            owner_last_name=row['owner__last_name'],
+            features=features.get(row['id'], []),
+            images=property_images,
+            image_count=len(property_images),
+            cover_image=property_images[0][1] if property_images else '',
+            created_at=row['created_at'],
+            updated_at=row['updated_at'],
+        ))
+    return listings
+
+
+def refresh_listings(property_ids):
+    """
+    Rewrites the listing rows of `property_ids` from the source tables and
+    returns them. Runs in the caller's transaction, so the read table
+    commits or rolls back with the write that changed it.
+    """
+    property_ids = list(property_ids)
+    if not property_ids:
+        return []
+    with transaction.atomic():
+        listings = build_listings(property_ids)
+        # Delete and insert rather than an upsert: MySQL's ON DUPLICATE KEY
+        # UPDATE cannot be targeted at the primary key through bulk_create
+        PropertyListing.objects.filter(property_id__in=property_ids).delete()
+        PropertyListing.objects.bulk_create(listings)
+    return listings
+
+
+def rebuild_listings(chunk_size=REBUILD_CHUNK_SIZE):
+    """Repopulates the whole read table; returns the number of rows written"""
+    ids = list(Property.objects.order_by('id').values_list('id', flat=True))
+    with transaction.atomic():
+        PropertyListing.objects.all().delete()
+        for start in range(0, len(ids), chunk_size):
+            PropertyListing.objects.bulk_create(build_listings(ids[start:start + chunk_size]))
+    return len(ids)
+
+
+def listing_rows_queryset(property_ids, fields=LISTING_FIELDS):
+    return PropertyListing.objects.filter(property_id__in=property_ids).values('property_id', *fields)
+
+
+def listing_rows(property_ids, fields=LISTING_FIELDS):
+    """
+    Returns `fields` of the listing rows of `property_ids` as dicts in one
+    query. Rows missing from the read table (e.g. before the first rebuild)
+    are built and stored on the way.
+    """
+    rows = list(listing_rows_queryset(property_ids, fields))
+    found = {row['property_id'] for row in rows}
+    missing = [property_id for property_id in property_ids if property_id not in found]
+    if missing:
+        # Use the rows just built: a replica may not have them yet
+        rows.extend(listing_values(listing, fields) for listing in refresh_listings(missing))
+    return rows
+
+
+async def alisting_rows(property_ids, fields=LISTING_FIELDS):
+    """Async ORM variant of listing_rows"""
+    rows = [row async for row in listing_rows_queryset(property_ids, fields)]
+    found = {row['property_id'] for row in rows}
+    missing = [property_id for property_id in property_ids if property_id not in found]
+    if missing:
+        listings = await sync_to_async(refresh_listings)(missing)
+        rows.extend(listing_values(listing, fields) for listing in listings)
+    return rows
+
+
+def listing_values(listing, fields):
+    row = {field: getattr(listing, field) for field in fields}
+    row['property_id'] = listing.property_id
+    return row
@@ -0,0 +1,132 @@
+import json
+import statistics
+import subprocess
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.cache import property_cache
+from core.models import Property, User
+
+# Maximum queries per request; exceeding one fails the run
+QUERY_BUDGETS = {
+    'list_cold': 4,
+    # The page itself plus the COUNT/MAX(updated_at) query behind its ETag
+    'list_warm': 2,
+    'list_filtered': 4,
+    'list_search': 4,
+    'detail': 4,
+    'create': 40,
+    'update': 40,
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Times the main property endpoints, checks query budgets and writes results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', default='bench_results.json')
+
+    def handle(self, *args, **options):
+        sample = Property.objects.order_by('-id').first()
+        owner = User.objects.order_by('id').first()
+        if sample is None or owner is None:
+            raise CommandError('No data to benchmark; run generate_data first')
+
+        self.client = Client(HTTP_HOST='localhost')
+        self.iterations = options['iterations']
+        cases = {
+            'list_cold': ('get', '/api/properties/', None, property_cache.clear),
+            'list_warm': ('get', '/api/properties/', None, None),
+            'list_filtered': ('get', '/api/properties/', {
+                'city': sample.city, 'type': sample.type, 'min_price': '1000', 'ordering': 'price',
+            }, property_cache.clear),
+            'list_search': ('get', '/api/properties/', {'q': sample.title.split()[0]}, property_cache.clear),
+            'detail': ('get', f'/api/properties/{sample.id}/', None, property_cache.clear),
+            'create': ('post', '/api/properties/', {
+                'title': 'Benchmark listing', 'price': '25000', 'city': sample.city, 'type': 'Rent',
+                'owner': owner.id, 'features': ['Gym', 'Parking', 'Benchmark'],
+                'images': ['https://example.com/bench.jpg'],
+            }, None),
+            'update': ('patch', f'/api/properties/{sample.id}/', {
+                'description': 'Benchmark edit', 'features': ['Gym', 'Pool'],
+            }, None),
+        }
+
+        results = {}
+        failures = []
+        for name, (method, path, data, before) in cases.items():
+            result = self.run_case(method, path, data, before)
+            result['budget'] = QUERY_BUDGETS[name]
+            results[name] = result
+            status = 'ok'
+            if result['queries'] > result['budget']:
+                status = 'OVER BUDGET'
+                failures.append(name)
+            self.stdout.write(
+                f"{name:<14} median {result['median_ms']:8.2f} ms  p95 {result['p95_ms']:8.2f} ms  "
+                f"queries {result['queries']:>3}/{result['budget']:<3} {status}"
+            )
+
+        report = {
+            'timestamp': timezone.now().isoformat(),
+            'commit': self.git_commit(),
+            'database': connection.vendor,
+            'properties': Property.objects.count(),
+            'iterations': self.iterations,
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"Wrote {options['output']}")
+        if failures:
+            raise CommandError(f"Query budget exceeded: {', '.join(failures)}")
+
+    def run_case(self, method, path, data, before):
+        timings = []
+        queries = 0
+        for _ in range(self.iterations):
+            if before:
+                before()
+            try:
+                # Writes are rolled back so every iteration sees the same data
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as context:
+                        start = time.perf_counter()
+                        if method == 'get':
+                            response = self.client.get(path, data)
+                        else:
+                            response = getattr(self.client, method)(path, json.dumps(data), content_type='application/json')
+                        timings.append((time.perf_counter() - start) * 1000)
+                    if response.status_code >= 400:
+                        raise CommandError(f'{method.upper()} {path} returned {response.status_code}')
+                    # Ignore the savepoint bookkeeping added by the rollback wrapper
+                    queries = max(queries, len([
+                        q for q in context.captured_queries if 'SAVEPOINT' not in q['sql'].upper()
+                    ]))
+                    raise Rollback
+            except Rollback:
+                pass
+        timings.sort()
+        return {
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'queries': queries,
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
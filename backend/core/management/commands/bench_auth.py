@@ -0,0 +1,67 @@
+import base64
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.authentication import SignedTokenAuthentication, issue_token, token_cache_key, token_settings, user_cache_key
+from core.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compares per-request CPU time of Basic and signed token authentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.report(options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def report(self, count):
+        password = 'bench-password'
+        user = User.objects.create_user(
+            username='auth-bench@example.com', email='auth-bench@example.com', password=password, name='Bench User'
+        )
+        token, _ = issue_token(user)
+        _, key = SignedTokenAuthentication().authenticate(self.request(f'Bearer {token}'))
+        basic = 'Basic ' + base64.b64encode(f'{user.email}:{password}'.encode()).decode()
+        cache = caches[token_settings()['CACHE_ALIAS']]
+
+        def drop_cache():
+            cache.delete_many([token_cache_key(key), user_cache_key(user.pk)])
+
+        cases = [
+            ('basic', BasicAuthentication(), basic, None),
+            ('token (cached)', SignedTokenAuthentication(), f'Bearer {token}', None),
+            ('token (cache miss)', SignedTokenAuthentication(), f'Bearer {token}', drop_cache),
+        ]
+        for label, authenticator, header, before in cases:
+            cpu = wall = 0.0
+            for _ in range(count):
+                request = self.request(header)
+                if before:
+                    before()
+                cpu_start, wall_start = time.process_time(), time.perf_counter()
+                result = authenticator.authenticate(request)
+                cpu += time.process_time() - cpu_start
+                wall += time.perf_counter() - wall_start
+                assert result is not None and result[0].pk == user.pk
+            self.stdout.write(
+                f'{label:<20} cpu {cpu / count * 1000:8.3f} ms/request  wall {wall / count * 1000:8.3f} ms/request'
+            )
+
+    def request(self, header):
+        return Request(APIRequestFactory().get('/api/properties/', HTTP_AUTHORIZATION=header))
@@ -0,0 +1,107 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+from core.models import Property
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares concurrent throughput of the sync DRF read endpoints under WSGI '
+        'with the async endpoints under ASGI, calling both applications in-process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+
+    def handle(self, *args, **options):
+        sample = Property.objects.order_by('-id').first()
+        if sample is None:
+            raise CommandError('No data to benchmark; run generate_data first')
+        total = options['requests']
+        concurrency = options['concurrency']
+        scenarios = [
+            ('list', '/api/properties/', '/api/async/properties/'),
+            ('search', f'/api/properties/?q={sample.city}', f'/api/async/properties/?q={sample.city}'),
+            ('detail', f'/api/properties/{sample.id}/', f'/api/async/properties/{sample.id}/'),
+            ('facets', '/api/properties/facets/', '/api/async/properties/facets/'),
+        ]
+        self.stdout.write(f'{total} requests per scenario, concurrency {concurrency}')
+        for name, sync_path, async_path in scenarios:
+            wsgi_rps = self.run_wsgi(sync_path, total, concurrency)
+            asgi_rps = asyncio.run(self.run_asgi(async_path, total, concurrency))
+            self.stdout.write(
+                f'{name:<8} WSGI {wsgi_rps:8.1f} req/s   ASGI {asgi_rps:8.1f} req/s   '
+                f'ratio {asgi_rps / wsgi_rps:5.2f}'
+            )
+
+    def run_wsgi(self, path, total, concurrency):
+        application = get_wsgi_application()
+        url = urlsplit(path)
+
+        def request(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': io.StringIO(),
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            statuses = []
+            body = b''.join(application(environ, lambda status, headers: statuses.append(status)))
+            if not statuses[0].startswith('200'):
+                raise CommandError(f'GET {path} returned {statuses[0]}: {body[:200]!r}')
+            connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(request, range(total)))
+        return total / (time.perf_counter() - start)
+
+    async def run_asgi(self, path, total, concurrency):
+        application = get_asgi_application()
+        url = urlsplit(path)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(),
+                'query_string': url.query.encode(), 'headers': [(b'host', b'localhost')],
+                'server': ('localhost', 80), 'client': ('127.0.0.1', 0),
+            }
+            messages = []
+            body_sent = False
+            finished = asyncio.Event()
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Django listens for a disconnect while the view runs
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if message['type'] == 'http.response.body' and not message.get('more_body'):
+                    finished.set()
+
+            async with semaphore:
+                await application(scope, receive, send)
+            status = messages[0]['status']
+            if status != 200:
+                raise CommandError(f'GET {path} returned {status}')
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request() for _ in range(total)))
+        return total / (time.perf_counter() - start)
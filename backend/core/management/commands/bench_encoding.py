@@ -0,0 +1,60 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.encoding import ColumnarJSONRenderer, msgpack, pack
+from core.models import Property
+from core.serializers import build_property_dicts, build_sparse_property_dicts, parse_fieldset
+
+CARD_FIELDS = 'id,title,price,city,type,cover_image'
+
+
+class Command(BaseCommand):
+    help = 'Compares payload size and encode time of the full, sparse and compact property list encodings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[20, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--fields', default=CARD_FIELDS, help='Sparse fieldset to compare (default: card grid)')
+
+    def handle(self, *args, **options):
+        fieldset = parse_fieldset({'fields': options['fields']})
+        encoders = [
+            ('json', JSONRenderer().render),
+            ('columnar', ColumnarJSONRenderer().render),
+        ]
+        if msgpack is not None:
+            encoders.append(('msgpack', pack))
+        else:
+            self.stdout.write('msgpack not installed; skipping the MessagePack encoding')
+
+        for rows in options['rows']:
+            ids = list(Property.objects.order_by('id').values_list('id', flat=True)[:rows])
+            if len(ids) < rows:
+                raise CommandError(f'Only {len(ids)} properties exist; run generate_data first.')
+            full_build, full = self.time_best(options['repeat'], lambda: build_property_dicts(ids))
+            sparse_build, sparse = self.time_best(options['repeat'], lambda: build_sparse_property_dicts(ids, fieldset))
+            for data in full.values():
+                data.pop('_updated_at')
+            self.stdout.write(
+                f'{rows} rows: build full {full_build * 1000:.1f} ms, sparse {sparse_build * 1000:.1f} ms'
+            )
+            for shape, results in (('full', list(full.values())), ('sparse', list(sparse.values()))):
+                page = {'next': None, 'previous': None, 'results': results}
+                for name, encode in encoders:
+                    elapsed, payload = self.time_best(options['repeat'], lambda: encode(page))
+                    self.stdout.write(
+                        f'  {shape:<6} {name:<9} {len(payload):>10} bytes  '
+                        f'{len(gzip.compress(payload)):>9} gzipped  {elapsed * 1000:8.2f} ms'
+                    )
+
+    def time_best(self, repeat, func):
+        best = result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
@@ -0,0 +1,82 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Feature, Property, PropertyImage, User
+from core.serializers import PropertySerializer, build_property_dicts
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compares PropertySerializer with the values() fast path on temporary data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        for rows in options['rows']:
+            try:
+                with transaction.atomic():
+                    ids = self.create_rows(rows)
+                    self.report(rows, ids, options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def create_rows(self, rows):
+        rng = random.Random(rows)
+        owner = User.objects.create_user(
+            username='bench@example.com', email='bench@example.com', password=None, name='Bench User'
+        )
+        features = Feature.objects.bulk_create([Feature(name=f'Bench feature {i}') for i in range(20)])
+        properties = Property.objects.bulk_create(
+            Property(
+                title=f'Bench property {i}', price=Decimal(rng.randint(5000, 50000000)), city='Mumbai',
+                address=f'{i} Bench Road', area='Andheri', type='Buy', owner=owner,
+                latitude=Decimal('19.0') + Decimal(rng.randint(0, 99999)) / 1000000,
+                longitude=Decimal('72.8') + Decimal(rng.randint(0, 99999)) / 1000000,
+                description='Benchmark listing ' * 10,
+            )
+            for i in range(rows)
+        )
+        through = Property.features.through
+        through.objects.bulk_create(
+            through(property_id=p.id, feature_id=f.id)
+            for p in properties for f in rng.sample(features, 5)
+        )
+        PropertyImage.objects.bulk_create(
+            PropertyImage(property_id=p.id, image=f'https://example.com/{p.id}/{n}.jpg')
+            for p in properties for n in range(3)
+        )
+        return [p.id for p in properties]
+
+    def time_best(self, repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def report(self, rows, ids, repeat):
+        def serializer():
+            queryset = Property.objects.filter(id__in=ids).select_related('owner').prefetch_related('features', 'images')
+            return PropertySerializer(queryset, many=True).data
+
+        def fast_path():
+            return build_property_dicts(ids)
+
+        slow = self.time_best(repeat, serializer)
+        fast = self.time_best(repeat, fast_path)
+        self.stdout.write(
+            f'{rows:>7} rows  PropertySerializer {slow * 1000:9.1f} ms  '
+            f'fast path {fast * 1000:9.1f} ms  speedup {slow / fast:5.1f}x'
+        )
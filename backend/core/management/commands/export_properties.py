@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, stream_export
+from core.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Streams every property to NDJSON or CSV with bounded memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', help='File to write (defaults to stdout)')
+        parser.add_argument('--after', type=int, help='Resume after this property id')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+        chunks = stream_export(Property.objects.all(), options['export_format'], options['after'], options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        # Append when resuming so the file picks up where it stopped
+        mode = 'a' if options['after'] is not None else 'w'
+        with open(options['output'], mode, encoding='utf-8', newline='') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Exported to {options['output']}"))
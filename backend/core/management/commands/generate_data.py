@@ -0,0 +1,145 @@
+import math
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from core.ingest import resolve_features, store_properties
+from core.models import ContactMessage, User
+from core.similar import refresh_queue
+
+# (city, weight, centre latitude, centre longitude, areas)
+CITIES = [
+    ('Mumbai', 20, 19.0760, 72.8777, ['Bandra West', 'Andheri East', 'Powai', 'Worli', 'Juhu', 'Colaba']),
+    ('Bangalore', 18, 12.9716, 77.5946, ['Koramangala', 'Whitefield', 'Indiranagar', 'HSR Layout', 'Hebbal']),
+    ('Delhi', 15, 28.6139, 77.2090, ['Dwarka', 'Saket', 'Vasant Kunj', 'Rohini', 'Connaught Place']),
+    ('Pune', 12, 18.5204, 73.8567, ['Kothrud', 'Hinjewadi', 'Baner', 'Viman Nagar', 'Hadapsar']),
+    ('Hyderabad', 12, 17.3850, 78.4867, ['Gachibowli', 'Madhapur', 'Banjara Hills', 'Kondapur']),
+    ('Chennai', 10, 13.0827, 80.2707, ['Adyar', 'Velachery', 'Anna Nagar', 'OMR']),
+    ('Kolkata', 7, 22.5726, 88.3639, ['Salt Lake', 'New Town', 'Ballygunge', 'Park Street']),
+    ('Ahmedabad', 6, 23.0225, 72.5714, ['Satellite', 'Bopal', 'Prahlad Nagar', 'Navrangpura']),
+]
+
+# (type, weight, median price, log-normal sigma)
+TYPES = [
+    ('Buy', 35, 9000000, 0.7),
+    ('Rent', 35, 30000, 0.6),
+    ('Commercial', 8, 25000000, 0.9),
+    ('PG', 8, 12000, 0.4),
+    ('Plot', 5, 6000000, 0.9),
+    ('Luxury', 4, 60000000, 0.6),
+    ('ShortStay', 3, 4000, 0.5),
+    ('New', 2, 12000000, 0.6),
+]
+
+FEATURES = [
+    '1 BHK', '2 BHK', '3 BHK', '4 BHK', 'Studio', 'Gym', 'Parking', 'Pool', 'Garden', 'WiFi',
+    'Furnished', 'Semi Furnished', 'Sea View', 'Lift', 'Power Backup', 'Security', 'Clubhouse',
+    'Balcony', 'Pet Friendly', 'Near Metro',
+]
+
+ADJECTIVES = ['Spacious', 'Modern', 'Cozy', 'Sunlit', 'Premium', 'Renovated', 'Quiet', 'Elegant']
+NOUNS = {
+    'Buy': 'Apartment', 'Rent': 'Flat', 'Commercial': 'Office Space', 'PG': 'PG Room',
+    'Plot': 'Plot', 'Luxury': 'Penthouse', 'ShortStay': 'Studio', 'New': 'Apartment',
+}
+WORDS = (
+    'bright airy well maintained close to schools hospitals markets metro station park lake view '
+    'corner unit gated society covered parking round the clock security modular kitchen wooden '
+    'flooring vastu compliant east facing ready to move newly painted large windows'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Generates seeded synthetic users, properties, features, images and contact messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--properties', type=int, default=10000)
+        parser.add_argument('--messages', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        owners = self.create_users(rng, options['users'], options['seed'])
+        resolve_features(FEATURES)
+        # Neighbour lists are refreshed once, after the last chunk
+        with refresh_queue.hold():
+            property_owners = self.create_properties(rng, owners, options['properties'], options['chunk_size'])
+        self.create_messages(rng, property_owners, options['messages'], options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {len(owners)} users, {len(property_owners)} properties, {options['messages']} messages"
+        ))
+
+    def create_users(self, rng, count, seed):
+        # Hashing once keeps generation fast; every synthetic user shares the password
+        password = make_password('password123')
+        users = []
+        for i in range(count):
+            first = rng.choice(['Aarav', 'Diya', 'Ishaan', 'Kavya', 'Rohan', 'Sneha', 'Vikram', 'Anjali'])
+            last = rng.choice(['Sharma', 'Patel', 'Iyer', 'Reddy', 'Singh', 'Das', 'Mehta', 'Nair'])
+            email = f'seed{seed}-user{i}@example.com'
+            users.append(User(
+                username=email, email=email, name=f'{first} {last}',
+                first_name=first, last_name=last, password=password,
+            ))
+        User.objects.bulk_create(users, batch_size=1000, ignore_conflicts=True)
+        emails = [user.email for user in users]
+        return list(User.objects.filter(email__in=emails).values_list('id', flat=True))
+
+    def random_property(self, rng):
+        city, _, lat, lng, areas = rng.choices(CITIES, weights=[c[1] for c in CITIES])[0]
+        property_type, _, median, sigma = rng.choices(TYPES, weights=[t[1] for t in TYPES])[0]
+        price = Decimal(round(median * math.exp(rng.gauss(0, sigma)))).quantize(Decimal('1'))
+        area = rng.choice(areas)
+        features = rng.sample(FEATURES, rng.randint(0, 8))
+        data = {
+            'title': f'{rng.choice(ADJECTIVES)} {NOUNS[property_type]} in {area}',
+            'price': max(price, Decimal(1000)),
+            'city': city,
+            'area': area,
+            'address': f'{rng.randint(1, 500)}, {rng.choice(["MG Road", "Station Road", "Main Street", "Ring Road"])}',
+            'type': property_type,
+            'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))),
+            'features': features,
+            'images': [f'https://picsum.photos/seed/{rng.randint(1, 10**9)}/800/600' for _ in range(rng.randint(1, 6))],
+        }
+        # Most listings are geocoded, scattered within about 15 km of the city centre
+        if rng.random() < 0.85:
+            data['latitude'] = Decimal(f'{lat + rng.gauss(0, 0.06):.6f}')
+            data['longitude'] = Decimal(f'{lng + rng.gauss(0, 0.06):.6f}')
+        return data
+
+    def create_properties(self, rng, owners, count, chunk_size):
+        # A few agencies own most listings, as in production
+        weights = [1.0 / (rank + 1) for rank in range(len(owners))]
+        property_owners = {}
+        for start in range(0, count, chunk_size):
+            size = min(chunk_size, count - start)
+            rows = [(owner, self.random_property(rng)) for owner in rng.choices(owners, weights=weights, k=size)]
+            property_owners.update((p.id, p.owner_id) for p in store_properties(rows))
+            self.stdout.write(f'  {len(property_owners)}/{count} properties')
+        return property_owners
+
+    def create_messages(self, rng, property_owners, count, chunk_size):
+        """`property_owners` maps property id to owner id, which messages copy for the inbox"""
+        if not property_owners:
+            return
+        property_ids = list(property_owners)
+        # Enquiries concentrate on a small share of popular listings
+        popular = rng.sample(property_ids, max(1, len(property_ids) // 20))
+        for start in range(0, count, chunk_size):
+            size = min(chunk_size, count - start)
+            messages = []
+            for i in range(size):
+                property_id = rng.choice(popular) if rng.random() < 0.6 else rng.choice(property_ids)
+                messages.append(ContactMessage(
+                    property_id=property_id,
+                    owner_id=property_owners[property_id],
+                    name=f'Visitor {start + i}',
+                    email=f'visitor{start + i}@example.com',
+                    message=' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))),
+                ))
+            ContactMessage.objects.bulk_create(messages)
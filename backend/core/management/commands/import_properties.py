@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ingest import DEFAULT_CHUNK_SIZE, import_properties, read_records
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = 'Imports properties from a CSV, NDJSON or JSON file in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--owner', help='Email of the owner for rows without an owner id')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--errors', help='Write per-row validation errors to this JSON file')
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner']:
+            try:
+                owner = User.objects.get(email=options['owner'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['owner']} not found")
+        try:
+            result = import_properties(read_records(options['path']), owner, options['chunk_size'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read {options['path']}: {exc}")
+
+        if options['errors']:
+            with open(options['errors'], 'w', encoding='utf-8') as f:
+                json.dump(result['errors'], f, indent=2)
+        else:
+            for error in result['errors'][:20]:
+                self.stderr.write(f"Row {error['index']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(f"Created {result['created']} properties, {result['failed']} rows failed"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the facet count tables from the Property table'
+
+    def handle(self, *args, **options):
+        rebuild_facets()
+        self.stdout.write(self.style.SUCCESS('Rebuilt facet counts'))
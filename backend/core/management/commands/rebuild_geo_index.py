@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core import geo
+from core.clusters import rebuild_clusters
+from core.models import Property
+
+
+class Command(BaseCommand):
+    help = 'Recomputes property geohashes and rebuilds the map cluster table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        batch = []
+        updated = 0
+        properties = Property.objects.only('id', 'latitude', 'longitude', 'geohash').order_by('id')
+        for property_obj in properties.iterator(chunk_size=chunk_size):
+            geohash = geo.encode(property_obj.latitude, property_obj.longitude) if property_obj.has_location else ''
+            if geohash != property_obj.geohash:
+                property_obj.geohash = geohash
+                batch.append(property_obj)
+            if len(batch) >= chunk_size:
+                Property.objects.bulk_update(batch, ['geohash'])
+                updated += len(batch)
+                batch = []
+        if batch:
+            Property.objects.bulk_update(batch, ['geohash'])
+            updated += len(batch)
+        rebuild_clusters()
+        self.stdout.write(self.style.SUCCESS(f'Updated {updated} geohashes and rebuilt map clusters'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.listings import REBUILD_CHUNK_SIZE, rebuild_listings
+
+
+class Command(BaseCommand):
+    help = 'Repopulates the denormalized PropertyListing read table from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=REBUILD_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        count = rebuild_listings(chunk_size=max(options['chunk_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} listing rows'))
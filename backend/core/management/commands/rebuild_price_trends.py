@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.trends import rebuild_trends
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily and monthly market trend rollups from the price history'
+
+    def handle(self, *args, **options):
+        count = rebuild_trends()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} trend rows'))
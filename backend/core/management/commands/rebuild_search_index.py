@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.models import Property
+from core.search import index_properties
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the property search token index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        chunk = []
+        total = 0
+        for property_obj in Property.objects.order_by('id').iterator(chunk_size=chunk_size):
+            chunk.append(property_obj)
+            if len(chunk) >= chunk_size:
+                index_properties(chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            index_properties(chunk)
+            total += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} properties'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.similar import SimilarityUnavailable, rebuild_similar
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the similar-listings table from property vectors (requires NumPy)'
+
+    def handle(self, *args, **options):
+        try:
+            created = rebuild_similar()
+        except SimilarityUnavailable as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f'Stored {created} neighbour rows'))
@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger('core.slow_queries')
+
+# Upper bounds (seconds) of the latency histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+# Recent samples kept per view for the quantile summary
+WINDOW_SIZE = 1024
+
+
+class RequestMetrics:
+    """Timings collected while handling a single request"""
+
+    def __init__(self, slow_threshold=None):
+        self.slow_threshold = slow_threshold
+        self.queries = 0
+        self.query_time = 0.0
+        self.timings = {}
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+@contextmanager
+def measure(name):
+    """Adds the time spent in the block to the current request under `name`"""
+    metrics = current_request.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    connection.execute_wrapper hook counting the current request's queries
+    and logging slow ones. The request is found through current_request,
+    which sync_to_async copies into its worker threads, so ORM calls from
+    async views are attributed to their request as well.
+    """
+    metrics = current_request.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.queries += 1
+        metrics.query_time += elapsed
+        if metrics.slow_threshold is not None and elapsed >= metrics.slow_threshold:
+            logger.warning('Slow query (%.1f ms): %s', elapsed * 1000, sql)
+
+
+def instrument_connection(connection, **kwargs):
+    """connection_created receiver installing record_query once per connection"""
+    if record_query not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks entered earlier still pop their own hook
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class Series:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.window = deque(maxlen=WINDOW_SIZE)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                self.buckets[index] += 1
+        self.window.append(value)
+
+    def quantiles(self):
+        values = sorted(self.window)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class MetricsRegistry:
+    """In-process aggregation of request metrics, rendered for Prometheus"""
+
+    METRICS = (
+        ('request_duration_seconds', 'Total request latency'),
+        ('db_duration_seconds', 'Time spent in SQL queries per request'),
+        ('serialize_duration_seconds', 'Time spent serializing responses per request'),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._queries = {}
+
+    def observe(self, view, duration, metrics):
+        with self._lock:
+            values = {
+                'request_duration_seconds': duration,
+                'db_duration_seconds': metrics.query_time,
+                'serialize_duration_seconds': metrics.timings.get('serialize', 0.0),
+            }
+            for name, value in values.items():
+                self._series.setdefault((name, view), Series()).observe(value)
+            self._queries[view] = self._queries.get(view, 0) + metrics.queries
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self._queries.clear()
+
+    def render(self, extra_gauges=()):
+        lines = []
+        with self._lock:
+            for name, help_text in self.METRICS:
+                metric = f'propvista_{name}'
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} histogram')
+                for (series_name, view), series in sorted(self._series.items()):
+                    if series_name != name:
+                        continue
+                    for bound, count in zip(DURATION_BUCKETS, series.buckets):
+                        lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {count}')
+                    lines.append(f'{metric}_bucket{{view="{view}",le="+Inf"}} {series.count}')
+                    lines.append(f'{metric}_sum{{view="{view}"}} {series.total:.6f}')
+                    lines.append(f'{metric}_count{{view="{view}"}} {series.count}')
+                # Quantiles over the recent window, for dashboards without histogram_quantile
+                summary = f'{metric}_recent'
+                lines.append(f'# HELP {summary} {help_text} over the last {WINDOW_SIZE} requests')
+                lines.append(f'# TYPE {summary} summary')
+                for (series_name, view), series in sorted(self._series.items()):
+                    if series_name != name:
+                        continue
+                    for q, value in series.quantiles().items():
+                        lines.append(f'{summary}{{view="{view}",quantile="{q}"}} {value:.6f}')
+            lines.append('# HELP propvista_db_queries_total SQL queries executed')
+            lines.append('# TYPE propvista_db_queries_total counter')
+            for view, count in sorted(self._queries.items()):
+                lines.append(f'propvista_db_queries_total{{view="{view}"}} {count}')
+        for name, help_text, labelled_values in extra_gauges:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in labelled_values:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,75 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestMetrics, current_request, registry
+
+
+def view_label(request):
+    """Returns 'ViewClass.action' for the resolved view, or the URL name"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    cls = getattr(func, 'cls', None) or getattr(func, 'view_class', None)
+    name = cls.__name__ if cls else getattr(func, '__name__', 'view')
+    actions = getattr(func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower())
+        if action:
+            return f'{name}.{action}'
+    return f'{name}.{request.method.lower()}'
+
+
+class PerformanceMiddleware:
+    """
+    Records SQL query count and time, serializer time and total latency for
+    each request, reports them in a Server-Timing header and aggregates them
+    per view for /api/metrics/.
+
+    Queries are counted by metrics.record_query, which CoreConfig installs on
+    every connection, including those of the threads that run async views'
+    ORM calls, and on every alias, since reads may go to replicas.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+        self.slow_threshold = threshold / 1000 if threshold is not None else None
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics(self.slow_threshold)
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics(self.slow_threshold)
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    def finish(self, request, response, metrics, duration):
+        registry.observe(view_label(request), duration, metrics)
+        timings = [f'db;dur={metrics.query_time * 1000:.1f};desc="{metrics.queries} queries"']
+        for name, seconds in metrics.timings.items():
+            timings.append(f'{name};dur={seconds * 1000:.1f}')
+        timings.append(f'total;dur={duration * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        return response
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_property_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=50)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='core.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'property'], name='searchtoken_token_idx')],
+                'constraints': [models.UniqueConstraint(fields=('property', 'token'), name='unique_property_token')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_property_geohash_mapcluster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=20)),
+                ('city', models.CharField(max_length=100)),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('type', 'city', 'price_bucket'), name='unique_facet_count')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FeatureFacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(max_length=20)),
+                ('city', models.CharField(max_length=100)),
+                ('price_bucket', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('feature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='core.feature')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('feature', 'type', 'city', 'price_bucket'), name='unique_feature_facet_count')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:55
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_facet_counts'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='feature',
+            options={'ordering': ['id']},
+        ),
+        migrations.AlterModelOptions(
+            name='propertyimage',
+            options={'ordering': ['id']},
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_property_owners(apps, schema_editor):
+    ContactMessage = apps.get_model('core', 'ContactMessage')
+    Property = apps.get_model('core', 'Property')
+    owner = Property.objects.filter(pk=OuterRef('property_id')).values('owner_id')[:1]
+    ContactMessage.objects.filter(owner__isnull=True).update(owner_id=Subquery(owner))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_feature_image_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='owner',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='received_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(copy_property_owners, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='contactmessage_inbox_idx'),
+        ),
+    ]
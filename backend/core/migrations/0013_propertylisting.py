@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_similarproperty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyListing',
+            fields=[
+                ('property', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='core.property')),
+                ('title', models.CharField(max_length=255)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('city', models.CharField(max_length=100)),
+                ('address', models.CharField(blank=True, max_length=500)),
+                ('area', models.CharField(blank=True, max_length=100)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('full_address', models.CharField(blank=True, max_length=710)),
+                ('has_location', models.BooleanField(default=False)),
+                ('type', models.CharField(max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('owner_email', models.EmailField(max_length=254)),
+                ('owner_name', models.CharField(max_length=100)),
+                ('owner_first_name', models.CharField(blank=True, max_length=150)),
+                ('owner_last_name', models.CharField(blank=True, max_length=150)),
+                ('features', models.JSONField(default=list)),
+                ('images', models.JSONField(default=list)),
+                ('image_count', models.PositiveIntegerField(default=0)),
+                ('cover_image', models.URLField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
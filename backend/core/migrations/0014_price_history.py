@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_listed_prices(apps, schema_editor):
+    # Seed the history with each existing listing's current price; run
+    # manage.py rebuild_price_trends afterwards to fill the rollups
+    Property = apps.get_model('core', 'Property')
+    PriceHistory = apps.get_model('core', 'PriceHistory')
+    rows = Property.objects.order_by('id').values_list('id', 'price', 'city', 'area', 'type', 'created_at')
+    batch = []
+    for property_id, price, city, area, property_type, created_at in rows.iterator(chunk_size=2000):
+        batch.append(PriceHistory(
+            property_id=property_id, price=price, city=city, area=area, type=property_type, changed_at=created_at,
+        ))
+        if len(batch) >= 2000:
+            PriceHistory.objects.bulk_create(batch)
+            batch = []
+    PriceHistory.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_propertylisting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('city', models.CharField(max_length=100)),
+                ('area', models.CharField(max_length=100)),
+                ('type', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('median', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('histogram', models.JSONField(default=dict)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'city', 'area', 'type', 'period_start'), name='unique_price_trend')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('previous_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('city', models.CharField(max_length=100)),
+                ('area', models.CharField(blank=True, max_length=100)),
+                ('type', models.CharField(max_length=20)),
+                ('changed_at', models.DateTimeField(db_index=True)),
+                ('property', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='price_history', to='core.property')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['property', 'changed_at'], name='pricehistory_property_idx')],
+            },
+        ),
+        migrations.RunPython(record_listed_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def copy_property_owners(apps, schema_editor):
+    # Messages written by generate_data before it set owner_id
+    ContactMessage = apps.get_model('core', 'ContactMessage')
+    Property = apps.get_model('core', 'Property')
+    owner = Property.objects.filter(pk=OuterRef('property_id')).values('owner_id')[:1]
+    ContactMessage.objects.filter(owner__isnull=True).update(owner_id=Subquery(owner))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_saved_searches'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_property_owners, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from . import geo
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     name = models.CharField(max_length=100)
@@ -13,6 +15,9 @@ class User(AbstractUser):
 class Feature(models.Model):
     name = models.CharField(max_length=100)
 
+    class Meta:
+        ordering = ['id']
+
     def __str__(self):
         return self.name
 
@@ -34,46 +39,311 @@ class Property(models.Model):
     area = models.CharField(max_length=100, blank=True)  # e.g., "Bandra West", "Koramangala"
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     type = models.CharField(max_length=20, choices=PROPERTY_TYPES)
     features = models.ManyToManyField(Feature, blank=True)
     description = models.TextField(blank=True)
     owner = models.ForeignKey('User', on_delete=models.CASCADE, related_name='properties')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Tags rows written by one bulk import on backends whose multi-row INSERT
+    # cannot return ids (MySQL), so they can be read back in insert order
+    import_batch = models.UUIDField(null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['type', 'city', 'price', 'created_at'], name='property_type_city_price_idx'),
+            models.Index(fields=['city', 'price'], name='property_city_price_idx'),
+            models.Index(fields=['created_at', 'id'], name='property_created_idx'),
+            models.Index(fields=['price', 'id'], name='property_price_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def compute_geohash(self):
+        self.geohash = geo.encode(self.latitude, self.longitude) if self.has_location else ''
+
+    def save(self, *args, **kwargs):
+        self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def format_full_address(address, area, city):
+        """Joins the non-empty address parts, falling back to the city"""
+        address_parts = []
+        if address:
+            address_parts.append(address)
+        if area:
+            address_parts.append(area)
+        if city:
+            address_parts.append(city)
+        return ', '.join(address_parts) if address_parts else city
+
     @property
     def full_address(self):
         """Returns the complete address for the property"""
-        address_parts = []
-        if self.address:
-            address_parts.append(self.address)
-        if self.area:
-            address_parts.append(self.area)
-        if self.city:
-            address_parts.append(self.city)
-        return ', '.join(address_parts) if address_parts else self.city
+        return self.format_full_address(self.address, self.area, self.city)
 
     @property
     def has_location(self):
         """Returns True if the property has valid coordinates"""
         return self.latitude is not None and self.longitude is not None
 
+class MapCluster(models.Model):
+    """
+    Pre-aggregated marker bucket for one geohash cell.
+
+    There is one row per cell prefix at every clustering precision, so a map
+    viewport at any zoom level reads a bounded number of rows.
+    """
+    cell = models.CharField(max_length=12, unique=True)
+    precision = models.PositiveSmallIntegerField()
+    center_latitude = models.FloatField()
+    center_longitude = models.FloatField()
+    count = models.PositiveIntegerField(default=0)
+    latitude_sum = models.FloatField(default=0)
+    longitude_sum = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['precision', 'center_latitude', 'center_longitude'], name='mapcluster_viewport_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.cell} ({self.count})"
+
+class FacetCount(models.Model):
+    """Number of listings for each (type, city, price bucket) combination"""
+    type = models.CharField(max_length=20)
+    city = models.CharField(max_length=100)
+    price_bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['type', 'city', 'price_bucket'], name='unique_facet_count'),
+        ]
+
+    def __str__(self):
+        return f"{self.type}/{self.city}/{self.price_bucket}: {self.count}"
+
+class FeatureFacetCount(models.Model):
+    """Number of listings with a feature for each (type, city, price bucket) combination"""
+    feature = models.ForeignKey(Feature, on_delete=models.CASCADE, related_name='facet_counts')
+    type = models.CharField(max_length=20)
+    city = models.CharField(max_length=100)
+    price_bucket = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['feature', 'type', 'city', 'price_bucket'], name='unique_feature_facet_count'),
+        ]
+
+    def __str__(self):
+        return f"{self.feature_id}/{self.type}/{self.city}/{self.price_bucket}: {self.count}"
+
 class PropertyImage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
     image = models.URLField()
+    # SHA-256 of an uploaded original; blank for external URLs. Renditions
+    # are stored under this hash, so identical uploads share their files.
+    content_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['id']
 
     def __str__(self):
         return f"Image for {self.property.title}"
 
 class ContactMessage(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='contact_messages')
+    # Copied from property.owner so an owner's inbox is one index range scan
+    owner = models.ForeignKey('User', on_delete=models.CASCADE, related_name='received_messages', null=True, editable=False)
     name = models.CharField(max_length=100)
     email = models.EmailField()
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'id'], name='contactmessage_inbox_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.owner_id is None and self.property_id is not None:
+            self.owner_id = self.property.owner_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Message from {self.name} about {self.property.title}"
+
+class SearchToken(models.Model):
+    """Inverted index entry mapping a normalized word to a property that contains it"""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=50)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'token'], name='unique_property_token'),
+        ]
+        indexes = [
+            models.Index(fields=['token', 'property'], name='searchtoken_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.property_id}"
+
+class SimilarProperty(models.Model):
+    """Precomputed nearest neighbour of a property, maintained by core.similar"""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'rank'], name='unique_similar_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id} ~ {self.similar_id} ({self.score:.3f})"
+
+class PropertyListing(models.Model):
+    """
+    Flattened read copy of a property with its owner, features and images,
+    so listings are serialized from one row. Maintained by core.listings.
+    """
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='listing')
+    title = models.CharField(max_length=255)
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    city = models.CharField(max_length=100)
+    address = models.CharField(max_length=500, blank=True)
+    area = models.CharField(max_length=100, blank=True)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    full_address = models.CharField(max_length=710, blank=True)
+    has_location = models.BooleanField(default=False)
+    type = models.CharField(max_length=20)
+    description = models.TextField(blank=True)
+    owner = models.ForeignKey('User', on_delete=models.CASCADE, related_name='+')
+    owner_email = models.EmailField()
+    owner_name = models.CharField(max_length=100)
+    owner_first_name = models.CharField(max_length=150, blank=True)
+    owner_last_name = models.CharField(max_length=150, blank=True)
+    # [[id, name], ...] by feature id
+    features = models.JSONField(default=list)
+    # [[id, url, content hash], ...] by image id
+    images = models.JSONField(default=list)
+    image_count = models.PositiveIntegerField(default=0)
+    cover_image = models.URLField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Listing {self.property_id}: {self.title}"
+
+class PriceHistory(models.Model):
+    """Append-only record of a listing's asking price, written when it is listed and on every price change"""
+    # Kept when the listing is deleted so the rollups can always be rebuilt
+    property = models.ForeignKey(Property, on_delete=models.SET_NULL, null=True, related_name='price_history')
+    price = models.DecimalField(max_digits=12, decimal_places=2)
+    # None for the price the listing was created with
+    previous_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Where the listing was at the time, so rollups never join back to Property
+    city = models.CharField(max_length=100)
+    area = models.CharField(max_length=100, blank=True)
+    type = models.CharField(max_length=20)
+    changed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['property', 'changed_at'], name='pricehistory_property_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id}: {self.previous_price} -> {self.price}"
+
+class PriceTrend(models.Model):
+    """
+    Daily or monthly rollup of the prices recorded in PriceHistory for one
+    city/area/type, maintained by core.trends. '*' in city, area or type
+    marks a rollup across all of its values.
+    """
+    PERIODS = [('day', 'Day'), ('month', 'Month')]
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    city = models.CharField(max_length=100)
+    area = models.CharField(max_length=100)
+    type = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    median = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    # {log-scale price bucket: count}, from which the median is recomputed
+    histogram = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'city', 'area', 'type', 'period_start'], name='unique_price_trend',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.period_start} {self.city}/{self.area}/{self.type}: {self.count}"
+
+class SavedSearch(models.Model):
+    """
+    A buyer's standing criteria; blank city/type and null prices match
+    anything. New listings are matched against the in-memory index in
+    core.saved_searches.
+    """
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(max_length=100, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    type = models.CharField(max_length=20, choices=Property.PROPERTY_TYPES, blank=True)
+    min_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Listings must have every one of these
+    features = models.ManyToManyField(Feature, blank=True, related_name='saved_searches')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name or f"Search {self.pk} for {self.user_id}"
+
+class SearchAlert(models.Model):
+    """A new listing that matched a saved search, queued for delivery"""
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='alerts')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='+')
+    # Denormalized so a user's alerts are one index range scan
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='search_alerts')
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['saved_search', 'property'], name='unique_search_alert'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='searchalert_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id} matched search {self.saved_search_id}"
+
+class AuthToken(models.Model):
+    """Server-side record of an issued API token, used for revocation"""
+    key = models.CharField(max_length=32, unique=True)
+    user = models.ForeignKey('User', on_delete=models.CASCADE, related_name='auth_tokens')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Token {self.key[:8]} for {self.user}"
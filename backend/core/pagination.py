@@ -0,0 +1,106 @@
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination whose position includes the trailing id tiebreak.
+
+    DRF's cursor records only the first ordering field and falls back to an
+    offset within rows sharing it, so a row inserted inside a run of equal
+    prices or timestamps shifts every later page. Here every position is
+    unique, the offset stays 0 and each page resumes strictly after the last
+    row it returned.
+    """
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = (ordering[0].lstrip('-'), ordering[-1].lstrip('-'))
+        if isinstance(instance, dict):
+            values = [instance[field] for field in fields]
+        else:
+            values = [getattr(instance, field) for field in fields]
+        return '{}|{}'.format(*values)
+
+    def position_filter(self, ordering, position):
+        value, _, pk = position.rpartition('|')
+        if not value or not pk.lstrip('-').isdigit():
+            raise NotFound(self.invalid_cursor_message)
+        field, tiebreak = ordering[0], ordering[-1]
+        op = '__lt' if field.startswith('-') else '__gt'
+        field, tiebreak = field.lstrip('-'), tiebreak.lstrip('-')
+        return Q(**{field + op: value}) | Q(**{field: value, tiebreak + op: int(pk)})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.position_filter(ordering, current_position))
+
+        # One extra row tells whether another page follows
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            following_position = None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class PropertyCursorPagination(KeysetCursorPagination):
+    """
+    Keyset pagination for property listings.
+
+    The cursor encodes the position of the last row on the page, so each page
+    is a single indexed range scan regardless of how deep the client has paged.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
+    ordering_fields = ('created_at', '-created_at', 'price', '-price')
+
+    def get_ordering(self, request, queryset, view):
+        default = self.ordering
+        if 'search_rank' in queryset.query.annotations:
+            # Full-text searches rank by relevance unless a sort is requested
+            default = '-search_rank'
+        ordering = request.query_params.get('ordering', default)
+        if ordering not in self.ordering_fields:
+            ordering = default
+        # Break ties on id so rows sharing a price or timestamp keep a stable order
+        tiebreak = '-id' if ordering.startswith('-') else 'id'
+        return (ordering, tiebreak)
+
+
+class InboxCursorPagination(KeysetCursorPagination):
+    """Newest-first keyset pagination over contactmessage_inbox_idx (owner, created_at, id)"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
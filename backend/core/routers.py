@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Reads go to the primary unless the current request opted in to replicas,
+# so management commands, background threads and signal handlers always
+# see their own writes
+use_replicas = ContextVar('use_replicas', default=False)
+
+PIN_KEY_PREFIX = 'db-pin'
+UNSAFE_METHODS = frozenset({'POST', 'PUT', 'PATCH', 'DELETE'})
+
+
+def replica_settings():
+    config = getattr(settings, 'DATABASE_REPLICAS', {})
+    return {
+        'ALIASES': [alias for alias in config.get('ALIASES', []) if alias in settings.DATABASES],
+        'STICKY_SECONDS': config.get('STICKY_SECONDS', 5),
+        'HEALTH_INTERVAL': config.get('HEALTH_INTERVAL', 5),
+        'MAX_LAG': config.get('MAX_LAG'),
+        'CACHE_ALIAS': config.get('CACHE_ALIAS', 'default'),
+    }
+
+
+class ReplicaHealth:
+    """
+    Remembers which replicas answered their last check.
+
+    A replica is re-checked at most every `interval` seconds, by whichever
+    thread first reads after the interval expires. Failed or lagging
+    replicas are skipped until a later check succeeds.
+    """
+
+    def __init__(self):
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def is_healthy(self, alias, interval, max_lag=None):
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._state.get(alias, (True, None))
+            if checked_at is not None and now - checked_at < interval:
+                return healthy
+            # Claim the check so concurrent readers keep the previous verdict
+            self._state[alias] = (healthy, now)
+        healthy = self.check(alias, max_lag)
+        with self._lock:
+            self._state[alias] = (healthy, now)
+        return healthy
+
+    def check(self, alias, max_lag=None):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+                lag = replication_lag(connections[alias], cursor)
+        except DatabaseError as exc:
+            logger.warning('Replica %s is unavailable: %s', alias, exc)
+            return False
+        if max_lag is not None and lag is not None and lag > max_lag:
+            logger.warning('Replica %s is %s seconds behind', alias, lag)
+            return False
+        return True
+
+    def mark_unhealthy(self, alias):
+        with self._lock:
+            self._state[alias] = (False, time.monotonic())
+
+    def reset(self):
+        with self._lock:
+            self._state.clear()
+
+
+def replication_lag(connection, cursor):
+    """Seconds the replica is behind its source, or None if unknown"""
+    if connection.vendor != 'mysql':
+        return None
+    try:
+        cursor.execute('SHOW REPLICA STATUS')
+    except DatabaseError:
+        # MySQL before 8.0.22
+        cursor.execute('SHOW SLAVE STATUS')
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    columns = [column[0] for column in cursor.description]
+    for name in ('Seconds_Behind_Source', 'Seconds_Behind_Master'):
+        if name in columns:
+            return row[columns.index(name)]
+    return None
+
+
+replica_health = ReplicaHealth()
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the primary and reads to a healthy replica from
+    DATABASE_REPLICAS['ALIASES'], for requests that ReplicaMiddleware marked
+    safe. Everything else, including reads inside a transaction on the
+    primary, stays on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not use_replicas.get():
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups follow the database the instance came from
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        config = replica_settings()
+        aliases = config['ALIASES']
+        if not aliases:
+            return DEFAULT_DB_ALIAS
+        # Random order spreads load; the first healthy replica wins
+        for alias in random.sample(aliases, len(aliases)):
+            if replica_health.is_healthy(alias, config['HEALTH_INTERVAL'], config['MAX_LAG']):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+def client_key(request):
+    """Identifies the client whose writes a later read must observe"""
+    credentials = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return hashlib.sha1(credentials.encode()).hexdigest()
+
+
+class ReplicaMiddleware:
+    """
+    Lets safe requests read from replicas, unless the same client wrote
+    within the last STICKY_SECONDS. Successful unsafe requests pin their
+    client to the primary through the shared cache, so the pin holds
+    across workers when CACHE_ALIAS is shared.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = use_replicas.set(self.reads_from_replicas(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+        self.pin_after_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        # The flag is copied into the threads that run sync ORM code
+        token = use_replicas.set(self.reads_from_replicas(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+        self.pin_after_write(request, response)
+        return response
+
+    def reads_from_replicas(self, request):
+        config = replica_settings()
+        if not config['ALIASES'] or request.method in UNSAFE_METHODS:
+            return False
+        return not caches[config['CACHE_ALIAS']].get(f'{PIN_KEY_PREFIX}:{client_key(request)}')
+
+    def pin_after_write(self, request, response):
+        config = replica_settings()
+        if config['ALIASES'] and request.method in UNSAFE_METHODS and response.status_code < 400:
+            caches[config['CACHE_ALIAS']].set(
+                f'{PIN_KEY_PREFIX}:{client_key(request)}', True, config['STICKY_SECONDS']
+            )
@@ -0,0 +1,296 @@
+"""
+Matches new listings against every active saved search in memory.
+
+Searches are bucketed by (city, type), with ANY standing in for a blank
+criterion, so a listing only visits the four buckets it can match. Inside a
+bucket a centred interval tree answers "which price ranges contain this
+price" in O(log n + matches); the few survivors are then checked for
+required features with one frozenset subset test each. Matches are queued
+as SearchAlert rows on a write-behind buffer and inserted in batches.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .buffers import WriteBehindBuffer
+from .models import SavedSearch, SearchAlert
+
+# Bucket key component for a search that accepts any city or type
+ANY = ''
+# New searches are scanned linearly until this many accumulate in a bucket;
+# then the bucket's tree is rebuilt with them
+PENDING_LIMIT = 64
+
+
+class IntervalTree:
+    """
+    Static centred interval tree over (low, high, payload) entries with
+    inclusive bounds. Each node holds the intervals containing its centre,
+    sorted by low and by high, so a stabbing query stops scanning a node at
+    the first interval that cannot contain the point.
+    """
+
+    __slots__ = ('center', 'left', 'right', 'by_low', 'by_high')
+
+    def __init__(self, entries):
+        endpoints = sorted(bound for low, high, _ in entries for bound in (low, high) if math.isfinite(bound))
+        # The median endpoint belongs to some interval, so every node keeps at
+        # least one entry and the recursion always shrinks
+        self.center = endpoints[len(endpoints) // 2] if endpoints else 0.0
+        here, left, right = [], [], []
+        for entry in entries:
+            if entry[1] < self.center:
+                left.append(entry)
+            elif entry[0] > self.center:
+                right.append(entry)
+            else:
+                here.append(entry)
+        self.by_low = sorted(((low, payload) for low, _, payload in here), key=lambda item: item[0])
+        self.by_high = sorted(((high, payload) for _, high, payload in here), key=lambda item: -item[0])
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, point, out):
+        """Appends the payload of every interval containing `point` to `out`"""
+        node = self
+        while node is not None:
+            if point < node.center:
+                for low, payload in node.by_low:
+                    if low > point:
+                        break
+                    out.append(payload)
+                node = node.left
+            elif point > node.center:
+                for high, payload in node.by_high:
+                    if high < point:
+                        break
+                    out.append(payload)
+                node = node.right
+            else:
+                out.extend(payload for _, payload in node.by_low)
+                return
+
+
+class SearchBucket:
+    """
+    The saved searches sharing one (city, type) key.
+
+    Additions go to a short pending list. Removed or replaced searches stay
+    in the tree as stale intervals, which match() skips by checking each
+    candidate against `entries`, until enough pile up to make rebuilding
+    the tree worthwhile.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.tree = None
+        self.pending = []
+        self.stale = 0
+
+    def add(self, entry):
+        search_id = entry[2][0]
+        if search_id in self.entries:
+            self.stale += 1
+        self.entries[search_id] = entry
+        self.pending.append(entry)
+        if len(self.pending) > PENDING_LIMIT or self.stale > max(PENDING_LIMIT, len(self.entries) // 4):
+            self.rebuild()
+
+    def remove(self, search_id):
+        if self.entries.pop(search_id, None) is None:
+            return
+        self.stale += 1
+        if self.stale > max(PENDING_LIMIT, len(self.entries) // 4):
+            self.rebuild()
+
+    def rebuild(self):
+        # An inverted range (min above max) can never match
+        entries = [entry for entry in self.entries.values() if entry[0] <= entry[1]]
+        # Swap in the new tree before clearing pending, so a concurrent
+        # reader sees every live search at least once
+        self.tree = IntervalTree(entries) if entries else None
+        self.pending = []
+        self.stale = 0
+
+    def match(self, price, feature_ids, out):
+        candidates = []
+        if self.tree is not None:
+            self.tree.stab(price, candidates)
+        candidates.extend(payload for low, high, payload in self.pending if low <= price <= high)
+        entries = self.entries
+        for payload in candidates:
+            search_id, user_id, required = payload
+            entry = entries.get(search_id)
+            # Skips removed searches and the old interval of edited ones
+            if entry is None or entry[2] is not payload:
+                continue
+            if required and not required <= feature_ids:
+                continue
+            out[search_id] = user_id
+
+
+def search_entry(search_id, user_id, min_price, max_price, feature_ids):
+    return (
+        -math.inf if min_price is None else float(min_price),
+        math.inf if max_price is None else float(max_price),
+        (search_id, user_id, frozenset(feature_ids)),
+    )
+
+
+class SavedSearchIndex:
+    """
+    In-process index of active saved searches.
+
+    Built from two queries on first use and kept current by the signal
+    handlers. Each worker only sees its own writes, so the index is also
+    rebuilt in the background every SAVED_SEARCH_REFRESH seconds.
+    """
+
+    def __init__(self):
+        self.buckets = None
+        self.keys = {}
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = False
+
+    def build(self):
+        features = {}
+        for search_id, feature_id in SavedSearch.features.through.objects.filter(
+            savedsearch__is_active=True,
+        ).values_list('savedsearch_id', 'feature_id'):
+            features.setdefault(search_id, []).append(feature_id)
+        buckets, keys = {}, {}
+        for search_id, user_id, city, property_type, min_price, max_price in SavedSearch.objects.filter(
+            is_active=True,
+        ).order_by().values_list('id', 'user_id', 'city', 'type', 'min_price', 'max_price'):
+            key = (city, property_type)
+            # Filled directly and indexed once below, rather than through add()
+            buckets.setdefault(key, SearchBucket()).entries[search_id] = search_entry(
+                search_id, user_id, min_price, max_price, features.get(search_id, ()),
+            )
+            keys[search_id] = key
+        for bucket in buckets.values():
+            bucket.rebuild()
+        return buckets, keys
+
+    def rebuild(self):
+        buckets, keys = self.build()
+        with self._lock:
+            self.buckets, self.keys, self.built_at = buckets, keys, time.monotonic()
+
+    def ensure_built(self):
+        if self.buckets is None:
+            with self._build_lock:
+                if self.buckets is None:
+                    self.rebuild()
+        elif time.monotonic() - self.built_at > getattr(settings, 'SAVED_SEARCH_REFRESH', 300):
+            self.refresh_in_background()
+
+    def refresh_in_background(self):
+        with self._build_lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild()
+            finally:
+                self._rebuilding = False
+                connection.close()
+
+        threading.Thread(target=run, name='saved-search-rebuild', daemon=True).start()
+
+    def update(self, search_id):
+        """Re-reads one saved search after it was created, edited or deleted"""
+        if self.buckets is None:
+            # Nothing to maintain until the first match builds the index
+            return
+        row = SavedSearch.objects.filter(pk=search_id, is_active=True).values_list(
+            'user_id', 'city', 'type', 'min_price', 'max_price',
+        ).first()
+        feature_ids = []
+        if row is not None:
+            feature_ids = list(SavedSearch.features.through.objects.filter(
+                savedsearch_id=search_id,
+            ).values_list('feature_id', flat=True))
+        with self._lock:
+            self._discard(search_id)
+            if row is not None:
+                user_id, city, property_type, min_price, max_price = row
+                key = (city, property_type)
+                self.buckets.setdefault(key, SearchBucket()).add(
+                    search_entry(search_id, user_id, min_price, max_price, feature_ids)
+                )
+                self.keys[search_id] = key
+
+    def discard(self, search_id):
+        if self.buckets is not None:
+            with self._lock:
+                self._discard(search_id)
+
+    def _discard(self, search_id):
+        key = self.keys.pop(search_id, None)
+        if key is not None:
+            self.buckets[key].remove(search_id)
+
+    def match(self, city, property_type, price, feature_ids):
+        """Returns {saved search id: user id} for every active search a listing satisfies"""
+        self.ensure_built()
+        price = float(price)
+        feature_ids = frozenset(feature_ids)
+        matches = {}
+        buckets = self.buckets
+        for key in {(city, property_type), (city, ANY), (ANY, property_type), (ANY, ANY)}:
+            bucket = buckets.get(key)
+            if bucket is not None:
+                bucket.match(price, feature_ids, matches)
+        return matches
+
+    def stats(self):
+        buckets = self.buckets or {}
+        return {
+            'searches': sum(len(bucket.entries) for bucket in buckets.values()),
+            'buckets': len(buckets),
+        }
+
+
+saved_search_index = SavedSearchIndex()
+
+
+def build_alert_buffer():
+    config = getattr(settings, 'SEARCH_ALERT_BUFFER', {})
+    return WriteBehindBuffer(SearchAlert, config.get('MAX_SIZE', 500), config.get('MAX_DELAY', 2.0))
+
+
+alert_buffer = build_alert_buffer()
+
+
+def queue_alerts(properties, property_features):
+    """
+    Matches new listings against the saved searches and queues an alert per
+    match. `property_features` maps property id to feature ids. Searches
+    never alert their owner about their own listings.
+
+    Matching waits for the surrounding transaction to commit, so alerts are
+    never queued for listings that were rolled back.
+    """
+    listings = [
+        (property_obj.pk, property_obj.owner_id, property_obj.city, property_obj.type, property_obj.price)
+        for property_obj in properties
+    ]
+    if not listings:
+        return
+
+    def run():
+        for property_id, owner_id, city, property_type, price in listings:
+            matches = saved_search_index.match(city, property_type, price, property_features.get(property_id, ()))
+            for search_id, user_id in matches.items():
+                if user_id != owner_id:
+                    alert_buffer.add(SearchAlert(saved_search_id=search_id, property_id=property_id, user_id=user_id))
+
+    transaction.on_commit(run)
@@ -0,0 +1,99 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, IntegerField, Max, OuterRef, Q, Subquery, Sum, When
+
+from .models import Property, SearchToken
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TOKEN_LENGTH = 50
+MAX_QUERY_TERMS = 8
+
+# Relative importance of each indexed field when ranking results
+FIELD_WEIGHTS = {
+    'title': 4,
+    'city': 3,
+    'area': 3,
+    'type': 2,
+    'features': 2,
+    'description': 1,
+}
+
+
+def tokenize(text):
+    """Splits text into lowercase word tokens, dropping single characters"""
+    if not text:
+        return []
+    return [t[:MAX_TOKEN_LENGTH] for t in TOKEN_RE.findall(text.lower()) if len(t) > 1]
+
+
+def build_tokens(property_obj, feature_names):
+    """Returns a {token: weight} mapping for a property"""
+    weights = {}
+    fields = {
+        'title': property_obj.title,
+        'city': property_obj.city,
+        'area': property_obj.area,
+        'type': property_obj.type,
+        'features': ' '.join(feature_names),
+        'description': property_obj.description,
+    }
+    for field, text in fields.items():
+        for token in set(tokenize(text)):
+            weights[token] = weights.get(token, 0) + FIELD_WEIGHTS[field]
+    return weights
+
+
+def index_properties(properties):
+    """Rebuilds the search tokens for the given properties in bulk"""
+    properties = list(properties)
+    if not properties:
+        return
+    ids = [p.id for p in properties]
+    feature_names = {}
+    for property_id, name in Property.features.through.objects.filter(
+        property_id__in=ids
+    ).values_list('property_id', 'feature__name'):
+        feature_names.setdefault(property_id, []).append(name)
+
+    rows = []
+    for property_obj in properties:
+        tokens = build_tokens(property_obj, feature_names.get(property_obj.id, []))
+        rows.extend(
+            SearchToken(property_id=property_obj.id, token=token, weight=weight)
+            for token, weight in tokens.items()
+        )
+    SearchToken.objects.filter(property_id__in=ids).delete()
+    SearchToken.objects.bulk_create(rows, batch_size=1000)
+
+
+def index_property(property_obj):
+    index_properties([property_obj])
+
+
+def search_properties(queryset, query):
+    """
+    Restricts a Property queryset to listings matching every term in `query`.
+
+    Each term is matched as a prefix against the token index, so "apar" finds
+    "apartment". Results are annotated with `search_rank`, the summed weight of
+    the matching tokens.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return queryset.none()
+
+    matches = SearchToken.objects.filter(reduce(or_, (Q(token__startswith=t) for t in terms)))
+    # Count how many distinct query terms each property matched
+    term_hits = [
+        Max(Case(When(token__startswith=t, then=1), default=0, output_field=IntegerField()))
+        for t in terms
+    ]
+    ranked = (
+        matches.values('property_id')
+        .annotate(score=Sum('weight'), matched=sum(term_hits[1:], term_hits[0]))
+        .filter(matched=len(terms))
+    )
+    rank = ranked.filter(property_id=OuterRef('pk')).values('score')[:1]
+    return queryset.filter(id__in=ranked.values('property_id')).annotate(search_rank=Subquery(rank))
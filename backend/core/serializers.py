@@ -1,5 +1,13 @@
+from collections import namedtuple
+from decimal import Decimal
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from .models import User, Property, PropertyImage, Feature, ContactMessage
+from .models import User, Property, PropertyImage, Feature, ContactMessage, SavedSearch
+from .cache import property_cache
+from .images import rendition_urls
+from .listings import alisting_rows, listing_rows
+from .metrics import measure
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -12,9 +20,14 @@ class FeatureSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
 
 class PropertyImageSerializer(serializers.ModelSerializer):
+    renditions = serializers.SerializerMethodField()
+
     class Meta:
         model = PropertyImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'renditions']
+
+    def get_renditions(self, obj):
+        return rendition_urls(obj.content_hash)
 
 class PropertySerializer(serializers.ModelSerializer):
     images = PropertyImageSerializer(many=True, read_only=True)
@@ -42,7 +55,282 @@ class PropertyCreateSerializer(serializers.ModelSerializer):
             'owner': {'required': True}
         }
 
+class PropertyImportSerializer(serializers.ModelSerializer):
+    """Validates one row of a bulk import; owner is resolved by the importer"""
+    features = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+    images = serializers.ListField(child=serializers.URLField(), required=False)
+
+    class Meta:
+        model = Property
+        fields = [
+            'title', 'price', 'city', 'address', 'area', 'latitude', 'longitude',
+            'type', 'description', 'features', 'images'
+        ]
+
 class ContactMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ContactMessage
-        fields = ['id', 'property', 'name', 'email', 'message', 'created_at'] 
\ No newline at end of file
+        fields = ['id', 'property', 'name', 'email', 'message', 'created_at'] 
+
+class SavedSearchSerializer(serializers.ModelSerializer):
+    features = serializers.SlugRelatedField(
+        many=True, slug_field='name', queryset=Feature.objects.all(), required=False,
+    )
+
+    class Meta:
+        model = SavedSearch
+        fields = ['id', 'name', 'city', 'type', 'min_price', 'max_price', 'features', 'is_active', 'created_at']
+
+    def validate(self, attrs):
+        min_price = attrs.get('min_price', getattr(self.instance, 'min_price', None))
+        max_price = attrs.get('max_price', getattr(self.instance, 'max_price', None))
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise serializers.ValidationError({'min_price': 'Must not be above max_price.'})
+        return attrs
+
+PRICE_QUANTUM = Decimal('0.01')
+COORDINATE_QUANTUM = Decimal('0.000001')
+
+
+def format_decimal(value, quantum):
+    """Matches DecimalField.to_representation with COERCE_DECIMAL_TO_STRING"""
+    if value is None:
+        return None
+    return '{:f}'.format(Decimal(value).quantize(quantum))
+
+
+def format_datetime(value, tz=None):
+    """
+    Matches DateTimeField.to_representation with the default ISO 8601 format.
+    Batch callers pass the current timezone, which is costly to look up.
+    """
+    if value is None:
+        return None
+    if settings.USE_TZ and timezone.is_aware(value):
+        value = value.astimezone(tz or timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def build_property_dicts(property_ids):
+    """
+    Read-only fast path producing the same output as PropertySerializer.
+
+    Builds plain dicts from the PropertyListing read table in one query,
+    skipping the joins and the per-field serializer machinery. Returns
+    {id: dict}.
+    """
+    if not property_ids:
+        return {}
+    return assemble_property_dicts(listing_rows(property_ids))
+
+
+async def abuild_property_dicts(property_ids):
+    """Async ORM variant of build_property_dicts"""
+    if not property_ids:
+        return {}
+    return assemble_property_dicts(await alisting_rows(property_ids))
+
+
+def assemble_property_dicts(rows):
+    tz = timezone.get_current_timezone()
+    result = {}
+    for row in rows:
+        property_id = row['property_id']
+        result[property_id] = {
+            'id': property_id,
+            'title': row['title'],
+            'price': format_decimal(row['price'], PRICE_QUANTUM),
+            'city': row['city'],
+            'address': row['address'],
+            'area': row['area'],
+            'latitude': format_decimal(row['latitude'], COORDINATE_QUANTUM),
+            'longitude': format_decimal(row['longitude'], COORDINATE_QUANTUM),
+            'full_address': row['full_address'],
+            'has_location': row['has_location'],
+            'type': row['type'],
+            'features': [{'id': feature_id, 'name': name} for feature_id, name in row['features']],
+            'images': [
+                {'id': image_id, 'image': url, 'renditions': rendition_urls(content_hash)}
+                for image_id, url, content_hash in row['images']
+            ],
+            'description': row['description'],
+            'owner': {
+                'id': row['owner_id'],
+                'email': row['owner_email'],
+                'name': row['owner_name'],
+                'first_name': row['owner_first_name'],
+                'last_name': row['owner_last_name'],
+            },
+            'created_at': format_datetime(row['created_at'], tz),
+            'updated_at': format_datetime(row['updated_at'], tz),
+            '_updated_at': row['updated_at'],
+        }
+    return result
+
+
+def serialize_properties(properties, fieldset=None):
+    """
+    Serializes properties for read responses, reusing cached fragments.
+
+    `properties` only needs `id` and `updated_at` loaded; rows missing from the
+    cache are built in one batch by build_property_dicts. With a sparse
+    `fieldset`, cached fragments are projected and misses are built from
+    just the columns the fieldset needs, bypassing the cache.
+    """
+    with measure('serialize'):
+        fragments, missing = cached_fragments(properties)
+        if fieldset is None:
+            if missing:
+                store_fragments(fragments, build_property_dicts(missing))
+            return [fragments[p.id] for p in properties if p.id in fragments]
+        sparse = {property_id: project_fragment(data, fieldset) for property_id, data in fragments.items()}
+        if missing:
+            sparse.update(build_sparse_property_dicts(missing, fieldset))
+        return [sparse[p.id] for p in properties if p.id in sparse]
+
+
+async def aserialize_properties(properties, fieldset=None):
+    """Async variant of serialize_properties"""
+    with measure('serialize'):
+        fragments, missing = cached_fragments(properties)
+        if fieldset is None:
+            if missing:
+                store_fragments(fragments, await abuild_property_dicts(missing))
+            return [fragments[p.id] for p in properties if p.id in fragments]
+        sparse = {property_id: project_fragment(data, fieldset) for property_id, data in fragments.items()}
+        if missing:
+            sparse.update(await abuild_sparse_property_dicts(missing, fieldset))
+        return [sparse[p.id] for p in properties if p.id in sparse]
+
+
+def cached_fragments(properties):
+    """Returns ({id: cached dict}, [ids that need building])"""
+    stamps = {p.id: p.updated_at for p in properties}
+    fragments = property_cache.get_many(stamps)
+    return fragments, [property_id for property_id in stamps if property_id not in fragments]
+
+
+def store_fragments(fragments, built):
+    fresh = {}
+    for property_id, data in built.items():
+        updated_at = data.pop('_updated_at')
+        fragments[property_id] = data
+        fresh[property_id] = (updated_at, data)
+    property_cache.set_many(fresh)
+
+
+# Sparse fieldsets: ?fields= picks top-level fields (in request order) and
+# ?expand= lists the relations rendered as nested objects; the others are
+# reduced to ids. Without either parameter the full representation is used.
+PROPERTY_FIELDS = tuple(PropertySerializer.Meta.fields) + ('cover_image', 'image_count')
+EXPANDABLE_FIELDS = ('owner', 'features', 'images')
+OWNER_COLUMNS = ('owner_id', 'owner_email', 'owner_name', 'owner_first_name', 'owner_last_name')
+
+
+# fields in output order, expand a frozenset of relation names
+Fieldset = namedtuple('Fieldset', ['fields', 'expand'])
+
+
+def parse_fieldset(params):
+    """Returns a Fieldset for ?fields=/?expand=, or None for the full representation"""
+    if 'fields' not in params and 'expand' not in params:
+        return None
+    fields = [f.strip() for f in params.get('fields', '').split(',') if f.strip()] or list(PropertySerializer.Meta.fields)
+    unknown = [f for f in fields if f not in PROPERTY_FIELDS]
+    if unknown:
+        raise serializers.ValidationError({'fields': f'Unknown fields: {", ".join(unknown)}.'})
+    expand = [f.strip() for f in params.get('expand', '').split(',') if f.strip()]
+    unknown = [f for f in expand if f not in EXPANDABLE_FIELDS]
+    if unknown:
+        raise serializers.ValidationError({'expand': f'Only {", ".join(EXPANDABLE_FIELDS)} can be expanded.'})
+    return Fieldset(tuple(dict.fromkeys(fields)), frozenset(expand))
+
+
+def project_fragment(data, fieldset):
+    """Sparse view of a full (cached) property dict"""
+    result = {}
+    for field in fieldset.fields:
+        if field == 'cover_image':
+            result[field] = data['images'][0]['image'] if data['images'] else None
+        elif field == 'image_count':
+            result[field] = len(data['images'])
+        elif field == 'owner' and 'owner' not in fieldset.expand:
+            result[field] = data['owner']['id']
+        elif field in ('features', 'images') and field not in fieldset.expand:
+            result[field] = [item['id'] for item in data[field]]
+        else:
+            result[field] = data[field]
+    return result
+
+
+def fieldset_columns(fieldset):
+    """PropertyListing columns needed to render `fieldset`"""
+    columns = []
+    for field in fieldset.fields:
+        if field == 'id':
+            continue
+        if field == 'owner':
+            columns.extend(OWNER_COLUMNS if 'owner' in fieldset.expand else ('owner_id',))
+        else:
+            columns.append(field)
+    return tuple(dict.fromkeys(columns))
+
+
+def sparse_value(field, row, fieldset, tz):
+    if field == 'id':
+        return row['property_id']
+    if field == 'price':
+        return format_decimal(row['price'], PRICE_QUANTUM)
+    if field in ('latitude', 'longitude'):
+        return format_decimal(row[field], COORDINATE_QUANTUM)
+    if field in ('created_at', 'updated_at'):
+        return format_datetime(row[field], tz)
+    if field == 'cover_image':
+        return row['cover_image'] or None
+    expanded = field in fieldset.expand
+    if field == 'owner':
+        if not expanded:
+            return row['owner_id']
+        return {
+            'id': row['owner_id'],
+            'email': row['owner_email'],
+            'name': row['owner_name'],
+            'first_name': row['owner_first_name'],
+            'last_name': row['owner_last_name'],
+        }
+    if field == 'features':
+        if not expanded:
+            return [feature_id for feature_id, _ in row['features']]
+        return [{'id': feature_id, 'name': name} for feature_id, name in row['features']]
+    if field == 'images':
+        if not expanded:
+            return [image_id for image_id, _, _ in row['images']]
+        return [
+            {'id': image_id, 'image': url, 'renditions': rendition_urls(content_hash)}
+            for image_id, url, content_hash in row['images']
+        ]
+    return row[field]
+
+
+def assemble_sparse_dicts(rows, fieldset):
+    tz = timezone.get_current_timezone()
+    return {
+        row['property_id']: {field: sparse_value(field, row, fieldset, tz) for field in fieldset.fields}
+        for row in rows
+    }
+
+
+def build_sparse_property_dicts(property_ids, fieldset):
+    """build_property_dicts for a sparse fieldset, selecting only the columns it needs"""
+    if not property_ids:
+        return {}
+    return assemble_sparse_dicts(listing_rows(property_ids, fieldset_columns(fieldset)), fieldset)
+
+
+async def abuild_sparse_property_dicts(property_ids, fieldset):
+    if not property_ids:
+        return {}
+    return assemble_sparse_dicts(await alisting_rows(property_ids, fieldset_columns(fieldset)), fieldset)
@@ -0,0 +1,383 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .authentication import forget_user
+from .autocomplete import autocomplete
+from .cache import property_cache
+from .clusters import adjust_clusters
+from .dashboard import invalidate_dashboards, invalidate_property_dashboards
+from .facets import adjust_facets, adjust_feature_facets, facet_key
+from .listings import refresh_listings
+from .models import ContactMessage, Feature, Property, PropertyImage, SavedSearch, User
+from .saved_searches import saved_search_index
+from .search import index_properties
+from .similar import schedule_refresh
+from .trends import record_prices
+
+PropertyFeature = Property.features.through
+
+
+# Property ids touched by the current thread's open transaction, gathered by
+# the receivers below so each listing is rewritten once per write
+pending_changes = threading.local()
+
+
+def defer_property_changes(ids, stamp=False, index=False):
+    """
+    Queues the listings in `ids` for a read-table rewrite and fragment
+    invalidation when the transaction commits. `stamp` also bumps their
+    `updated_at`; `index` rebuilds their search tokens.
+    """
+    ids = {property_id for property_id in ids if property_id is not None}
+    if not ids:
+        return
+    if not hasattr(pending_changes, 'listings'):
+        pending_changes.listings, pending_changes.stamps, pending_changes.tokens = set(), set(), set()
+    pending_changes.listings |= ids
+    if stamp:
+        pending_changes.stamps |= ids
+    if index:
+        pending_changes.tokens |= ids
+    # Registered on every call rather than once: a rolled-back savepoint drops
+    # its callbacks, and whichever one survives flushes everything pending
+    transaction.on_commit(flush_property_changes)
+
+
+def flush_property_changes():
+    """Applies the queued listing changes; a no-op when nothing is pending"""
+    listings = getattr(pending_changes, 'listings', None)
+    if not listings:
+        return
+    stamps, tokens = pending_changes.stamps, pending_changes.tokens
+    pending_changes.listings, pending_changes.stamps, pending_changes.tokens = set(), set(), set()
+    if stamps:
+        # queryset.update() sends no signals, so this does not recurse
+        Property.objects.filter(pk__in=stamps).update(updated_at=timezone.now())
+    if tokens:
+        index_properties(Property.objects.filter(pk__in=tokens))
+    refresh_listings(listings)
+    property_cache.invalidate(listings)
+    invalidate_property_dashboards(listings)
+
+
+@contextmanager
+def property_changes():
+    """
+    Runs the block in a transaction and applies its listing changes just
+    before it commits, so the read table commits with the write.
+    """
+    with transaction.atomic():
+        yield
+        flush_property_changes()
+
+
+def mark_properties_changed(ids):
+    """
+    Bumps `updated_at` on listings whose images, features or owner changed so
+    conditional-GET validators and fragment cache stamps move with them, and
+    rewrites their read-table rows, once per transaction.
+    """
+    defer_property_changes(ids, stamp=True)
+
+
+def feature_ids_for(property_id):
+    return list(PropertyFeature.objects.filter(property_id=property_id).values_list('feature_id', flat=True))
+
+
+@receiver(pre_save, sender=Property)
+def remember_previous_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if raw or not instance.pk:
+        return
+    instance._previous_state = (
+        Property.objects.filter(pk=instance.pk)
+        .values('geohash', 'latitude', 'longitude', 'type', 'city', 'area', 'price', 'owner_id')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Property)
+def reindex_property(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    defer_property_changes([instance.pk], index=True)
+
+
+@receiver(post_save, sender=Property)
+def refresh_property_listing(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    defer_property_changes([instance.pk])
+
+
+@receiver(post_save, sender=Property)
+def record_price_history(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if created or previous is None:
+        record_prices([(instance, None)])
+    elif previous['price'] != Decimal(str(instance.price)):
+        record_prices([(instance, previous['price'])])
+
+
+@receiver(post_save, sender=Property)
+def update_property_clusters(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    previous_geohash = previous['geohash'] if previous else ''
+    if previous_geohash == instance.geohash and (not previous_geohash or (
+        previous['latitude'], previous['longitude']) == (instance.latitude, instance.longitude)
+    ):
+        return
+    if previous_geohash:
+        adjust_clusters(previous_geohash, previous['latitude'], previous['longitude'], delta=-1)
+    if instance.geohash:
+        adjust_clusters(instance.geohash, instance.latitude, instance.longitude, delta=1)
+
+
+@receiver(post_save, sender=Property)
+def update_property_facets(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    key = facet_key(instance.type, instance.city, instance.price)
+    previous = getattr(instance, '_previous_state', None)
+    if created or previous is None:
+        # Features are attached after the first save and counted by m2m_changed
+        adjust_facets(key, [], delta=1)
+        return
+    previous_key = facet_key(previous['type'], previous['city'], previous['price'])
+    if previous_key != key:
+        feature_ids = feature_ids_for(instance.pk)
+        adjust_facets(previous_key, feature_ids, delta=-1)
+        adjust_facets(key, feature_ids, delta=1)
+
+
+@receiver(post_save, sender=Property)
+def refresh_similar_listings(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    if not created and previous is not None and all(
+        previous[field] == getattr(instance, field) for field in ('type', 'price', 'latitude', 'longitude')
+    ):
+        return
+    schedule_refresh([instance.pk])
+
+
+@receiver(post_save, sender=Property)
+def update_autocomplete_counts(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_state', None)
+    for kind in ('city', 'area'):
+        old = previous[kind] if previous else None
+        new = getattr(instance, kind)
+        if created or previous is None or old != new:
+            autocomplete.adjust(kind, old, -1)
+            autocomplete.adjust(kind, new, 1)
+
+
+@receiver(post_save, sender=Property)
+def move_owner_inbox(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    if raw or created or previous is None or previous['owner_id'] == instance.owner_id:
+        return
+    ContactMessage.objects.filter(property=instance).update(owner_id=instance.owner_id)
+
+
+@receiver(pre_delete, sender=Property)
+def remember_deleted_features(sender, instance, **kwargs):
+    # The M2M rows are removed by the cascade before post_delete fires
+    instance._deleted_feature_ids = feature_ids_for(instance.pk)
+
+
+@receiver(post_delete, sender=Property)
+def remove_deleted_property(sender, instance, **kwargs):
+    adjust_clusters(instance.geohash, instance.latitude, instance.longitude, delta=-1)
+    adjust_facets(
+        facet_key(instance.type, instance.city, instance.price),
+        getattr(instance, '_deleted_feature_ids', []),
+        delta=-1,
+    )
+    autocomplete.adjust('city', instance.city, -1)
+    autocomplete.adjust('area', instance.area, -1)
+    autocomplete.adjust_features(getattr(instance, '_deleted_feature_ids', []), -1)
+
+
+@receiver(m2m_changed, sender=PropertyFeature)
+def property_features_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # Capture the rows that actually exist; remove() reports every requested
+        # id and clear() reports none
+        if reverse:
+            rows = PropertyFeature.objects.filter(feature_id=instance.pk)
+            column = 'property_id'
+            if action == 'pre_remove':
+                rows = rows.filter(property_id__in=pk_set)
+        else:
+            rows = PropertyFeature.objects.filter(property_id=instance.pk)
+            column = 'feature_id'
+            if action == 'pre_remove':
+                rows = rows.filter(feature_id__in=pk_set)
+        instance._removed_ids = list(rows.values_list(column, flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    delta = 1 if action == 'post_add' else -1
+    changed_ids = pk_set if action == 'post_add' else instance._removed_ids
+
+    if reverse:
+        # Called from the Feature side, e.g. feature.property_set.add(...)
+        properties = list(Property.objects.filter(pk__in=changed_ids))
+        for property_obj in properties:
+            adjust_feature_facets(
+                facet_key(property_obj.type, property_obj.city, property_obj.price), [instance.pk], delta
+            )
+        defer_property_changes(changed_ids, index=True)
+        schedule_refresh(changed_ids)
+        autocomplete.adjust('feature', instance.name, delta * len(properties))
+    else:
+        adjust_feature_facets(facet_key(instance.type, instance.city, instance.price), changed_ids, delta)
+        defer_property_changes([instance.pk], index=True)
+        if changed_ids:
+            schedule_refresh([instance.pk])
+            autocomplete.adjust_features(changed_ids, delta)
+
+
+@receiver(pre_save, sender=Feature)
+def remember_feature_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = None
+    if not raw and instance.pk:
+        instance._previous_name = Feature.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Feature)
+def update_feature_autocomplete(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_name', None)
+    if created:
+        autocomplete.adjust('feature', instance.name, 0)
+    elif previous is not None and previous != instance.name and autocomplete.indexes is not None:
+        autocomplete.discard('feature', previous)
+        autocomplete.adjust('feature', instance.name, PropertyFeature.objects.filter(feature_id=instance.pk).count())
+
+
+@receiver(post_delete, sender=Feature)
+def remove_feature_autocomplete(sender, instance, **kwargs):
+    autocomplete.discard('feature', instance.name)
+
+
+@receiver(post_save, sender=Feature)
+def reindex_feature_properties(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    defer_property_changes(instance.property_set.values_list('id', flat=True), index=True)
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def invalidate_property_fragment(sender, instance, **kwargs):
+    property_cache.invalidate([instance.pk])
+    previous = getattr(instance, '_previous_state', None)
+    invalidate_dashboards([instance.owner_id, previous['owner_id'] if previous else None])
+
+
+@receiver(post_save, sender=ContactMessage)
+@receiver(post_delete, sender=ContactMessage)
+def invalidate_enquiry_dashboard(sender, instance, **kwargs):
+    invalidate_dashboards([instance.owner_id])
+
+
+@receiver(post_save, sender=PropertyImage)
+@receiver(post_delete, sender=PropertyImage)
+def invalidate_image_property_fragment(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Property) or (isinstance(origin, QuerySet) and origin.model is Property):
+        # Cascading from the listing's own deletion; refreshing would
+        # re-insert the read-table row that the cascade just removed
+        return
+    mark_properties_changed([instance.property_id])
+
+
+@receiver(m2m_changed, sender=PropertyFeature)
+def invalidate_feature_property_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        mark_properties_changed([instance.pk])
+    elif action == 'post_add':
+        mark_properties_changed(pk_set)
+    else:
+        mark_properties_changed(getattr(instance, '_removed_ids', []))
+
+
+@receiver(post_save, sender=Feature)
+def invalidate_renamed_feature_fragments(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    mark_properties_changed(instance.property_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def invalidate_owner_fragments(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Listings embed the owner's name and email
+    if raw or created:
+        return
+    if update_fields is not None and not {'name', 'email', 'first_name', 'last_name'} & set(update_fields):
+        return
+    mark_properties_changed(instance.properties.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Token authentication caches the user object alongside the token state
+    forget_user(instance.pk)
+
+
+@receiver(post_save, sender=SavedSearch)
+@receiver(post_delete, sender=SavedSearch)
+def update_saved_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # After commit, so a rolled-back edit never reaches the index; a deleted
+    # search is simply not found again
+    search_id = instance.pk
+    transaction.on_commit(lambda: saved_search_index.update(search_id))
+
+
+def reindex_saved_searches(search_ids):
+    search_ids = list(search_ids)
+    if search_ids:
+        transaction.on_commit(lambda: [saved_search_index.update(search_id) for search_id in search_ids])
+
+
+@receiver(m2m_changed, sender=SavedSearch.features.through)
+def saved_search_features_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # Called from the Feature side, where clear() reports no ids
+        instance._cleared_search_ids = list(instance.saved_searches.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        reindex_saved_searches(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear':
+        reindex_saved_searches(instance._cleared_search_ids if reverse else [instance.pk])
+
+
+@receiver(pre_delete, sender=Feature)
+def remember_feature_searches(sender, instance, **kwargs):
+    # The cascade removes the M2M rows without sending m2m_changed
+    instance._saved_search_ids = list(instance.saved_searches.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Feature)
+def reindex_feature_searches(sender, instance, **kwargs):
+    reindex_saved_searches(getattr(instance, '_saved_search_ids', []))
@@ -0,0 +1,423 @@
+import atexit
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Avg, Count, Min, Q
+from django.db.models.functions import Left
+
+from . import geo
+from .geo import KM_PER_DEGREE
+from .models import Property, SimilarProperty
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only the bulk rebuild requires it
+    np = None
+
+NEIGHBOURS = 20
+# Above this many changed x candidate distances the pure-Python refresh is
+# too slow even in the background; run rebuild_similar instead
+PYTHON_REFRESH_LIMIT = 200000
+REBUILD_BLOCK_SIZE = 512
+# Incremental refreshes score listings in the same 3x3 block of geohash
+# cells at this precision (about 39 x 20 km each)
+BLOCK_PRECISION = 4
+# Changed listings whose candidates are fetched per query; bounds the IN
+# lists, which hold up to nine cells per listing
+CANDIDATE_CHUNK_SIZE = 500
+
+# Scale of each component in the distance: a different type outweighs
+# everything else, a 10x price difference counts 2, 10 km counts 1 and each
+# feature present on only one of the pair counts 0.5
+TYPE_WEIGHT = 4.0
+PRICE_WEIGHT = 2.0
+KM_WEIGHT = 0.1
+FEATURE_WEIGHT = 0.5
+
+TYPE_CODES = [code for code, _ in Property.PROPERTY_TYPES]
+
+logger = logging.getLogger(__name__)
+
+
+class SimilarityUnavailable(Exception):
+    pass
+
+
+VECTOR_COLUMNS = ('id', 'type', 'price', 'city', 'latitude', 'longitude')
+
+
+def vectorize(rows, links, centroids, fallback):
+    """
+    Returns (ids, vectors) for `rows` of VECTOR_COLUMNS and their
+    (property id, feature id) `links`.
+
+    Each vector is [type one-hot, log price, y km, x km, feature multi-hot],
+    pre-scaled by the weights above so plain Euclidean distance ranks them.
+    Listings without coordinates are placed at their city's centroid from
+    `centroids`, or at `fallback`.
+    """
+    features = {}
+    feature_columns = {}
+    for property_id, feature_id in links:
+        features.setdefault(property_id, []).append(
+            feature_columns.setdefault(feature_id, len(feature_columns))
+        )
+
+    width = len(TYPE_CODES) + 3 + len(feature_columns)
+    ids = []
+    vectors = []
+    for property_id, property_type, price, city, lat, lng in rows:
+        if lat is None or lng is None:
+            lat, lng = centroids.get(city, fallback)
+        lat, lng = float(lat), float(lng)
+        vector = [0.0] * width
+        if property_type in TYPE_CODES:
+            vector[TYPE_CODES.index(property_type)] = TYPE_WEIGHT
+        offset = len(TYPE_CODES)
+        vector[offset] = PRICE_WEIGHT * math.log10(max(float(price), 1.0))
+        vector[offset + 1] = KM_WEIGHT * KM_PER_DEGREE * lat
+        vector[offset + 2] = KM_WEIGHT * KM_PER_DEGREE * lng * math.cos(math.radians(lat))
+        for column in features.get(property_id, []):
+            vector[offset + 3 + column] = FEATURE_WEIGHT
+        ids.append(property_id)
+        vectors.append(vector)
+    return ids, vectors
+
+
+def load_catalogue():
+    """Returns (ids, vectors) for every property, built from two queries"""
+    rows = list(Property.objects.order_by('id').values_list(*VECTOR_COLUMNS))
+    links = Property.features.through.objects.values_list('property_id', 'feature_id')
+
+    located = [(city, float(lat), float(lng)) for _, _, _, city, lat, lng in rows if lat is not None and lng is not None]
+    totals = {}
+    for city, lat, lng in located:
+        total = totals.setdefault(city, [0.0, 0.0, 0])
+        total[0] += lat
+        total[1] += lng
+        total[2] += 1
+    centroids = {city: (lat_sum / count, lng_sum / count) for city, (lat_sum, lng_sum, count) in totals.items()}
+    fallback = (
+        sum(lat for _, lat, _ in located) / len(located) if located else 0.0,
+        sum(lng for _, _, lng in located) / len(located) if located else 0.0,
+    )
+    return vectorize(rows, links, centroids, fallback)
+
+
+def load_vectors(property_ids):
+    """
+    Returns (ids, vectors) for `property_ids` only. Centroids for listings
+    without coordinates come from one aggregate over their cities.
+    """
+    rows = list(Property.objects.filter(id__in=property_ids).order_by('id').values_list(*VECTOR_COLUMNS))
+    links = Property.features.through.objects.filter(property_id__in=property_ids).values_list(
+        'property_id', 'feature_id',
+    )
+    located = Property.objects.filter(latitude__isnull=False, longitude__isnull=False).order_by()
+    unlocated = {city for _, _, _, city, lat, lng in rows if lat is None or lng is None}
+    centroids = {}
+    fallback = (0.0, 0.0)
+    if unlocated:
+        centroids = {
+            city: (float(lat), float(lng))
+            for city, lat, lng in located.filter(city__in=unlocated).values('city')
+            .annotate(lat=Avg('latitude'), lng=Avg('longitude')).values_list('city', 'lat', 'lng')
+        }
+        if unlocated - set(centroids):
+            overall = located.aggregate(lat=Avg('latitude'), lng=Avg('longitude'))
+            if overall['lat'] is not None:
+                fallback = (float(overall['lat']), float(overall['lng']))
+    return vectorize(rows, links, centroids, fallback)
+
+
+def candidate_blocks(property_ids):
+    """
+    Maps each existing id in `property_ids` to the ids of the listings it
+    can rank against: the same type and either the same city or a geohash
+    cell within BLOCK_PRECISION of its own. A different type outweighs every
+    other component, so neighbours outside the block are rare;
+    rebuild_similar still ranks the whole catalogue.
+
+    Candidates are fetched with one query per CANDIDATE_CHUNK_SIZE changed
+    listings, matching their distinct types, cities and cells with IN lists
+    so the SQL stays the same shape however many listings changed.
+    """
+    changed = {}
+    for property_id, property_type, city, geohash in Property.objects.filter(id__in=property_ids).values_list(
+        'id', 'type', 'city', 'geohash',
+    ):
+        cells = geo.neighbours(geohash[:BLOCK_PRECISION]) if geohash else []
+        changed[property_id] = (property_type, city, cells)
+    if not changed:
+        return {}
+    by_city = {}
+    by_cell = {}
+    entries = list(changed.values())
+    for start in range(0, len(entries), CANDIDATE_CHUNK_SIZE):
+        chunk = entries[start:start + CANDIDATE_CHUNK_SIZE]
+        cities = {city for _, city, _ in chunk}
+        cells = {cell for _, _, chunk_cells in chunk for cell in chunk_cells}
+        # Rows of another type in a matching city or cell are fetched too and
+        # dropped by the (type, city) and (type, cell) lookups below
+        candidates = Property.objects.filter(type__in={property_type for property_type, _, _ in chunk}).annotate(
+            cell=Left('geohash', BLOCK_PRECISION),
+        ).filter(Q(city__in=cities) | Q(cell__in=cells))
+        for property_id, property_type, city, geohash in candidates.values_list('id', 'type', 'city', 'geohash'):
+            by_city.setdefault((property_type, city), set()).add(property_id)
+            if geohash:
+                by_cell.setdefault((property_type, geohash[:BLOCK_PRECISION]), set()).add(property_id)
+    blocks = {}
+    for property_id, (property_type, city, cells) in changed.items():
+        members = set(by_city.get((property_type, city), ()))
+        for cell in cells:
+            members.update(by_cell.get((property_type, cell), ()))
+        blocks[property_id] = members
+    return blocks
+
+
+def score(distance):
+    return round(1.0 / (1.0 + distance), 6)
+
+
+def distance_for(similarity):
+    return 1.0 / similarity - 1.0
+
+
+def distances_from(vectors, matrix, row, rows=None):
+    """Euclidean distances from vectors[row] to every vector, or to the vectors at `rows`"""
+    if matrix is not None:
+        others = matrix if rows is None else matrix[rows]
+        return np.sqrt(((others - matrix[row]) ** 2).sum(axis=1)).tolist()
+    origin = vectors[row]
+    others = vectors if rows is None else [vectors[other] for other in rows]
+    return [math.sqrt(sum((a - b) ** 2 for a, b in zip(origin, other))) for other in others]
+
+
+def neighbour_rows(property_id, neighbours):
+    return [
+        SimilarProperty(property_id=property_id, similar_id=similar_id, rank=rank, score=score(distance))
+        for rank, (distance, similar_id) in enumerate(neighbours)
+    ]
+
+
+def rebuild_similar(block_size=REBUILD_BLOCK_SIZE):
+    """Recomputes every neighbour list with blocked NumPy distance matrices"""
+    if np is None:
+        raise SimilarityUnavailable('Rebuilding similar listings requires NumPy.')
+    ids, vectors = load_catalogue()
+    with transaction.atomic():
+        SimilarProperty.objects.all().delete()
+        if len(ids) < 2:
+            return 0
+        matrix = np.asarray(vectors, dtype=np.float64)
+        norms = (matrix ** 2).sum(axis=1)
+        id_array = np.asarray(ids)
+        k = min(NEIGHBOURS, len(ids) - 1)
+        created = 0
+        for start in range(0, len(ids), block_size):
+            block = matrix[start:start + block_size]
+            # |a - b|^2 = |a|^2 + |b|^2 - 2ab, one matrix product per block
+            squared = norms[start:start + block_size, None] + norms[None, :] - 2.0 * block @ matrix.T
+            np.maximum(squared, 0.0, out=squared)
+            for offset in range(len(block)):
+                squared[offset, start + offset] = np.inf
+            top = np.argpartition(squared, k - 1, axis=1)[:, :k]
+            rows = []
+            for offset, columns in enumerate(top):
+                order = columns[np.argsort(squared[offset, columns], kind='stable')]
+                neighbours = [(math.sqrt(squared[offset, c]), int(id_array[c])) for c in order]
+                rows.extend(neighbour_rows(ids[start + offset], neighbours))
+            SimilarProperty.objects.bulk_create(rows, batch_size=2000)
+            created += len(rows)
+    return created
+
+
+def refresh_similar(property_ids):
+    """
+    Incrementally updates neighbour lists after `property_ids` changed.
+
+    Only listings in the changed listings' blocks (see candidate_blocks) are
+    scored. Each changed listing gets a freshly computed list, and it is
+    inserted into, re-scored in or dropped from the lists of other listings
+    that it now ranks against. Lists that lose a member are topped up on
+    the next rebuild_similar run.
+    """
+    property_ids = set(property_ids)
+    if not property_ids:
+        return
+    blocks = candidate_blocks(property_ids)
+    if not blocks:
+        return
+    changed = list(blocks)
+    candidates = set().union(*blocks.values())
+    if np is None and sum(len(members) for members in blocks.values()) > PYTHON_REFRESH_LIMIT:
+        raise SimilarityUnavailable(
+            f'Refreshing {len(changed)} listings against {len(candidates)} candidates requires NumPy.'
+        )
+
+    # Distance of the last entry of each full list; shorter lists accept
+    # anyone, listings with no list yet wait for rebuild_similar
+    thresholds = {
+        owner_id: distance_for(worst) if count >= NEIGHBOURS else math.inf
+        for owner_id, count, worst in SimilarProperty.objects.filter(property_id__in=candidates).order_by()
+        .values('property_id').annotate(count=Count('id'), worst=Min('score'))
+        .values_list('property_id', 'count', 'worst')
+    }
+    # Lists that hold a changed listing, including ones outside its block
+    # (e.g. after it moved city), need it re-scored or dropped
+    holders = {}
+    for owner_id, similar_id in SimilarProperty.objects.filter(similar_id__in=changed).values_list(
+        'property_id', 'similar_id',
+    ):
+        holders.setdefault(similar_id, set()).add(owner_id)
+    containing = set().union(*holders.values()) if holders else set()
+    ids, vectors = load_vectors(candidates | containing)
+    positions = {property_id: row for row, property_id in enumerate(ids)}
+    changed = [property_id for property_id in changed if property_id in positions]
+    matrix = np.asarray(vectors, dtype=np.float64) if np is not None else None
+
+    # {changed id: {other id: distance}} over its block and its holders
+    scored = {}
+    for property_id in changed:
+        others = [
+            other_id for other_id in blocks[property_id] | holders.get(property_id, set())
+            if other_id != property_id and other_id in positions
+        ]
+        distances = distances_from(vectors, matrix, positions[property_id], [positions[o] for o in others])
+        scored[property_id] = dict(zip(others, distances))
+        for other_id, distance in scored[property_id].items():
+            if distance < thresholds.get(other_id, -1):
+                containing.add(other_id)
+
+    lists = {}
+    for owner_id, similar_id, similarity in SimilarProperty.objects.filter(property_id__in=containing).values_list(
+        'property_id', 'similar_id', 'score'
+    ):
+        lists.setdefault(owner_id, {})[similar_id] = distance_for(similarity)
+    for property_id, distances in scored.items():
+        lists[property_id] = {
+            similar_id: d for d, similar_id in sorted((d, other_id) for other_id, d in distances.items())[:NEIGHBOURS]
+        }
+        for other_id in containing:
+            if other_id in distances:
+                lists.setdefault(other_id, {})[property_id] = distances[other_id]
+
+    touched = containing | set(changed)
+    with transaction.atomic():
+        SimilarProperty.objects.filter(property_id__in=touched).delete()
+        rows = []
+        for owner_id in touched:
+            if owner_id not in positions:
+                continue
+            neighbours = sorted((d, similar_id) for similar_id, d in lists.get(owner_id, {}).items())[:NEIGHBOURS]
+            rows.extend(neighbour_rows(owner_id, neighbours))
+        SimilarProperty.objects.bulk_create(rows, batch_size=2000)
+
+
+class RefreshQueue:
+    """
+    Collects changed listing ids and refreshes their neighbour lists on a
+    background thread.
+
+    Ids queued within `delay` seconds of each other are merged into one
+    refresh_similar call, so a request that saves a listing and then adds
+    five features costs one refresh, and none of it runs in the request.
+    Pending ids are refreshed at interpreter exit.
+    """
+
+    def __init__(self, delay=1.0):
+        self.delay = delay
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._held = 0
+        self.refreshed = 0
+        self.runs = 0
+        atexit.register(self._flush_logged)
+
+    def add(self, property_ids):
+        with self._lock:
+            self._pending.update(property_ids)
+            if self._held:
+                return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='similar-refresh', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    @contextmanager
+    def hold(self):
+        """
+        Only queues ids inside the block, then refreshes them in one run on
+        the calling thread. Bulk loads use it so the worker does not write
+        between their chunks (SQLite allows a single writer).
+        """
+        with self._lock:
+            self._held += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._held -= 1
+                held = self._held
+            if not held:
+                self._flush_logged()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Let the rest of the request's changes arrive first
+            time.sleep(self.delay)
+            try:
+                self._flush_logged()
+            finally:
+                # The worker thread holds its own connection; drop it between runs
+                close_old_connections()
+
+    def _flush_logged(self):
+        # No caller to report to on the worker thread or at exit
+        try:
+            self.flush()
+        except DatabaseError:
+            logger.exception('Similar listings refresh failed')
+
+    def flush(self):
+        """Refreshes everything queued so far; returns the number of listings"""
+        with self._flush_lock:
+            with self._lock:
+                property_ids, self._pending = self._pending, set()
+            if not property_ids:
+                return 0
+            try:
+                refresh_similar(property_ids)
+            except SimilarityUnavailable as exc:
+                logger.warning('Similar listings not refreshed: %s', exc)
+                return 0
+            self.refreshed += len(property_ids)
+            self.runs += 1
+            return len(property_ids)
+
+
+refresh_queue = RefreshQueue(getattr(settings, 'SIMILAR_REFRESH_DELAY', 1.0))
+
+
+def schedule_refresh(property_ids):
+    """Queues neighbour list refreshes once the current transaction commits"""
+    property_ids = set(property_ids)
+    if property_ids:
+        transaction.on_commit(lambda: refresh_queue.add(property_ids))
+
+
+def similar_properties(property_id, limit=10):
+    """Returns [(similar id, score)] from the precomputed table, best first"""
+    return list(
+        SimilarProperty.objects.filter(property_id=property_id).order_by('rank').values_list('similar_id', 'score')[:limit]
+    )
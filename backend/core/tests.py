@@ -1,3 +1,1256 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError, connection, connections, transaction
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; the upload tests that render are skipped
+    Image = None
+
+from .listings import rebuild_listings, refresh_listings
+from .models import User, ContactMessage, FacetCount, FeatureFacetCount, MapCluster, Property, PropertyImage, PropertyListing, Feature, PriceTrend, SavedSearch, SearchAlert, SimilarProperty
+from .routers import PrimaryReplicaRouter, ReplicaHealth, ReplicaMiddleware, replica_health, use_replicas
+from .authentication import decode_token, issue_token, revoke_tokens, token_settings
+from .autocomplete import autocomplete
+from .buffers import WriteBehindBuffer
+from .cache import property_cache
+from .checks import check_token_cache
+from .clusters import rebuild_clusters
+from .encoding import columnar
+from .facets import live_facets, property_facets, rebuild_facets
+from .filters import filter_properties
+from .export import CSV_COLUMNS
+from .ingest import normalize_record, store_properties
+from .similar import refresh_queue
+from .signals import property_changes
+from .saved_searches import PENDING_LIMIT, SearchBucket, alert_buffer, saved_search_index, search_entry
+from .serializers import (
+    PropertySerializer, build_property_dicts, build_sparse_property_dicts, parse_fieldset, project_fragment,
+)
+from .trends import rebuild_trends
+
+# Tests flush the queue themselves; the background worker would race them
+# on its own connection
+refresh_queue.delay = 3600
+
+
+class FastPropertySerializationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='owner@example.com', email='owner@example.com', password='pass12345',
+            name='Owner Name', first_name='Owner', last_name='Name',
+        )
+        gym = Feature.objects.create(name='Gym')
+        pool = Feature.objects.create(name='Pool')
+        with property_changes():
+            cls.located = Property.objects.create(
+                title='Sea facing flat', price=Decimal('12000000'), city='Mumbai', address='12 Marine Drive',
+                area='Churchgate', latitude=Decimal('18.93'), longitude=Decimal('72.8234'),
+                type='Buy', description='Bright corner unit', owner=cls.owner,
+            )
+            cls.located.features.add(pool, gym)
+            PropertyImage.objects.create(property=cls.located, image='https://example.com/a.jpg')
+            PropertyImage.objects.create(property=cls.located, image='https://example.com/b.jpg')
+            cls.bare = Property.objects.create(
+                title='Studio', price=Decimal('18000.5'), city='Pune', type='Rent', owner=cls.owner,
+            )
+        # Microsecond precision exercises the ISO 8601 formatting
+        Property.objects.filter(pk=cls.bare.pk).update(
+            created_at=timezone.now() - timedelta(days=3, microseconds=7)
+        )
+        # queryset.update() bypasses the signals that keep the read table in step
+        refresh_listings([cls.bare.pk])
+
+    def render(self, data):
+        return json.loads(JSONRenderer().render(data))
+
+    def test_fast_path_matches_property_serializer(self):
+        properties = Property.objects.select_related('owner').prefetch_related('features', 'images')
+        expected = {p.id: self.render(PropertySerializer(p).data) for p in properties}
+        fast = build_property_dicts(list(expected))
+        for property_id, data in fast.items():
+            data.pop('_updated_at')
+            self.assertEqual(self.render(data), expected[property_id])
+            self.assertEqual(list(data), list(expected[property_id]))
+
+    def test_fast_path_uses_constant_queries(self):
+        with self.assertNumQueries(1):
+            build_property_dicts([self.located.id, self.bare.id])
+
+    def test_list_endpoint_output_matches_property_serializer(self):
+        response = self.client.get('/api/properties/', {'ordering': 'price'})
+        self.assertEqual(response.status_code, 200)
+        properties = Property.objects.order_by('price')
+        self.assertEqual(
+            response.json()['results'],
+            [self.render(PropertySerializer(p).data) for p in properties],
+        )
+
+    def test_sparse_fieldset_from_cache_matches_narrow_build(self):
+        fieldset = parse_fieldset({'fields': 'id,title,price,owner,features,images,cover_image,image_count', 'expand': 'features'})
+        full = build_property_dicts([self.located.id])[self.located.id]
+        with CaptureQueriesContext(connection) as queries:
+            sparse = build_sparse_property_dicts([self.located.id], fieldset)[self.located.id]
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('description', queries[0]['sql'])
+        self.assertEqual(project_fragment(full, fieldset), sparse)
+        self.assertEqual(sparse['owner'], self.owner.id)
+        self.assertEqual([f['name'] for f in sparse['features']], ['Gym', 'Pool'])
+        self.assertEqual(len(sparse['images']), sparse['image_count'])
+        self.assertEqual(sparse['cover_image'], 'https://example.com/a.jpg')
+
+    def test_list_endpoint_fields_and_columnar_encoding(self):
+        response = self.client.get('/api/properties/', {'ordering': 'price', 'fields': 'id,title', 'format': 'columnar'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['fields'], ['id', 'title'])
+        self.assertEqual(data['rows'], [[self.bare.id, 'Studio'], [self.located.id, 'Sea facing flat']])
+        self.assertEqual(self.client.get('/api/properties/', {'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/properties/', {'expand': 'title'}).status_code, 400)
+
+    def test_columnar_leaves_single_objects_alone(self):
+        self.assertEqual(columnar({'id': 1}), {'id': 1})
+        self.assertEqual(columnar([{'a': 1}, {'b': 2}]), {'fields': ['a', 'b'], 'rows': [[1, None], [None, 2]]})
+
+    def test_batch_preserves_order_and_reports_missing(self):
+        ids = f'{self.located.id},999999,{self.bare.id},{self.located.id}'
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/properties/batch/', {'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']], [self.located.id, self.bare.id])
+        self.assertEqual(data['missing'], [999999])
+        # Fragments are now cached, leaving only the stamp query
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                '/api/properties/batch/', {'ids': [self.bare.id, self.located.id]}, content_type='application/json'
+            )
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.bare.id, self.located.id])
+        self.assertEqual(self.client.get('/api/properties/batch/', {'ids': '1,two'}).status_code, 400)
+
+class PropertyListingSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='lister@example.com', email='lister@example.com', password='pass12345', name='Lister',
+        )
+        cls.gym = Feature.objects.create(name='Gym')
+        with property_changes():
+            cls.property = Property.objects.create(
+                title='Garden flat', price=Decimal('25000'), city='Pune', area='Baner', type='Rent', owner=cls.owner,
+            )
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def listing(self):
+        return PropertyListing.objects.get(pk=self.property.pk)
+
+    def test_created_with_property(self):
+        listing = self.listing()
+        self.assertEqual(listing.full_address, 'Baner, Pune')
+        self.assertFalse(listing.has_location)
+        self.assertEqual(listing.owner_name, 'Lister')
+        self.assertEqual((listing.image_count, listing.cover_image), (0, ''))
+
+    def test_deleting_a_property_with_images_removes_its_listing(self):
+        PropertyImage.objects.create(property=self.property, image='https://example.com/1.jpg')
+        PropertyImage.objects.create(property=self.property, image='https://example.com/2.jpg')
+        # Each cascaded image delete used to re-insert the listing row
+        response = self.client.delete(f'/api/properties/{self.property.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(PropertyListing.objects.filter(pk=self.property.pk).exists())
+        self.assertFalse(Property.objects.filter(pk=self.property.pk).exists())
+
+    def test_follows_features_images_and_owner(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.property.features.add(self.gym)
+            first = PropertyImage.objects.create(property=self.property, image='https://example.com/1.jpg')
+            PropertyImage.objects.create(property=self.property, image='https://example.com/2.jpg')
+        listing = self.listing()
+        self.assertEqual(listing.features, [[self.gym.id, 'Gym']])
+        self.assertEqual((listing.image_count, listing.cover_image), (2, 'https://example.com/1.jpg'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+            self.gym.name = 'Fitness centre'
+            self.gym.save()
+            self.owner.name = 'Renamed'
+            self.owner.save(update_fields=['name'])
+        listing = self.listing()
+        self.assertEqual(listing.features, [[self.gym.id, 'Fitness centre']])
+        self.assertEqual((listing.image_count, listing.cover_image), (1, 'https://example.com/2.jpg'))
+        self.assertEqual(listing.owner_name, 'Renamed')
+        self.assertEqual(listing.updated_at, Property.objects.get(pk=self.property.pk).updated_at)
+
+    def test_rolls_back_with_the_write(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.property.title = 'Changed'
+            self.property.save()
+            raise RuntimeError
+        self.assertEqual(self.listing().title, 'Garden flat')
+
+    def test_each_write_rewrites_the_listing_once(self):
+        features = [Feature.objects.create(name=f'Feature {i}') for i in range(10)]
+        with CaptureQueriesContext(connection) as queries, property_changes():
+            for feature in features:
+                self.property.features.add(feature)
+            for i in range(5):
+                PropertyImage.objects.create(property=self.property, image=f'https://example.com/{i}.jpg')
+        rewrites = [q['sql'] for q in queries if q['sql'].startswith('DELETE FROM "core_propertylisting"')]
+        stamps = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "core_property" SET "updated_at"')]
+        self.assertEqual((len(rewrites), len(stamps)), (1, 1))
+        listing = self.listing()
+        self.assertEqual(len(listing.features), 10)
+        self.assertEqual(listing.image_count, 5)
+
+    def put(self, method, features, images):
+        return getattr(self.client, method)(
+            f'/api/properties/{self.property.pk}/',
+            {'title': 'Garden flat', 'price': '25000', 'city': 'Pune', 'type': 'Rent', 'features': features, 'images': images},
+            content_type='application/json',
+        )
+
+    def test_update_replaces_relations_in_constant_queries(self):
+        features = [f'Feature {i}' for i in range(20)]
+        images = [f'https://example.com/{i}.jpg' for i in range(15)]
+        self.assertEqual(self.put('put', features, images).status_code, 200)
+        # One DELETE per relation and a single listing rewrite, however many rows go
+        with self.assertNumQueries(27):
+            response = self.put('put', features[:11], images[:5])
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(27):
+            response = self.put('patch', features[:10], images[:4])
+        self.assertEqual(response.status_code, 200)
+        listing = self.listing()
+        self.assertEqual([name for _, name in listing.features], sorted(features[:10]))
+        self.assertEqual([url for _, url, _ in listing.images], images[:4])
+        self.assertEqual(response.json()['images'][0]['image'], images[0])
+
+    def test_removed_with_property(self):
+        PropertyImage.objects.create(property=self.property, image='https://example.com/1.jpg')
+        self.property.delete()
+        self.assertFalse(PropertyListing.objects.exists())
+
+    def test_rebuild_and_self_healing_read(self):
+        PropertyListing.objects.all().delete()
+        data = build_property_dicts([self.property.pk])
+        self.assertEqual(data[self.property.pk]['full_address'], 'Baner, Pune')
+        self.assertTrue(PropertyListing.objects.filter(pk=self.property.pk).exists())
+        self.assertEqual(rebuild_listings(), 1)
+
+
+class PropertyWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='w@example.com', email='w@example.com', password='pass12345')
+        Feature.objects.create(name='Feature 0')
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def create(self, **extra):
+        return self.client.post('/api/properties/', {
+            'owner': self.owner.pk, 'title': 'Loft', 'price': '45000', 'city': 'Pune', 'type': 'Rent', **extra,
+        }, content_type='application/json')
+
+    def test_create_attaches_relations_in_bulk(self):
+        features = [f'Feature {i}' for i in range(20)]
+        images = [f'https://example.com/{i}.jpg' for i in range(15)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.create(features=features, images=images)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(sorted(feature['name'] for feature in data['features']), sorted(features))
+        self.assertEqual([image['image'] for image in data['images']], images)
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "core_propertyimage"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Feature.objects.count(), 20)
+
+    def test_create_rolls_back_as_a_whole(self):
+        with mock.patch.object(PropertyImage.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.create(title='Half written', features=['Lift'], images=['https://example.com/a.jpg'])
+        self.assertFalse(Property.objects.filter(title='Half written').exists())
+        self.assertFalse(Feature.objects.filter(name='Lift').exists())
+
+    def test_import_recovers_ids_without_returning_inserts(self):
+        rows = [
+            (self.owner.pk, {'title': f'Import {i}', 'price': Decimal(1000 * (i + 1)), 'city': 'Pune', 'type': 'Rent',
+                             'features': ['Feature 0'] if i % 2 else []})
+            for i in range(5)
+        ]
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            with CaptureQueriesContext(connection) as queries:
+                properties = store_properties(rows)
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "core_property" ')]
+        self.assertEqual(len(inserts), 1)
+        for i, property_obj in enumerate(properties):
+            stored = Property.objects.get(pk=property_obj.pk)
+            self.assertEqual(stored.title, f'Import {i}')
+            self.assertEqual(list(stored.features.values_list('name', flat=True)), ['Feature 0'] if i % 2 else [])
+        self.assertEqual(PropertyListing.objects.filter(pk__in=[p.pk for p in properties]).count(), 5)
+
+
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='u@example.com', email='u@example.com', password='pass12345')
+        cls.other = User.objects.create_user(username='v@example.com', email='v@example.com', password='pass12345')
+        cls.property = Property.objects.create(title='Loft', price=Decimal('45000'), city='Pune', type='Rent', owner=cls.owner)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name, MEDIA_URL='/media/')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, *files):
+        return self.client.post(f'/api/properties/{self.property.pk}/images/', {'images': list(files)})
+
+    def png(self, name='photo.png', size=(64, 48)):
+        out = io.BytesIO()
+        Image.new('RGB', size, (200, 120, 40)).save(out, 'PNG')
+        return SimpleUploadedFile(name, out.getvalue(), content_type='image/png')
+
+    def test_only_the_owner_can_upload(self):
+        garbage = SimpleUploadedFile('x.png', b'not an image')
+        self.assertIn(self.upload(garbage).status_code, (401, 403))
+        self.client.force_login(self.other)
+        self.assertEqual(self.upload(garbage).status_code, 403)
+        self.assertFalse(self.property.images.exists())
+
+    @skipUnless(Image, 'Pillow is not installed')
+    def test_renditions_are_stored_once_per_image(self):
+        self.client.force_login(self.owner)
+        response = self.upload(self.png('a.png'), self.png('b.png'), self.png('c.png', (2000, 100)))
+        self.assertEqual(response.status_code, 201)
+        images = response.json()['images']
+        # a.png and b.png have the same bytes
+        self.assertEqual(len(images), 2)
+        thumb = images[1]['renditions']['thumb']
+        with Image.open(os.path.join(settings.MEDIA_ROOT, thumb.removeprefix('/media/'))) as rendered:
+            self.assertEqual(rendered.size, (160, 8))
+
+    @skipUnless(Image, 'Pillow is not installed')
+    def test_invalid_and_oversized_images_are_rejected(self):
+        self.client.force_login(self.owner)
+        response = self.upload(SimpleUploadedFile('x.png', b'not an image'))
+        self.assertEqual(response.status_code, 400)
+        with override_settings(IMAGE_MAX_PIXELS=1000):
+            response = self.upload(self.png(size=(40, 30)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('pixels', response.json()['error'])
+        self.assertFalse(self.property.images.exists())
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(
+            username='c@example.com', email='c@example.com', password='pass12345', name='Cached Owner',
+        )
+        cls.staff = User.objects.create_user(
+            username='staff@example.com', email='staff@example.com', password='pass12345', is_staff=True,
+        )
+        cls.gym = Feature.objects.create(name='Gym')
+        with property_changes():
+            cls.property = Property.objects.create(
+                title='Loft', price=Decimal('45000'), city='Pune', type='Rent', owner=cls.owner,
+            )
+
+    def setUp(self):
+        property_cache.clear()
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def detail(self):
+        response = self.client.get(f'/api/properties/{self.property.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_edits_to_related_rows_invalidate_the_fragment(self):
+        hits = property_cache.hits
+        self.detail()
+        self.detail()
+        self.assertEqual(property_cache.hits, hits + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PropertyImage.objects.create(property=self.property, image='https://example.com/new.jpg')
+        self.assertEqual([image['image'] for image in self.detail()['images']], ['https://example.com/new.jpg'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gym.property_set.add(self.property)
+        self.assertEqual([feature['name'] for feature in self.detail()['features']], ['Gym'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gym.name = 'Fitness centre'
+            self.gym.save()
+        self.assertEqual([feature['name'] for feature in self.detail()['features']], ['Fitness centre'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner.name = 'Renamed Owner'
+            self.owner.save()
+        self.assertEqual(self.detail()['owner']['name'], 'Renamed Owner')
+
+    def test_stats_are_limited_to_staff_and_allowed_addresses(self):
+        for path in ('/api/cache-stats/', '/api/metrics/'):
+            self.assertIn(self.client.get(path).status_code, (401, 403))
+            self.client.force_login(self.owner)
+            self.assertEqual(self.client.get(path).status_code, 403)
+            self.client.force_login(self.staff)
+            self.assertEqual(self.client.get(path).status_code, 200)
+            self.client.logout()
+            with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+                self.assertEqual(self.client.get(path).status_code, 200)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='e@example.com', email='e@example.com', password='pass12345')
+        with property_changes():
+            cls.first = Property.objects.create(title='Loft', price=Decimal('45000'), city='Pune', type='Rent', owner=cls.owner)
+            cls.second = Property.objects.create(title='Villa', price=Decimal('95000'), city='Pune', type='Rent', owner=cls.owner)
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def test_matching_validators_return_not_modified(self):
+        for path in ('/api/properties/', f'/api/properties/{self.first.pk}/'):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            etag, last_modified = response['ETag'], response['Last-Modified']
+            response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_edits_and_deletes_change_the_etag(self):
+        list_etag = self.client.get('/api/properties/')['ETag']
+        detail_etag = self.client.get(f'/api/properties/{self.first.pk}/')['ETag']
+        self.client.patch(f'/api/properties/{self.first.pk}/', {'title': 'Loft with view'}, content_type='application/json')
+        response = self.client.get(f'/api/properties/{self.first.pk}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Loft with view')
+        response = self.client.get('/api/properties/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+
+        # Deleting an older listing leaves the newest updated_at alone
+        list_etag = response['ETag']
+        self.client.delete(f'/api/properties/{self.second.pk}/')
+        response = self.client.get('/api/properties/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.first.pk])
+
+
+class SignedTokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='t@example.com', email='t@example.com', password='pass12345')
+
+    def setUp(self):
+        caches['default'].clear()
+        self.token, _ = issue_token(self.user)
+
+    def get(self, token):
+        return self.client.get(f'/api/users/{self.user.pk}/dashboard/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_valid_token_is_cached(self):
+        self.assertEqual(self.get(self.token).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get(self.token).status_code, 200)
+        self.assertFalse([q for q in queries if 'core_authtoken' in q['sql']])
+
+    def test_expired_and_tampered_tokens_are_rejected(self):
+        later = time.time() + token_settings()['TTL'] + 1
+        with mock.patch('django.core.signing.time.time', return_value=later):
+            self.assertEqual(self.get(self.token).status_code, 401)
+        tampered = self.token[:-1] + ('A' if self.token[-1] != 'A' else 'B')
+        self.assertEqual(self.get(tampered).status_code, 401)
+        self.assertEqual(self.get('not-a-token').status_code, 401)
+
+    def test_revoked_tokens_and_deactivated_users_are_rejected(self):
+        self.assertEqual(self.get(self.token).status_code, 200)
+        other, _ = issue_token(self.user)
+        revoke_tokens([decode_token(self.token)[1]])
+        self.assertEqual(self.get(self.token).status_code, 401)
+        self.assertEqual(self.get(other).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(other).status_code, 401)
+
+    def test_logout_revokes_this_token_or_all(self):
+        second, _ = issue_token(self.user)
+        third, _ = issue_token(self.user)
+        response = self.client.post('/api/logout/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.assertEqual(response.json(), {'revoked': 1})
+        self.assertEqual(self.get(self.token).status_code, 401)
+        self.assertEqual(self.get(second).status_code, 200)
+        response = self.client.post('/api/logout/?all=true', HTTP_AUTHORIZATION=f'Bearer {second}')
+        self.assertEqual(response.json(), {'revoked': 2})
+        self.assertEqual(self.get(third).status_code, 401)
+
+    def test_process_local_cache_is_rejected_outside_debug(self):
+        self.assertEqual(check_token_cache(None), [])
+        with override_settings(REQUIRE_SHARED_CACHE=True):
+            self.assertEqual([error.id for error in check_token_cache(None)], ['core.E001'])
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+                self.assertEqual(check_token_cache(None), [])
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user(username='x1@example.com', email='x1@example.com', password='pass12345', name='Exporter')
+        rows = [
+            (owner.pk, {'title': f'Listing {i}', 'price': Decimal(10000 * (i + 1)), 'city': 'Pune' if i % 2 else 'Goa',
+                        'type': 'Rent', 'features': ['Gym', 'Pool'] if i == 1 else [],
+                        'images': ['https://example.com/1.jpg', 'https://example.com/2.jpg'] if i == 1 else []})
+            for i in range(5)
+        ]
+        with property_changes():
+            cls.ids = [property_obj.pk for property_obj in store_properties(rows)]
+
+    def export(self, **params):
+        response = self.client.get('/api/properties/export/', {'chunk_size': 2, **params})
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_streams_every_listing_in_id_order(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        items = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([item['id'] for item in items], self.ids)
+        self.assertEqual([feature['name'] for feature in items[1]['features']], ['Gym', 'Pool'])
+        self.assertNotIn('_updated_at', items[0])
+
+    def test_csv_has_one_header_and_importable_columns(self):
+        _, body = self.export(output='csv')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(list(rows[0]), CSV_COLUMNS)
+        self.assertEqual([int(row['id']) for row in rows], self.ids)
+        self.assertEqual(rows[1]['features'], 'Gym,Pool')
+        self.assertEqual(rows[1]['images'], 'https://example.com/1.jpg|https://example.com/2.jpg')
+        self.assertEqual(normalize_record(rows[1])['features'], ['Gym', 'Pool'])
+
+    def test_after_resumes_and_filters_apply(self):
+        _, body = self.export(after=self.ids[2])
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], self.ids[3:])
+        # A resumed CSV continues the rows without repeating the header
+        _, body = self.export(output='csv', after=self.ids[2])
+        self.assertEqual([int(row[0]) for row in csv.reader(io.StringIO(body))], self.ids[3:])
+        _, body = self.export(city='Pune', min_price='30000')
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [self.ids[3]])
+        self.assertEqual(self.client.get('/api/properties/export/', {'output': 'xml'}).status_code, 400)
+
+
+class PriceHistoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='p@example.com', email='p@example.com', password='pass12345')
+        cls.property = Property.objects.create(
+            title='Corner shop', price=Decimal('100000'), city='Pune', area='Baner', type='Commercial', owner=cls.owner,
+        )
+        Property.objects.create(title='Office', price=Decimal('300000'), city='Pune', type='Commercial', owner=cls.owner)
+
+    def test_price_changes_are_appended(self):
+        response = self.client.patch(
+            f'/api/properties/{self.property.pk}/', {'price': '120000'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.patch(f'/api/properties/{self.property.pk}/', {'title': 'Corner unit'}, content_type='application/json')
+        history = list(self.property.price_history.order_by('id').values_list('previous_price', 'price'))
+        self.assertEqual(history, [(None, Decimal('100000')), (Decimal('100000'), Decimal('120000'))])
+
+    def test_rollups_track_history_and_match_rebuild(self):
+        self.property.price = Decimal('200000')
+        self.property.save()
+        trend = PriceTrend.objects.get(period='month', city='Pune', area='*', type='Commercial')
+        self.assertEqual((trend.count, trend.total), (3, Decimal('600000')))
+        # Medians are read from 1%-wide histogram buckets
+        self.assertAlmostEqual(float(trend.median), 200000, delta=2000)
+        self.assertEqual(PriceTrend.objects.get(period='day', city='Pune', area='Baner', type='*').count, 2)
+
+        incremental = set(PriceTrend.objects.values_list('period', 'period_start', 'city', 'area', 'type', 'count', 'median'))
+        rebuild_trends()
+        self.assertEqual(
+            set(PriceTrend.objects.values_list('period', 'period_start', 'city', 'area', 'type', 'count', 'median')),
+            incremental,
+        )
+
+    def test_market_trends_endpoint(self):
+        response = self.client.get('/api/market-trends/', {'city': 'Pune', 'type': 'Commercial'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['interval'], 'month')
+        self.assertEqual(len(data['points']), 1)
+        self.assertEqual(data['points'][0]['count'], 2)
+        self.assertEqual(data['points'][0]['average'], '200000.00')
+        self.assertEqual(self.client.get('/api/market-trends/', {'interval': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/market-trends/', {'area': 'Baner'}).status_code, 400)
+
+
+class FacetCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='f@example.com', email='f@example.com', password='pass12345')
+        rows = [
+            (cls.owner.pk, {'title': f'Flat {i}', 'price': price, 'city': city, 'type': property_type,
+                            'features': ['Gym', 'Pool'][:i % 3]})
+            for i, (price, city, property_type) in enumerate([
+                (Decimal('9000'), 'Pune', 'Rent'), (Decimal('25000'), 'Pune', 'Rent'),
+                (Decimal('49999.99'), 'Pune', 'Buy'), (Decimal('50000'), 'Goa', 'Rent'),
+                (Decimal('120000'), 'Goa', 'Buy'), (Decimal('750000'), 'Pune', 'Buy'),
+            ])
+        ]
+        with property_changes():
+            store_properties(rows)
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def counts(self):
+        return (
+            set(FacetCount.objects.filter(count__gt=0).values_list('type', 'city', 'price_bucket', 'count')),
+            set(FeatureFacetCount.objects.filter(count__gt=0).values_list(
+                'feature_id', 'type', 'city', 'price_bucket', 'count',
+            )),
+        )
+
+    def test_incremental_counts_match_rebuild(self):
+        response = self.client.post('/api/properties/', {
+            'owner': self.owner.pk, 'title': 'New', 'price': '30000', 'city': 'Pune', 'type': 'Rent',
+            'features': ['Gym', 'Lift'],
+        }, content_type='application/json')
+        created = response.json()['id']
+        flat = Property.objects.get(title='Flat 1')
+        self.client.patch(f'/api/properties/{flat.pk}/', {'price': '600000', 'city': 'Goa'}, content_type='application/json')
+        self.client.put(f'/api/properties/{created}/', {
+            'title': 'New', 'price': '30000', 'city': 'Pune', 'type': 'Buy', 'features': ['Pool'],
+        }, content_type='application/json')
+        Feature.objects.get(name='Gym').property_set.add(Property.objects.get(title='Flat 3'))
+        Feature.objects.get(name='Pool').property_set.clear()
+        self.client.delete(f'/api/properties/{Property.objects.get(title="Flat 4").pk}/')
+
+        incremental = self.counts()
+        rebuild_facets()
+        self.assertEqual(incremental, self.counts())
+
+    def test_price_bounds_and_paging_params(self):
+        for query in [
+            '', 'max_price=50000', 'min_price=12000&max_price=99999.99', 'min_price=25000&max_price=25000',
+            'city=Pune&min_price=10000&max_price=1000000', 'type=Buy&min_price=50000', 'max_price=100',
+        ]:
+            params = QueryDict(query)
+            expected = live_facets(filter_properties(Property.objects.all(), params))
+            self.assertEqual(property_facets(params), expected, query)
+        # Aligned filters plus parameters that only shape the response never query Property
+        params = QueryDict('city=Pune&min_price=25000&max_price=99999.99&format=columnar&page_size=5&ordering=price')
+        with mock.patch('core.facets.live_facet_querysets', side_effect=AssertionError):
+            self.assertEqual(property_facets(params)['total'], 2)
+
+
+class SimilarRefreshTests(TestCase):
+    def test_hold_refreshes_once_on_the_calling_thread(self):
+        owner = User.objects.create_user(username='h@example.com', email='h@example.com', password='pass12345')
+        runs = refresh_queue.runs
+        with refresh_queue.hold():
+            for city in ('Pune', 'Goa'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    store_properties([(owner.pk, {'title': 'Flat', 'price': Decimal('9000'), 'city': city, 'type': 'Rent'})])
+            self.assertEqual(refresh_queue.runs, runs)
+        self.assertEqual(refresh_queue.runs, runs + 1)
+        self.assertEqual(refresh_queue.flush(), 0)
+
+    def test_changes_are_merged_and_scored_within_their_block(self):
+        owner = User.objects.create_user(username='n@example.com', email='n@example.com', password='pass12345')
+        gym = Feature.objects.create(name='Gym')
+        runs = refresh_queue.runs
+        with self.captureOnCommitCallbacks(execute=True):
+            pune = [
+                Property.objects.create(
+                    title=f'Flat {i}', price=Decimal(20000 + 1000 * i), city='Pune', type='Rent', owner=owner,
+                    latitude=Decimal('18.52') + Decimal(i) / 100, longitude=Decimal('73.85'),
+                )
+                for i in range(4)
+            ]
+            pune[0].features.add(gym)
+            goa = Property.objects.create(title='Villa', price=Decimal('21000'), city='Goa', type='Rent', owner=owner)
+        # Every save and feature change above is refreshed in one run
+        self.assertEqual(refresh_queue.flush(), 5)
+        self.assertEqual(refresh_queue.runs, runs + 1)
+
+        neighbours = list(SimilarProperty.objects.filter(property=pune[1]).order_by('rank').values_list('similar_id', flat=True))
+        # Ranked by price, position and features (only Flat 0 has a gym);
+        # Goa is outside the block
+        self.assertEqual(neighbours, [pune[2].pk, pune[3].pk, pune[0].pk])
+        self.assertFalse(SimilarProperty.objects.filter(similar=goa).exists())
+
+
+    def test_large_import_gets_neighbours(self):
+        owner = User.objects.create_user(username='i@example.com', email='i@example.com', password='pass12345')
+        rng = random.Random(7)
+        cities = {'Pune': (18.52, 73.85), 'Mumbai': (19.07, 72.87), 'Delhi': (28.61, 77.2), 'Chennai': (13.08, 80.27)}
+        rows = []
+        for i in range(1000):
+            city, (lat, lng) = rng.choice(sorted(cities.items()))
+            rows.append((owner.id, {
+                'title': f'Listing {i}', 'price': Decimal(rng.randrange(10000, 90000)), 'city': city,
+                'type': rng.choice(['Rent', 'Buy']),
+                'latitude': Decimal(f'{lat + rng.uniform(-0.3, 0.3):.6f}'),
+                'longitude': Decimal(f'{lng + rng.uniform(-0.3, 0.3):.6f}'),
+            }))
+        with self.captureOnCommitCallbacks(execute=True):
+            properties = store_properties(rows)
+        self.assertEqual(refresh_queue.flush(), 1000)
+        with_neighbours = SimilarProperty.objects.values('property_id').distinct().count()
+        self.assertEqual(with_neighbours, 1000)
+        sample = properties[0]
+        neighbour_ids = SimilarProperty.objects.filter(property=sample).values_list('similar_id', flat=True)
+        self.assertEqual(
+            set(Property.objects.filter(pk__in=neighbour_ids).values_list('type', flat=True)), {sample.type},
+        )
+
+class AutocompleteTests(TestCase):
+    def test_counts_follow_commits_only(self):
+        owner = User.objects.create_user(username='a@example.com', email='a@example.com', password='pass12345')
+        autocomplete.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Property.objects.create(title='Flat', price=Decimal('1000'), city='Nashik', type='Rent', owner=owner)
+                transaction.set_rollback(True)
+            Property.objects.create(title='Flat', price=Decimal('1000'), city='Nagpur', type='Rent', owner=owner)
+        self.assertEqual(autocomplete.suggest('na', ['city']), [{'value': 'Nagpur', 'kind': 'city', 'count': 1}])
+
+
+class OwnerDashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='o@example.com', email='o@example.com', password='pass12345')
+        cls.other = User.objects.create_user(username='x@example.com', email='x@example.com', password='pass12345')
+        cls.property = Property.objects.create(title='Flat', price=Decimal('50000'), city='Pune', type='Rent', owner=cls.owner)
+
+    def test_only_the_owner_can_read_it(self):
+        url = f'/api/users/{self.owner.pk}/dashboard/'
+        self.assertIn(self.client.get(url).status_code, (401, 403))
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.owner)
+        self.assertEqual(self.client.get(url).json()['total'], 1)
+
+    def test_writes_that_skip_invalidation_are_seen(self):
+        self.client.force_login(self.owner)
+        url = f'/api/users/{self.owner.pk}/dashboard/'
+        self.assertEqual(self.client.get(url).json()['enquiries']['total'], 0)
+        # bulk_create sends no signals, like writes from another worker
+        ContactMessage.objects.bulk_create([ContactMessage(
+            property=self.property, owner=self.owner, name='Visitor', email='v@example.com', message='Hi',
+        )])
+        self.assertEqual(self.client.get(url).json()['enquiries']['total'], 1)
+
+
+class SavedSearchAlertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = User.objects.create_user(username='b@example.com', email='b@example.com', password='pass12345')
+        cls.seller = User.objects.create_user(username='s@example.com', email='s@example.com', password='pass12345')
+        cls.gym = Feature.objects.create(name='Gym')
+        cls.pool = Feature.objects.create(name='Pool')
+
+    def setUp(self):
+        saved_search_index.buckets = None
+        self.client.force_login(self.buyer)
+
+    def tearDown(self):
+        # Refresh the new listings' neighbours while the test database exists
+        refresh_queue.flush()
+        # Later tests must not match listings against these rolled-back searches
+        saved_search_index.buckets = None
+
+    def test_bucket_matches_brute_force(self):
+        rng = random.Random(7)
+        bucket = SearchBucket()
+        searches = {}
+        for search_id in range(1, 500):
+            low = rng.choice([None, rng.randrange(0, 1000)])
+            high = rng.choice([None, rng.randrange(500, 1500)])
+            required = rng.sample(range(5), rng.choice([0, 0, 1, 2]))
+            searches[search_id] = search_entry(search_id, search_id, low, high, required)
+            bucket.add(searches[search_id])
+        # Leaves both removals and additions that have not been rebuilt into the tree
+        for search_id in rng.sample(sorted(searches), PENDING_LIMIT + 10):
+            bucket.remove(search_id)
+            del searches[search_id]
+        bucket.add(searches.setdefault(600, search_entry(600, 600, 250, 250, [])))
+        # Edits re-add an id whose old interval may still be in the tree
+        for search_id in rng.sample(sorted(searches), 20):
+            searches[search_id] = search_entry(search_id, search_id, rng.randrange(0, 800), None, [])
+            bucket.add(searches[search_id])
+        for _ in range(300):
+            price = rng.choice([250, rng.randrange(-10, 1600)])
+            features = frozenset(rng.sample(range(5), rng.randrange(0, 5)))
+            matches = {}
+            bucket.match(price, features, matches)
+            expected = {
+                search_id for search_id, (low, high, (_, _, required)) in searches.items()
+                if low <= price <= high and required <= features
+            }
+            self.assertEqual(set(matches), expected)
+
+    def test_edited_searches_keep_matching(self):
+        saved_search_index.ensure_built()
+        with self.captureOnCommitCallbacks(execute=True):
+            search = SavedSearch.objects.create(user=self.buyer, city='Pune', max_price=Decimal('30000'))
+        self.assertEqual(saved_search_index.match('Pune', 'Rent', 25000, []), {search.pk: self.buyer.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            search.features.add(self.gym)
+        self.assertEqual(saved_search_index.match('Pune', 'Rent', 25000, []), {})
+        self.assertEqual(saved_search_index.match('Pune', 'Rent', 25000, [self.gym.pk]), {search.pk: self.buyer.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            search.max_price = Decimal('50000')
+            search.save()
+        self.assertEqual(saved_search_index.match('Pune', 'Rent', 40000, [self.gym.pk]), {search.pk: self.buyer.pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            search.delete()
+        self.assertEqual(saved_search_index.match('Pune', 'Rent', 40000, [self.gym.pk]), {})
+
+    def test_new_listings_queue_alerts(self):
+        response = self.client.post('/api/saved-searches/', {
+            'city': 'Pune', 'type': 'Rent', 'max_price': '30000', 'features': ['Gym'],
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        pune = response.json()['id']
+        anywhere = SavedSearch.objects.create(user=self.buyer, min_price=Decimal('1000000'))
+        own = SavedSearch.objects.create(user=self.seller, city='Pune')
+        response = self.client.post('/api/saved-searches/', {'min_price': '5', 'max_price': '1'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            # Searches created after the index was built are picked up by the signals
+            saved_search_index.ensure_built()
+            extra = SavedSearch.objects.create(user=self.buyer, city='Pune', type='Rent')
+            extra.features.add(self.pool)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/properties/', {
+                'owner': self.seller.pk, 'title': 'Flat', 'price': '25000', 'city': 'Pune', 'type': 'Rent',
+                'features': ['Gym'],
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        flat = response.json()['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            villa, cheap = store_properties([
+                (self.seller.pk, {'title': 'Villa', 'price': Decimal('2000000'), 'city': 'Goa', 'type': 'Buy'}),
+                (self.buyer.pk, {'title': 'Own', 'price': Decimal('20000'), 'city': 'Pune', 'type': 'Rent', 'features': ['Gym', 'Pool']}),
+            ])
+        alert_buffer.flush()
+        # Searches never alert their owner about their own listings
+        self.assertEqual(set(SearchAlert.objects.values_list('saved_search_id', 'property_id')), {
+            (pune, flat), (anywhere.pk, villa.pk), (own.pk, cheap.pk),
+        })
+
+        response = self.client.get('/api/saved-searches/alerts/', {'fields': 'id,title'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([alert['property'] for alert in results], [{'id': villa.pk, 'title': 'Villa'}, {'id': flat, 'title': 'Flat'}])
+        self.assertEqual(len(self.client.get('/api/saved-searches/').json()), 3)
+
+        # Returned alerts are stamped once; later reads keep the first delivery time
+        delivered = [alert['delivered_at'] for alert in results]
+        self.assertTrue(all(delivered))
+        self.assertEqual(SearchAlert.objects.filter(user=self.buyer, delivered_at__isnull=True).count(), 0)
+        self.assertIsNone(SearchAlert.objects.get(user=self.seller).delivered_at)
+        response = self.client.get('/api/saved-searches/alerts/', {'fields': 'id'})
+        self.assertEqual([alert['delivered_at'] for alert in response.json()['results']], delivered)
+
+
+class MapSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='m@example.com', email='m@example.com', password='pass12345')
+        rows = [
+            (cls.owner.pk, {'title': title, 'price': Decimal('1000'), 'city': 'Suva', 'type': 'Rent',
+                            'latitude': Decimal(lat), 'longitude': Decimal(lng)})
+            for title, lat, lng in [
+                ('Centre', '-17.000000', '179.990000'), ('Near', '-17.010000', '179.980000'),
+                ('East', '-17.000000', '-179.980000'), ('Far', '-17.200000', '179.990000'),
+                ('Other side', '-17.000000', '0.000000'),
+            ]
+        ]
+        with property_changes():
+            store_properties(rows)
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def nearby(self, query):
+        response = self.client.get(f'/api/properties/nearby/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [(item['title'], item['distance_km']) for item in response.json()]
+
+    def test_nearby_is_ordered_and_limited_to_the_radius(self):
+        results = self.nearby('lat=-17&lng=179.99&radius_km=5')
+        self.assertEqual([title for title, _ in results], ['Centre', 'Near', 'East'])
+        distances = [distance for _, distance in results]
+        self.assertEqual(distances, sorted(distances))
+        self.assertTrue(all(distance <= 5 for distance in distances))
+        self.assertEqual([title for title, _ in self.nearby('lat=-17&lng=179.99&radius_km=2')], ['Centre', 'Near'])
+
+    def test_nearby_crosses_the_antimeridian(self):
+        self.assertEqual([title for title, _ in self.nearby('lat=-17&lng=-179.99&radius_km=5')], ['East', 'Centre', 'Near'])
+
+    def test_clusters_viewport_crosses_the_antimeridian(self):
+        response = self.client.get('/api/properties/clusters/?south=-18&north=-16&west=179&east=-179&zoom=10')
+        self.assertEqual(sum(item['count'] for item in response.json()['clusters']), 4)
+
+    def snapshot(self):
+        return {
+            (cell, count, round(latitude_sum, 4), round(longitude_sum, 4))
+            for cell, count, latitude_sum, longitude_sum in MapCluster.objects.filter(count__gt=0).values_list(
+                'cell', 'count', 'latitude_sum', 'longitude_sum',
+            )
+        }
+
+    def test_cluster_counts_match_rebuild(self):
+        response = self.client.post('/api/properties/', {
+            'owner': self.owner.pk, 'title': 'New', 'price': '1000', 'city': 'Suva', 'type': 'Rent',
+            'latitude': '-17.050000', 'longitude': '179.900000',
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        with self.captureOnCommitCallbacks(execute=True):
+            moved = Property.objects.get(title='Far')
+            moved.latitude, moved.longitude = Decimal('40.700000'), Decimal('-74.000000')
+            moved.save()
+            nudged = Property.objects.get(title='Near')
+            nudged.latitude = Decimal('-17.010001')
+            nudged.save()
+        self.client.delete(f'/api/properties/{Property.objects.get(title="Other side").pk}/')
+
+        incremental = self.snapshot()
+        rebuild_clusters()
+        self.assertEqual(incremental, self.snapshot())
+
+
+class PropertySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='q@example.com', email='q@example.com', password='pass12345')
+        cls.pool = Feature.objects.create(name='Pool')
+        with property_changes():
+            cls.titled = Property.objects.create(
+                title='Garden villa', price=Decimal('90000'), city='Pune', type='Rent', owner=cls.owner,
+            )
+            cls.described = Property.objects.create(
+                title='Corner flat', price=Decimal('40000'), city='Pune', type='Rent', owner=cls.owner,
+                description='Shared garden',
+            )
+            cls.elsewhere = Property.objects.create(
+                title='Garden cottage', price=Decimal('30000'), city='Goa', type='Rent', owner=cls.owner,
+            )
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def search(self, **params):
+        response = self.client.get('/api/properties/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['results']]
+
+    def test_title_matches_outrank_description_matches(self):
+        self.assertEqual(self.search(q='gard', city='Pune'), [self.titled.pk, self.described.pk])
+        # Every term must match
+        self.assertEqual(self.search(q='garden villa'), [self.titled.pk])
+
+    def test_query_combines_with_filters(self):
+        self.assertEqual(self.search(q='garden', max_price='50000'), [self.elsewhere.pk, self.described.pk])
+        self.assertEqual(self.search(q='garden', city='Goa'), [self.elsewhere.pk])
+        self.assertEqual(self.search(q='garden', ordering='price'), [self.elsewhere.pk, self.described.pk, self.titled.pk])
+
+    def test_edits_are_reindexed_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.put(
+                f'/api/properties/{self.elsewhere.pk}/',
+                {'title': 'Beach cottage', 'price': '30000', 'city': 'Goa', 'type': 'Rent', 'features': ['Pool', 'Jacuzzi']},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        deletes = [q['sql'] for q in queries if q['sql'].startswith('DELETE FROM "core_searchtoken"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(self.search(q='beach jacuzzi'), [self.elsewhere.pk])
+        self.assertNotIn(self.elsewhere.pk, self.search(q='garden'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pool.name = 'Plunge pool'
+            self.pool.save()
+        self.assertEqual(self.search(q='plunge'), [self.elsewhere.pk])
+
+
+class PropertyListParamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='l@example.com', email='l@example.com', password='pass12345')
+        cls.other = User.objects.create_user(username='o@example.com', email='o@example.com', password='pass12345')
+        rows = [
+            (owner.pk, {'title': title, 'price': Decimal(price), 'city': city, 'type': property_type, 'features': features})
+            for owner, title, price, city, property_type, features in [
+                (cls.owner, 'A', '5000', 'Pune', 'Rent', ['Gym', 'Pool']),
+                (cls.owner, 'B', '5000', 'Pune', 'Buy', ['Gym']),
+                (cls.owner, 'C', '8000', 'Goa', 'Rent', ['Pool']),
+                (cls.other, 'D', '5000', 'Pune', 'Rent', ['Gym', 'Pool', 'Lift']),
+                (cls.other, 'E', '12000', 'Goa', 'Buy', []),
+                (cls.other, 'F', '3000', 'Pune', 'Rent', ['Gym']),
+            ]
+        ]
+        with property_changes():
+            store_properties(rows)
+        # Shared timestamps, so the id tiebreak decides the order within them
+        now = timezone.now()
+        Property.objects.filter(title__in=['A', 'B', 'C']).update(created_at=now)
+        Property.objects.filter(title__in=['D', 'E', 'F']).update(created_at=now - timedelta(days=1))
+
+    def titles(self, path, params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.json()['results']]
+
+    def test_filters(self):
+        for path in ('/api/properties/', '/api/async/properties/'):
+            for params, expected in [
+                ({'owner': self.owner.pk}, {'A', 'B', 'C'}),
+                ({'city': 'Goa'}, {'C', 'E'}),
+                ({'type': 'Buy'}, {'B', 'E'}),
+                ({'min_price': '5000', 'max_price': '8000'}, {'A', 'B', 'C', 'D'}),
+                ({'features': 'Gym,Pool'}, {'A', 'D'}),
+                ({'features': ['Gym', 'Lift']}, {'D'}),
+                ({'owner': self.other.pk, 'city': 'Pune', 'features': 'Gym', 'max_price': '4000'}, {'F'}),
+                ({'features': 'Sauna'}, set()),
+            ]:
+                self.assertEqual(set(self.titles(path, params)), expected, (path, params))
+
+    def test_sort_keys_break_ties_on_id(self):
+        ids = dict(Property.objects.values_list('title', 'id'))
+
+        def by(key, reverse=False):
+            rows = Property.objects.values_list('title', key)
+            return [title for title, _ in sorted(rows, key=lambda row: (row[1], ids[row[0]]), reverse=reverse)]
+
+        for path in ('/api/properties/', '/api/async/properties/'):
+            for ordering, expected in [
+                ('price', by('price')),
+                ('-price', by('price', reverse=True)),
+                ('created_at', by('created_at')),
+                ('-created_at', by('created_at', reverse=True)),
+                ('title', by('created_at', reverse=True)),
+            ]:
+                self.assertEqual(self.titles(path, {'ordering': ordering}), expected, (path, ordering))
+
+    def test_cursor_pages_are_stable_across_inserts(self):
+        for ordering in ('price', '-price', '-created_at'):
+            seen = []
+            response = self.client.get('/api/properties/', {'ordering': ordering, 'page_size': 2})
+            while True:
+                data = response.json()
+                seen.extend(item['title'] for item in data['results'])
+                if len(seen) == 2:
+                    # A new row at the head of every ordering must not shift later pages
+                    with property_changes():
+                        store_properties([(self.owner.pk, {
+                            'title': f'New {ordering}', 'price': Decimal('5000'), 'city': 'Pune', 'type': 'Rent',
+                        })])
+                if not data['next']:
+                    break
+                response = self.client.get(data['next'])
+            self.assertEqual(len(seen), len(set(seen)), ordering)
+            self.assertEqual(set(seen) - {title for title in seen if title.startswith('New')},
+                             {'A', 'B', 'C', 'D', 'E', 'F'}, ordering)
+            Property.objects.filter(title__startswith='New').delete()
+
+    def test_previous_links_retrace_the_pages(self):
+        pages = []
+        url, params = '/api/properties/', {'ordering': '-price', 'page_size': 2}
+        while url:
+            data = self.client.get(url, params).json()
+            pages.append([item['title'] for item in data['results']])
+            url, params, previous = data['next'], None, data['previous']
+        backwards = []
+        while previous:
+            data = self.client.get(previous).json()
+            backwards.append([item['title'] for item in data['results']])
+            previous = data['previous']
+        self.assertEqual(backwards, pages[-2::-1])
+
+    def test_invalid_owner_is_rejected(self):
+        for path in ('/api/properties/', '/api/async/properties/'):
+            response = self.client.get(path, {'owner': 'abc'})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('owner', response.json())
+
+    def test_invalid_cursor_is_not_found(self):
+        for path in ('/api/properties/', '/api/async/properties/'):
+            response = self.client.get(path, {'cursor': 'garbage'})
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+    async def test_async_list_reports_queries(self):
+        response = await self.async_client.get('/api/async/properties/')
+        self.assertEqual(response.status_code, 200)
+        db_timing = response['Server-Timing'].split(', ')[0]
+        self.assertRegex(db_timing, r'^db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+
+
+REPLICAS = {'ALIASES': ['replica1'], 'STICKY_SECONDS': 5, 'HEALTH_INTERVAL': 5, 'MAX_LAG': None, 'CACHE_ALIAS': 'default'}
+
+
+@skipUnless('replica1' in settings.DATABASES, 'needs a replica alias, e.g. DJANGO_DB_ENGINE=sqlite')
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class WriteBehindBufferTests(TransactionTestCase):
+    # Committed rows, so the buffer's worker thread can insert on its own connection
+
+    def setUp(self):
+        owner = User.objects.create_user(username='wb@example.com', email='wb@example.com', password='pass12345')
+        self.property = Property.objects.create(title='Flat', price=Decimal('1000'), city='Pune', type='Rent', owner=owner)
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def message(self, name='Visitor'):
+        return ContactMessage(property=self.property, owner_id=self.property.owner_id, name=name, email='v@example.com', message='Hi')
+
+    def test_full_batch_is_flushed_by_the_caller(self):
+        flushed = []
+        buffer = WriteBehindBuffer(ContactMessage, max_size=3, max_delay=3600, on_flush=flushed.append)
+        buffer.add(self.message())
+        buffer.add(self.message())
+        self.assertEqual(ContactMessage.objects.count(), 0)
+        buffer.add(self.message())
+        self.assertEqual(ContactMessage.objects.count(), 3)
+        self.assertEqual([len(batch) for batch in flushed], [3])
+        self.assertEqual(buffer.stats()['pending'], 0)
+
+    def test_partial_batch_is_flushed_after_the_delay(self):
+        buffer = WriteBehindBuffer(ContactMessage, max_size=100, max_delay=0.05)
+        buffer.add(self.message())
+        buffer.add(self.message())
+        deadline = time.monotonic() + 5
+        while buffer.flushed < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(buffer.stats()['batches'], 1)
+        self.assertEqual(ContactMessage.objects.count(), 2)
+
+    def test_pending_rows_are_drained_at_exit(self):
+        with mock.patch('core.buffers.atexit.register') as register:
+            buffer = WriteBehindBuffer(ContactMessage, max_size=100, max_delay=3600)
+        buffer.add(self.message())
+        (drain,), _ = register.call_args
+        self.assertEqual(drain(), 1)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def test_failing_batch_falls_back_to_single_inserts(self):
+        buffer = WriteBehindBuffer(ContactMessage, max_size=3, max_delay=3600)
+        buffer.add(self.message('First'))
+        # NOT NULL violation fails the whole bulk INSERT
+        buffer.add(self.message(None))
+        with self.assertLogs('core.buffers', 'ERROR'):
+            buffer.add(self.message('Third'))
+        self.assertEqual(sorted(ContactMessage.objects.values_list('name', flat=True)), ['First', 'Third'])
+        self.assertEqual((buffer.flushed, buffer.failed), (2, 1))
+
+
+class PrimaryReplicaRoutingTests(TransactionTestCase):
+    # The SQLite stand-in mirrors the test database on its own connection,
+    # so it sees committed rows like an up-to-date replica
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        replica_health.reset()
+        caches['default'].clear()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        refresh_queue.flush()
+
+    def read_alias(self, method='get', status=200, **headers):
+        """Runs a request through ReplicaMiddleware; returns the alias its reads used"""
+        def view(request):
+            return HttpResponse(Property.objects.all().db, status=status)
+        request = getattr(self.factory, method)('/api/properties/', **headers)
+        return ReplicaMiddleware(view)(request).content.decode()
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.read_alias(), 'replica1')
+        self.assertEqual(self.read_alias('head'), 'replica1')
+
+    def test_unsafe_requests_and_code_outside_requests_use_primary(self):
+        self.assertEqual(self.read_alias('post'), 'default')
+        self.assertEqual(self.read_alias('delete'), 'default')
+        self.assertEqual(Property.objects.all().db, 'default')
+
+    def test_writes_and_transactions_use_primary(self):
+        router = PrimaryReplicaRouter()
+        token = use_replicas.set(True)
+        try:
+            self.assertEqual(router.db_for_write(Property), 'default')
+            self.assertEqual(router.db_for_read(Property), 'replica1')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Property), 'default')
+        finally:
+            use_replicas.reset(token)
+        self.assertFalse(router.allow_migrate('replica1', 'core'))
+        self.assertTrue(router.allow_migrate('default', 'core'))
+
+    def test_write_pins_client_to_primary_for_sticky_window(self):
+        writer = {'HTTP_AUTHORIZATION': 'Bearer writer'}
+        self.assertEqual(self.read_alias('post', status=201, **writer), 'default')
+        self.assertEqual(self.read_alias(**writer), 'default')
+        self.assertEqual(self.read_alias(HTTP_AUTHORIZATION='Bearer reader'), 'replica1')
+        # The pin lapses with its cache entry
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 6):
+            self.assertEqual(self.read_alias(**writer), 'replica1')
+
+    def test_failed_write_does_not_pin(self):
+        writer = {'HTTP_AUTHORIZATION': 'Bearer writer'}
+        self.read_alias('post', status=400, **writer)
+        self.assertEqual(self.read_alias(**writer), 'replica1')
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        with mock.patch.object(ReplicaHealth, 'check', return_value=False) as check:
+            self.assertEqual(self.read_alias(), 'default')
+            self.assertEqual(self.read_alias(), 'default')
+        # The failed verdict is reused until HEALTH_INTERVAL passes
+        self.assertEqual(check.call_count, 1)
+        with mock.patch('core.routers.time.monotonic', return_value=time.monotonic() + 6):
+            self.assertEqual(self.read_alias(), 'replica1')
+
+    def test_health_check_queries_replica(self):
+        self.assertTrue(replica_health.check('replica1'))
+
+    def test_api_reads_committed_rows_through_replica(self):
+        owner = User.objects.create_user(username='o@example.com', email='o@example.com', password='pass12345')
+        Property.objects.create(title='Loft', price=Decimal('5000'), city='Pune', type='Rent', owner=owner)
+        replica_queries = []
+        with connections['replica1'].execute_wrapper(lambda execute, sql, *args: replica_queries.append(sql) or execute(sql, *args)):
+            response = self.client.get('/api/properties/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['title'] for p in response.json()['results']], ['Loft'])
+        self.assertTrue(replica_queries)
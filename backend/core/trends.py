@@ -0,0 +1,160 @@
+import math
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PriceHistory, PriceTrend
+
+# Marks a rollup across every city, area or type
+ALL = '*'
+PERIODS = ('day', 'month')
+# Median resolution: prices are counted in buckets 1% wide on a log scale
+HISTOGRAM_STEP = 1.01
+KEY_CHUNK_SIZE = 200
+REBUILD_CHUNK_SIZE = 5000
+
+
+def histogram_bucket(price):
+    return round(math.log(max(float(price), 1.0), HISTOGRAM_STEP))
+
+
+def bucket_price(bucket):
+    return Decimal(HISTOGRAM_STEP ** bucket).quantize(Decimal('0.01'))
+
+
+def histogram_median(histogram):
+    """Price of the bucket holding the middle entry, or None if empty"""
+    count = sum(histogram.values())
+    if not count:
+        return None
+    seen = 0
+    for bucket in sorted(histogram, key=int):
+        seen += histogram[bucket]
+        if seen * 2 >= count:
+            return bucket_price(int(bucket))
+
+
+def period_starts(changed_at):
+    day = timezone.localdate(changed_at) if timezone.is_aware(changed_at) else changed_at.date()
+    return {'day': day, 'month': day.replace(day=1)}
+
+
+def rollup_keys(city, area, property_type):
+    """Every (city, area, type) rollup one price counts towards"""
+    return [
+        (city, area, property_type), (city, area, ALL), (city, ALL, property_type), (city, ALL, ALL),
+        (ALL, ALL, property_type), (ALL, ALL, ALL),
+    ]
+
+
+def accumulate(totals, entry):
+    """Adds one PriceHistory entry to {(period, start, city, area, type): [count, total, histogram]}"""
+    bucket = str(histogram_bucket(entry.price))
+    for period, start in period_starts(entry.changed_at).items():
+        for city, area, property_type in rollup_keys(entry.city, entry.area, entry.type):
+            total = totals.setdefault((period, start, city, area, property_type), [0, Decimal(0), Counter()])
+            total[0] += 1
+            total[1] += entry.price
+            total[2][bucket] += 1
+
+
+def trend_lookup(key):
+    period, start, city, area, property_type = key
+    return Q(period=period, period_start=start, city=city, area=area, type=property_type)
+
+
+def add_to_trends(entries):
+    """Folds new PriceHistory entries into the daily and monthly rollups"""
+    totals = {}
+    for entry in entries:
+        accumulate(totals, entry)
+    if not totals:
+        return
+    keys = list(totals)
+    with transaction.atomic():
+        PriceTrend.objects.bulk_create(
+            [PriceTrend(period=p, period_start=s, city=c, area=a, type=t) for p, s, c, a, t in keys],
+            ignore_conflicts=True, batch_size=1000,
+        )
+        for start in range(0, len(keys), KEY_CHUNK_SIZE):
+            chunk = keys[start:start + KEY_CHUNK_SIZE]
+            rows = list(PriceTrend.objects.select_for_update().filter(reduce(or_, map(trend_lookup, chunk))))
+            for row in rows:
+                count, total, histogram = totals[(row.period, row.period_start, row.city, row.area, row.type)]
+                row.count += count
+                row.total += total
+                merged = Counter(row.histogram)
+                merged.update(histogram)
+                row.histogram = dict(merged)
+                row.median = histogram_median(row.histogram)
+            PriceTrend.objects.bulk_update(rows, ['count', 'total', 'histogram', 'median'])
+
+
+def record_prices(changes):
+    """
+    Appends a PriceHistory entry for each (property, previous price) pair and
+    updates the rollups. A previous price of None records a new listing at
+    its creation time.
+    """
+    now = timezone.now()
+    entries = [
+        PriceHistory(
+            property_id=property_obj.pk,
+            price=Decimal(str(property_obj.price)),
+            previous_price=previous_price,
+            city=property_obj.city,
+            area=property_obj.area,
+            type=property_obj.type,
+            changed_at=(property_obj.created_at or now) if previous_price is None else now,
+        )
+        for property_obj, previous_price in changes
+    ]
+    if not entries:
+        return
+    with transaction.atomic():
+        PriceHistory.objects.bulk_create(entries, batch_size=1000)
+        add_to_trends(entries)
+
+
+def rebuild_trends(chunk_size=REBUILD_CHUNK_SIZE):
+    """Recomputes every rollup from the history table; returns the number of rollup rows"""
+    totals = {}
+    for entry in PriceHistory.objects.order_by().only('price', 'city', 'area', 'type', 'changed_at').iterator(
+        chunk_size=chunk_size
+    ):
+        accumulate(totals, entry)
+    rows = []
+    for (period, start, city, area, property_type), (count, total, histogram) in totals.items():
+        histogram = dict(histogram)
+        rows.append(PriceTrend(
+            period=period, period_start=start, city=city, area=area, type=property_type,
+            count=count, total=total, histogram=histogram, median=histogram_median(histogram),
+        ))
+    with transaction.atomic():
+        PriceTrend.objects.all().delete()
+        PriceTrend.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def default_start(period, end):
+    if period == 'day':
+        return end - timedelta(days=89)
+    # The first day of the month 23 months back, i.e. two years of points
+    month_index = end.year * 12 + end.month - 1 - 23
+    return end.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+
+def market_trends(period, city=ALL, area=ALL, property_type=ALL, start=None, end=None):
+    """Returns [(period start, count, total, median)] for one rollup, oldest first"""
+    rows = PriceTrend.objects.filter(period=period, city=city, area=area, type=property_type)
+    if start is not None:
+        rows = rows.filter(period_start__gte=start)
+    if end is not None:
+        rows = rows.filter(period_start__lte=end)
+    return list(rows.order_by('period_start').values_list('period_start', 'count', 'total', 'median'))
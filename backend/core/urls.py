@@ -1,6 +1,7 @@
 from rest_framework import routers
-from .views import UserViewSet, PropertyViewSet, PropertyImageViewSet, FeatureViewSet, RegisterView, LoginView, ContactMessageViewSet
+from .views import UserViewSet, PropertyViewSet, PropertyImageViewSet, FeatureViewSet, RegisterView, LoginView, LogoutView, ContactMessageViewSet, CacheStatsView, MarketTrendsView, MetricsView, SavedSearchViewSet
 from django.urls import path, include
+from . import async_views, views
 
 router = routers.DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -8,9 +9,18 @@ router.register(r'properties', PropertyViewSet)
 router.register(r'images', PropertyImageViewSet)
 router.register(r'features', FeatureViewSet)
 router.register(r'contact-messages', ContactMessageViewSet)
+router.register(r'saved-searches', SavedSearchViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
+    path('autocomplete/', views.autocomplete_view, name='autocomplete'),
+    path('market-trends/', MarketTrendsView.as_view(), name='market-trends'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('async/properties/', async_views.property_list, name='async-property-list'),
+    path('async/properties/facets/', async_views.property_facets, name='async-property-facets'),
+    path('async/properties/<int:pk>/', async_views.property_detail, name='async-property-detail'),
 ] 
\ No newline at end of file
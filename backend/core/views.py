@@ -1,20 +1,60 @@
-from django.shortcuts import render
+import logging
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.views.static import serve as static_serve
 from rest_framework import viewsets, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.contrib.auth import authenticate
-from .models import User, Property, PropertyImage, Feature, ContactMessage
-from .serializers import UserSerializer, PropertySerializer, PropertyCreateSerializer, PropertyImageSerializer, FeatureSerializer, ContactMessageSerializer
+from .models import User, Property, PropertyImage, Feature, ContactMessage, MapCluster, SavedSearch, SearchAlert
+from .serializers import UserSerializer, PropertySerializer, PropertyCreateSerializer, PropertyImageSerializer, FeatureSerializer, ContactMessageSerializer, SavedSearchSerializer, format_datetime, format_decimal, parse_fieldset, serialize_properties, PRICE_QUANTUM
 from rest_framework import mixins
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from functools import reduce
+from operator import or_
+from . import geo
+from .authentication import issue_token, revoke_tokens, revoke_user_tokens
+from .buffers import contact_buffer
+from .async_views import json_response
+from .autocomplete import KINDS as AUTOCOMPLETE_KINDS, MAX_SUGGESTIONS, autocomplete
+from .cache import property_cache
+from .dashboard import dashboard_cache, owner_dashboard
+from .conditional import add_validators, collection_validators, make_etag, not_modified, object_validators, representation
+from .metrics import measure, registry
+from .ingest import import_properties, resolve_features
+from .encoding import COMPACT_RENDERERS
+from .export import CONTENT_TYPES, EXPORT_CHUNK_SIZE, EXPORT_FORMATS, stream_export
+from .facets import property_facets
+from .images import ImageProcessingError, processing_available, rendition_urls, store_images
+from .filters import filter_properties, longitude_range, parse_coordinate_params, parse_decimal_param, parse_int_param, parse_list_param
+from .pagination import InboxCursorPagination, PropertyCursorPagination
+from .signals import mark_properties_changed, property_changes
+from .saved_searches import alert_buffer, queue_alerts, saved_search_index
+from .similar import NEIGHBOURS, similar_properties
+from .trends import ALL as TREND_ALL, PERIODS as TREND_PERIODS, default_start as default_trend_start, market_trends
 
-# Create your views here.
+logger = logging.getLogger(__name__)
 
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.AllowAny]
 
+    @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
+    def dashboard(self, request, pk=None):
+        """Listing counts, prices, coverage, enquiries and recent activity for the current user"""
+        # Enquiry counts and enquirer names are private to the owner
+        if str(request.user.pk) != str(pk):
+            raise PermissionDenied('You can only view your own dashboard.')
+        return Response(owner_dashboard(request.user.pk))
+
 class FeatureViewSet(viewsets.ModelViewSet):
     queryset = Feature.objects.all()
     serializer_class = FeatureSerializer
@@ -25,9 +65,52 @@ class PropertyImageViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyImageSerializer
     permission_classes = [permissions.AllowAny]
 
+BULK_CREATE_LIMIT = 5000
+BATCH_FETCH_LIMIT = 500
+IMAGE_UPLOAD_LIMIT = 20
+
+def parse_feature_names(features_data):
+    if isinstance(features_data, str):
+        features_data = features_data.split(',')
+    return list(dict.fromkeys(f.strip() for f in features_data if isinstance(f, str) and f.strip()))
+
+def sync_features(property_obj, names):
+    """Adds and removes only the features that differ from `names`; returns whether any did"""
+    current = dict(
+        Property.features.through.objects.filter(property_id=property_obj.id)
+        .values_list('feature__name', 'feature_id')
+    )
+    removed = [feature_id for name, feature_id in current.items() if name not in names]
+    added = [name for name in names if name not in current]
+    if removed:
+        property_obj.features.remove(*removed)
+    if added:
+        feature_ids = resolve_features(added)
+        property_obj.features.add(*[feature_ids[name] for name in added])
+    return bool(removed or added)
+
+def sync_images(property_obj, images_data):
+    """Deletes images no longer listed and inserts new URLs, keeping the rest; returns whether any changed"""
+    # Clients may send back the serialized image objects they received
+    urls = [item.get('image') if isinstance(item, dict) else item for item in images_data]
+    urls = list(dict.fromkeys(url for url in urls if url))
+    current = dict(property_obj.images.values_list('image', 'id'))
+    stale = [image_id for url, image_id in current.items() if url not in urls]
+    new = [url for url in urls if url not in current]
+    if stale:
+        # Nothing references an image, so skip the collector and the per-row
+        # post_delete; the caller marks the listing changed once
+        stale_images = PropertyImage.objects.filter(id__in=stale)
+        stale_images._raw_delete(stale_images.db)
+    if new:
+        PropertyImage.objects.bulk_create([PropertyImage(property=property_obj, image=url) for url in new])
+    return bool(stale or new)
+
 class PropertyViewSet(viewsets.ModelViewSet):
     queryset = Property.objects.all().select_related('owner').prefetch_related('features', 'images')
     permission_classes = [permissions.AllowAny]
+    pagination_class = PropertyCursorPagination
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + COMPACT_RENDERERS
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -36,11 +119,263 @@ class PropertyViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        owner = self.request.query_params.get('owner')
-        if owner:
-            queryset = queryset.filter(owner__id=owner)
+        if self.action in ('list', 'retrieve', 'update', 'partial_update', 'destroy'):
+            # Rows are serialized from the fragment cache, which loads relations only on a miss
+            queryset = queryset.select_related(None).prefetch_related(None)
+        if self.action == 'retrieve':
+            queryset = queryset.only('id', 'updated_at')
+        if self.action == 'list':
+            queryset = filter_properties(queryset, self.request.query_params)
+        else:
+            owner = self.request.query_params.get('owner')
+            if owner:
+                queryset = queryset.filter(owner__id=owner)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        fieldset = parse_fieldset(request.query_params)
+        queryset = self.filter_queryset(self.get_queryset())
+        etag, last_modified = collection_validators(request, queryset)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        page = self.paginate_queryset(queryset.only('id', 'price', 'created_at', 'updated_at'))
+        response = self.get_paginated_response(serialize_properties(page, fieldset))
+        return add_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        fieldset = parse_fieldset(request.query_params)
+        instance = self.get_object()
+        etag, last_modified = object_validators(instance, request)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+        return add_validators(Response(serialize_properties([instance], fieldset)[0]), etag, last_modified)
+
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Listings within `radius_km` of a point, nearest first"""
+        params = request.query_params
+        latitude, longitude = parse_coordinate_params(params, ('lat', 'lng'), (90, 180))
+        radius_km = float(parse_decimal_param(params, 'radius_km') or 3)
+        if not 0 < radius_km <= 100:
+            raise ValidationError({'radius_km': 'Must be greater than 0 and at most 100.'})
+        limit = parse_int_param(params, 'limit', 50, 1, 100)
+
+        # Geohash cells narrow the scan to an index range, the box trims the corners
+        cells = geo.covering_cells(latitude, longitude, radius_km)
+        south, west, north, east = geo.bounding_box(latitude, longitude, radius_km)
+        candidates = filter_properties(Property.objects.all(), params).filter(
+            reduce(or_, (Q(geohash__startswith=cell) for cell in cells)),
+            longitude_range(west, east),
+            latitude__range=(south, north),
+        ).values_list('id', 'latitude', 'longitude')
+
+        distances = []
+        for property_id, lat, lng in candidates:
+            distance = geo.haversine_km(latitude, longitude, lat, lng)
+            if distance <= radius_km:
+                distances.append((distance, property_id))
+        distances.sort()
+        distances = distances[:limit]
+
+        properties = Property.objects.only('id', 'updated_at').in_bulk([property_id for _, property_id in distances])
+        fragments = {item['id']: item for item in serialize_properties(list(properties.values()))}
+        results = []
+        for distance, property_id in distances:
+            item = dict(fragments[property_id])
+            item['distance_km'] = round(distance, 3)
+            results.append(item)
+        return Response(results)
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """Pre-aggregated marker clusters for a map viewport"""
+        params = request.query_params
+        south, north = parse_coordinate_params(params, ('south', 'north'), (90, 90))
+        west, east = parse_coordinate_params(params, ('west', 'east'), (180, 180))
+        zoom = parse_int_param(params, 'zoom', 10, 0, 21)
+        precision = geo.precision_for_zoom(zoom)
+
+        # Pad by one cell so clusters centred just outside the viewport still show
+        height, width = geo.cell_size_km(precision)
+        pad_lat = height / geo.KM_PER_DEGREE
+        pad_lng = width / geo.KM_PER_DEGREE
+        # A viewport across the antimeridian arrives with west > east
+        span = east - west if west <= east else east - west + 360
+        if span + 2 * pad_lng >= 360:
+            padded = Q()
+        else:
+            padded = longitude_range(
+                geo.wrap_longitude(west - pad_lng), geo.wrap_longitude(east + pad_lng), 'center_longitude',
+            )
+        rows = MapCluster.objects.filter(
+            padded,
+            precision=precision,
+            count__gt=0,
+            center_latitude__range=(south - pad_lat, north + pad_lat),
+        ).values_list('cell', 'count', 'latitude_sum', 'longitude_sum')
+        clusters = [
+            {
+                'cell': cell,
+                'count': count,
+                'latitude': round(latitude_sum / count, 6),
+                'longitude': round(longitude_sum / count, 6),
+            }
+            for cell, count, latitude_sum, longitude_sum in rows
+        ]
+
+        data = {'precision': precision, 'clusters': clusters}
+        if precision == geo.MAX_CLUSTER_PRECISION:
+            # Fully zoomed in: individual markers are cheap enough to send
+            data['markers'] = list(
+                Property.objects.filter(
+                    longitude_range(west, east), latitude__range=(south, north),
+                ).values('id', 'title', 'price', 'type', 'latitude', 'longitude')[:500]
+            )
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts by type, city, price bucket and feature for the current filters"""
+        return Response(property_facets(request.query_params))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Streams the filtered catalogue as NDJSON or CSV in id order.
+        Pass `after=<last id received>` to resume an interrupted export.
+        """
+        params = request.query_params
+        export_format = params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"output must be one of {', '.join(EXPORT_FORMATS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        after = parse_int_param(params, 'after', None, 0, 2 ** 63 - 1)
+        chunk_size = parse_int_param(params, 'chunk_size', EXPORT_CHUNK_SIZE, 1, 2000)
+        queryset = filter_properties(Property.objects.all(), params)
+        response = StreamingHttpResponse(
+            stream_export(queryset, export_format, after, chunk_size),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="properties.{export_format}"'
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Precomputed nearest listings by type, price, location and features"""
+        limit = parse_int_param(request.query_params, 'limit', 10, 1, NEIGHBOURS)
+        neighbours = similar_properties(pk, limit) if pk.isdigit() else []
+        if not neighbours and not (pk.isdigit() and Property.objects.filter(pk=pk).exists()):
+            return Response({'error': 'Property not found'}, status=status.HTTP_404_NOT_FOUND)
+        properties = Property.objects.only('id', 'updated_at').in_bulk([similar_id for similar_id, _ in neighbours])
+        fragments = {item['id']: item for item in serialize_properties(list(properties.values()))}
+        results = []
+        for similar_id, score in neighbours:
+            if similar_id in fragments:
+                item = dict(fragments[similar_id])
+                item['similarity'] = score
+                results.append(item)
+        return Response(results)
+
+    @action(detail=False, methods=['get', 'post'])
+    def batch(self, request):
+        """
+        Listings for up to BATCH_FETCH_LIMIT ids (?ids=1,2,3, or a POST body
+        {"ids": [...]}) in the requested order, with the ids that do not
+        exist. One query loads the stamps; fragments missing from the cache
+        are built in one more.
+        """
+        if request.method == 'POST':
+            raw = request.data.get('ids') if isinstance(request.data, dict) else request.data
+            if isinstance(raw, str):
+                raw = raw.split(',')
+            if not isinstance(raw, list):
+                raise ValidationError({'ids': 'Expected a list of ids.'})
+        else:
+            raw = parse_list_param(request.query_params, 'ids')
+        invalid = [value for value in raw if not str(value).strip().isdigit()]
+        if invalid:
+            raise ValidationError({'ids': f'Invalid ids: {", ".join(map(str, invalid[:10]))}.'})
+        ids = list(dict.fromkeys(int(str(value).strip()) for value in raw))
+        if not ids:
+            raise ValidationError({'ids': 'This parameter is required.'})
+        if len(ids) > BATCH_FETCH_LIMIT:
+            raise ValidationError({'ids': f'At most {BATCH_FETCH_LIMIT} ids per request.'})
+        fieldset = parse_fieldset(request.query_params)
+
+        properties = Property.objects.only('id', 'updated_at').in_bulk(ids)
+        found = [properties[property_id] for property_id in ids if property_id in properties]
+        last_modified = max((p.updated_at for p in found), default=None)
+        etag = make_etag(representation(request), *(f'{p.id}:{p.updated_at.isoformat()}' for p in found))
+        if request.method == 'GET':
+            response = not_modified(request, etag, last_modified)
+            if response is not None:
+                return response
+        response = Response({
+            'results': serialize_properties(found, fieldset),
+            'missing': [property_id for property_id in ids if property_id not in properties],
+        })
+        return add_validators(response, etag, last_modified) if request.method == 'GET' else response
+
+    @action(detail=True, methods=['post'], url_path='images', parser_classes=[MultiPartParser, FormParser],
+            permission_classes=[permissions.IsAuthenticated])
+    def upload_images(self, request, pk=None):
+        """
+        Accepts image files (multipart field `images`), stores them by content
+        hash with thumb/card/full renditions and attaches them to the listing.
+        """
+        property_obj = self.get_object()
+        if property_obj.owner_id != request.user.pk:
+            raise PermissionDenied('You can only add images to your own listings.')
+        files = request.FILES.getlist('images')
+        if not files:
+            return Response({'error': 'No images uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(files) > IMAGE_UPLOAD_LIMIT:
+            return Response({'error': f'At most {IMAGE_UPLOAD_LIMIT} images per upload.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_bytes = getattr(settings, 'IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+        oversized = [f.name for f in files if f.size > max_bytes]
+        if oversized:
+            return Response({'error': f'Images larger than {max_bytes} bytes: {", ".join(oversized)}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # A generator, so only one upload is held in memory at a time
+            hashes = store_images(f.read() for f in files)
+        except ImageProcessingError as exc:
+            code = status.HTTP_400_BAD_REQUEST if processing_available() else status.HTTP_503_SERVICE_UNAVAILABLE
+            return Response({'error': str(exc)}, status=code)
+
+        existing = set(property_obj.images.exclude(content_hash='').values_list('content_hash', flat=True))
+        new = [
+            PropertyImage(
+                property=property_obj,
+                image=request.build_absolute_uri(rendition_urls(content_hash)['full']),
+                content_hash=content_hash,
+            )
+            for content_hash in dict.fromkeys(hashes) if content_hash not in existing
+        ]
+        if new:
+            PropertyImage.objects.bulk_create(new)
+            # bulk_create sends no post_save, so refresh the listing's stamp here
+            mark_properties_changed([property_obj.id])
+        return Response(serialize_properties([property_obj])[0], status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Creates many properties from a JSON list, reporting per-row errors"""
+        records = request.data
+        if isinstance(records, dict):
+            records = records.get('properties')
+        if not isinstance(records, list):
+            return Response({'error': 'Expected a list of properties.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(records) > BULK_CREATE_LIMIT:
+            return Response(
+                {'error': f'At most {BULK_CREATE_LIMIT} properties per request.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        result = import_properties(records)
+        response_status = status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST
+        return Response(result, status=response_status)
+
     def create(self, request, *args, **kwargs):
         # Get the user from the request
         user_id = request.data.get('owner')
@@ -65,30 +400,34 @@ class PropertyViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(data=property_data)
         if serializer.is_valid():
-            property_obj = serializer.save()
-            
-            # Handle features
-            features_data = request.data.get('features', [])
-            if isinstance(features_data, str):
-                features_data = [f.strip() for f in features_data.split(',') if f.strip()]
-            
-            for feature_name in features_data:
-                feature, created = Feature.objects.get_or_create(name=feature_name)
-                property_obj.features.add(feature)
-            
-            # Handle images
-            images_data = request.data.get('images', [])
-            for image_url in images_data:
-                PropertyImage.objects.create(property=property_obj, image=image_url)
-            
-            # Return the full property data using the read serializer
-            read_serializer = PropertySerializer(property_obj)
-            return Response(read_serializer.data, status=status.HTTP_201_CREATED)
+            with property_changes():
+                property_obj = serializer.save()
+
+                # Features are resolved in one lookup and attached in one INSERT
+                feature_names = parse_feature_names(request.data.get('features', []))
+                feature_ids = resolve_features(feature_names)
+                if feature_ids:
+                    property_obj.features.add(*[feature_ids[name] for name in feature_names])
+
+                images_data = request.data.get('images', [])
+                if images_data:
+                    PropertyImage.objects.bulk_create([PropertyImage(property=property_obj, image=url) for url in images_data])
+                    # bulk_create sends no post_save, so mark the listing here
+                    mark_properties_changed([property_obj.id])
+
+                # Only now that its features are attached can the listing be matched
+                queue_alerts([property_obj], {property_obj.id: list(feature_ids.values())})
+
+            # The listing row was rewritten before commit, so the fast path has it
+            with measure('serialize'):
+                data = serialize_properties([property_obj])[0]
+            return Response(data, status=status.HTTP_201_CREATED)
         else:
-            print(f"Serializer errors: {serializer.errors}")
+            logger.warning("Property validation failed: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def update(self, request, *args, **kwargs):
+        partial = kwargs.get('partial', False)
         instance = self.get_object()
         
         # Update basic property data
@@ -98,39 +437,40 @@ class PropertyViewSet(viewsets.ModelViewSet):
             'city': request.data.get('city', instance.city),
             'type': request.data.get('type', instance.type),
             'description': request.data.get('description', instance.description),
-            'owner': instance.owner.id  # Keep the same owner
+            'owner': instance.owner_id  # Keep the same owner
         }
         
         serializer = self.get_serializer(instance, data=property_data, partial=True)
         if serializer.is_valid():
-            property_obj = serializer.save()
-            
-            # Handle features update
-            features_data = request.data.get('features', [])
-            if isinstance(features_data, str):
-                features_data = [f.strip() for f in features_data.split(',') if f.strip()]
-            
-            # Clear existing features and add new ones
-            property_obj.features.clear()
-            for feature_name in features_data:
-                feature, created = Feature.objects.get_or_create(name=feature_name)
-                property_obj.features.add(feature)
-            
-            # Handle images update (optional - only if provided)
-            images_data = request.data.get('images', [])
-            if images_data:
-                # Clear existing images and add new ones
-                property_obj.images.all().delete()
-                for image_url in images_data:
-                    PropertyImage.objects.create(property=property_obj, image=image_url)
-            
-            # Return the full property data using the read serializer
-            read_serializer = PropertySerializer(property_obj)
-            return Response(read_serializer.data)
+            with property_changes():
+                property_obj = serializer.save()
+
+                # PATCH leaves relations alone unless they are sent; PUT replaces features
+                changed = False
+                if 'features' in request.data or not partial:
+                    changed = sync_features(property_obj, parse_feature_names(request.data.get('features', [])))
+
+                # Images are only replaced when provided
+                images_data = request.data.get('images', [])
+                if images_data:
+                    changed = sync_images(property_obj, images_data) or changed
+
+                if changed:
+                    mark_properties_changed([property_obj.id])
+
+            return Response(serialize_properties([property_obj])[0])
         else:
-            print(f"Serializer errors: {serializer.errors}")
+            logger.warning("Property validation failed: %s", serializer.errors)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def token_response(user):
+    """User payload plus a freshly issued bearer token"""
+    token, expires_at = issue_token(user)
+    data = UserSerializer(user).data
+    data['token'] = token
+    data['expires_at'] = format_datetime(expires_at)
+    return data
+
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
 
@@ -151,7 +491,7 @@ class RegisterView(APIView):
             last_name=last_name,
             password=password
         )
-        return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
+        return Response(token_response(user), status=status.HTTP_201_CREATED)
 
 class LoginView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -163,11 +503,215 @@ class LoginView(APIView):
             return Response({'error': 'Email and password required.'}, status=status.HTTP_400_BAD_REQUEST)
         user = authenticate(request, username=email, password=password)
         if user is not None:
-            return Response(UserSerializer(user).data)
+            return Response(token_response(user))
         else:
             return Response({'error': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
 
+class LogoutView(APIView):
+    """Revokes the bearer token used for this request, or all of them with ?all=true"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        if request.query_params.get('all') == 'true':
+            revoked = revoke_user_tokens(request.user)
+        elif isinstance(request.auth, str):
+            revoked = revoke_tokens([request.auth])
+        else:
+            return Response({'error': 'Not authenticated with a token.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'revoked': revoked})
+
+def serve_media(request, path):
+    """
+    Serves uploaded renditions from MEDIA_ROOT. Their paths embed the content
+    hash, so the bytes behind a URL never change and may be cached forever.
+    """
+    response = static_serve(request, path, document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@require_GET
+def autocomplete_view(request):
+    """
+    Cities, areas and features starting with `q`, most listed first.
+
+    A plain Django view: the lookup itself takes microseconds, so DRF's
+    request/renderer machinery would dominate the latency budget.
+    """
+    params = request.GET
+    kinds = parse_list_param(params, 'kind') or list(AUTOCOMPLETE_KINDS)
+    unknown = [kind for kind in kinds if kind not in AUTOCOMPLETE_KINDS]
+    if unknown:
+        return json_response({'kind': [f"Unknown kind: {', '.join(unknown)}. Use {', '.join(AUTOCOMPLETE_KINDS)}."]}, status=400)
+    try:
+        limit = parse_int_param(params, 'limit', 8, 1, MAX_SUGGESTIONS)
+    except ValidationError as exc:
+        return json_response(exc.detail, status=400)
+    prefix = params.get('q', '')
+    if not prefix.strip():
+        return json_response([])
+    return json_response(autocomplete.suggest(prefix, kinds, limit))
+
+def parse_date_param(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'A date in YYYY-MM-DD format is required.'})
+    return parsed
+
+class MarketTrendsView(APIView):
+    """
+    Price time series for a city (optionally narrowed to an area) and/or
+    type, read from the precomputed daily or monthly rollups.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        params = request.query_params
+        interval = params.get('interval', 'month')
+        if interval not in TREND_PERIODS:
+            raise ValidationError({'interval': f'Must be one of: {", ".join(TREND_PERIODS)}.'})
+        city = params.get('city') or TREND_ALL
+        area = params.get('area') or TREND_ALL
+        property_type = params.get('type') or TREND_ALL
+        if area != TREND_ALL and city == TREND_ALL:
+            raise ValidationError({'area': 'Requires city.'})
+        end = parse_date_param(params, 'end') or timezone.localdate()
+        start = parse_date_param(params, 'start') or default_trend_start(interval, end)
+        if start > end:
+            raise ValidationError({'start': 'Must not be after end.'})
+        points = market_trends(interval, city, area, property_type, start, end)
+        return Response({
+            'interval': interval,
+            'city': None if city == TREND_ALL else city,
+            'area': None if area == TREND_ALL else area,
+            'type': None if property_type == TREND_ALL else property_type,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'points': [{
+                'period': period_start.isoformat(),
+                'count': count,
+                'average': format_decimal(total / count, PRICE_QUANTUM) if count else None,
+                'median': format_decimal(median, PRICE_QUANTUM),
+            } for period_start, count, total, median in points],
+        })
+
+class IsStaffOrMetricsClient(permissions.BasePermission):
+    """Staff users, or requests from an address in METRICS_ALLOWED_IPS"""
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_staff:
+            return True
+        return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', [])
+
+class CacheStatsView(APIView):
+    permission_classes = [IsStaffOrMetricsClient]
+
+    def get(self, request):
+        return Response({'property': property_cache.stats(), 'dashboard': dashboard_cache.stats()})
+
+class MetricsView(APIView):
+    """Per-view latency, SQL and serializer histograms in Prometheus text format"""
+    permission_classes = [IsStaffOrMetricsClient]
+
+    def get(self, request):
+        cache_stats = property_cache.stats()
+        gauges = [(
+            'propvista_property_cache',
+            'Property fragment cache counters',
+            [({'stat': name}, value) for name, value in cache_stats.items()],
+        )]
+        gauges.append((
+            'propvista_search_alerts',
+            'Saved search index size and alert queue counters',
+            [({'stat': name}, value) for name, value in {**saved_search_index.stats(), **alert_buffer.stats()}.items()],
+        ))
+        if contact_buffer is not None:
+            gauges.append((
+                'propvista_contact_buffer',
+                'Write-behind contact message buffer counters',
+                [({'stat': name}, value) for name, value in contact_buffer.stats().items()],
+            ))
+        return HttpResponse(registry.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 class ContactMessageViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
     queryset = ContactMessage.objects.all()
     serializer_class = ContactMessageSerializer
     permission_classes = [permissions.AllowAny]
+
+    def create(self, request, *args, **kwargs):
+        if contact_buffer is None:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        # Queued for a batched INSERT; id and created_at are assigned on flush
+        contact_buffer.add(ContactMessage(owner_id=data['property'].owner_id, **data))
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated], pagination_class=InboxCursorPagination)
+    def inbox(self, request):
+        """Enquiries about the current user's listings, newest first"""
+        queryset = ContactMessage.objects.filter(owner=request.user).select_related('property').only(
+            'id', 'name', 'email', 'message', 'created_at', 'property_id', 'property__title',
+        )
+        property_id = parse_int_param(request.query_params, 'property', None, 1, 2 ** 63 - 1)
+        if property_id is not None:
+            queryset = queryset.filter(property_id=property_id)
+        page = self.paginate_queryset(queryset)
+        results = [{
+            'id': message.id,
+            'property': message.property_id,
+            'property_title': message.property.title,
+            'name': message.name,
+            'email': message.email,
+            'message': message.message,
+            'created_at': format_datetime(message.created_at),
+        } for message in page]
+        return self.get_paginated_response(results)
+
+class SavedSearchViewSet(viewsets.ModelViewSet):
+    """The current user's saved searches and the new listings that matched them"""
+    queryset = SavedSearch.objects.all()
+    serializer_class = SavedSearchSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return SavedSearch.objects.filter(user=self.request.user).prefetch_related('features').order_by('-created_at', '-id')
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['get'], pagination_class=InboxCursorPagination)
+    def alerts(self, request):
+        """Listings that matched the current user's searches, newest first"""
+        queryset = SearchAlert.objects.filter(user=request.user).select_related('property').only(
+            'id', 'saved_search_id', 'created_at', 'delivered_at', 'property__id', 'property__updated_at',
+        )
+        search_id = parse_int_param(request.query_params, 'search', None, 1, 2 ** 63 - 1)
+        if search_id is not None:
+            queryset = queryset.filter(saved_search_id=search_id)
+        page = self.paginate_queryset(queryset)
+        # An alert counts as delivered the first time its page is returned
+        undelivered = [alert for alert in page if alert.delivered_at is None]
+        if undelivered:
+            now = timezone.now()
+            SearchAlert.objects.filter(pk__in=[alert.pk for alert in undelivered], delivered_at__isnull=True).update(
+                delivered_at=now,
+            )
+            for alert in undelivered:
+                alert.delivered_at = now
+        properties = serialize_properties([alert.property for alert in page], parse_fieldset(request.query_params))
+        tz = timezone.get_current_timezone()
+        results = [{
+            'id': alert.id,
+            'saved_search': alert.saved_search_id,
+            'property': data,
+            'created_at': format_datetime(alert.created_at, tz),
+            'delivered_at': format_datetime(alert.delivered_at, tz),
+        } for alert, data in zip(page, properties)]
+        return self.get_paginated_response(results)
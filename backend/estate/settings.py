@@ -44,7 +44,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +94,42 @@ DATABASES = {
     }
 }
 
+# Set DJANGO_DB_ENGINE=sqlite to run locally (e.g. benchmarks) without MySQL
+if os.environ.get('DJANGO_DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+    }
+
+# Read replicas: one alias per host in MYSQL_REPLICA_HOSTS, sharing the
+# primary's credentials. Under SQLite, SQLITE_REPLICAS stand-ins open the
+# same file on separate connections. Tests run replicas as mirrors of the
+# test database.
+if os.environ.get('DJANGO_DB_ENGINE') == 'sqlite':
+    REPLICA_DATABASES = {
+        f'replica{number}': {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+        for number in range(1, int(os.environ.get('SQLITE_REPLICAS', '1')) + 1)
+    }
+else:
+    REPLICA_DATABASES = {
+        f'replica{number}': {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+        for number, host in enumerate(filter(None, os.environ.get('MYSQL_REPLICA_HOSTS', '').split(',')), start=1)
+    }
+DATABASES.update(REPLICA_DATABASES)
+
+# Reads from safe requests go to a healthy replica (see core.routers). A
+# client that wrote stays on the primary for STICKY_SECONDS, tracked in the
+# CACHE_ALIAS cache. Replicas are re-checked every HEALTH_INTERVAL seconds
+# and skipped while down or more than MAX_LAG seconds behind (MySQL only).
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = {
+    'ALIASES': list(REPLICA_DATABASES),
+    'STICKY_SECONDS': int(os.environ.get('REPLICA_STICKY_SECONDS', '5')),
+    'HEALTH_INTERVAL': int(os.environ.get('REPLICA_HEALTH_INTERVAL', '5')),
+    'MAX_LAG': int(os.environ.get('REPLICA_MAX_LAG', '10')),
+    'CACHE_ALIAS': 'default',
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -129,6 +167,15 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded property images (see core.images). MEDIA_URL may be absolute,
+# e.g. a CDN in front of MEDIA_ROOT.
+MEDIA_URL = os.environ.get('MEDIA_URL', 'http://localhost:8000/media/')
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media'))
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', '4'))
+IMAGE_UPLOAD_MAX_BYTES = int(os.environ.get('IMAGE_UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+# Uploads are rejected from their header, before decoding, above this size
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', str(40_000_000)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -140,11 +187,79 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.authentication.SignedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.BasicAuthentication',
     ],
 }
 
+# Shared between workers through CACHE_BACKEND/CACHE_LOCATION, e.g.
+# django.core.cache.backends.redis.RedisCache and redis://cache:6379/0.
+# The per-process default is only accepted with DEBUG on (see core.checks).
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+REQUIRE_SHARED_CACHE = not DEBUG
+
+# Bearer tokens issued by login/register. TTL is the token lifetime in
+# seconds; token state and users are cached in CACHE_ALIAS for up to
+# CACHE_TIMEOUT seconds. The alias must be shared between workers, or a
+# revocation would only reach the worker that handled the logout.
+AUTH_TOKEN = {
+    'TTL': int(os.environ.get('AUTH_TOKEN_TTL', str(7 * 24 * 3600))),
+    'CACHE_ALIAS': 'default',
+    'CACHE_TIMEOUT': int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', '300')),
+}
+
+# Serialized property fragment cache. BACKEND is 'local' for an in-process
+# LRU bounded by MAX_ENTRIES, or 'django' to share the CACHES alias ALIAS
+# between workers.
+PROPERTY_CACHE = {
+    'BACKEND': os.environ.get('PROPERTY_CACHE_BACKEND', 'local'),
+    'MAX_ENTRIES': int(os.environ.get('PROPERTY_CACHE_MAX_ENTRIES', '5000')),
+    'ALIAS': 'default',
+    'TIMEOUT': None,
+}
+
+# Cache-Control for property list/detail responses. Browsers revalidate with
+# ETag/Last-Modified (max-age); a CDN may serve repeats for s-maxage seconds.
+PROPERTY_HTTP_MAX_AGE = int(os.environ.get('PROPERTY_HTTP_MAX_AGE', '0'))
+PROPERTY_HTTP_S_MAXAGE = int(os.environ.get('PROPERTY_HTTP_S_MAXAGE', '60'))
+
+# Write-behind ingestion for contact messages: when ENABLED, enquiries are
+# acknowledged with 202 and inserted in batches of MAX_SIZE, or after
+# MAX_DELAY seconds. Pending rows are flushed on graceful shutdown.
+CONTACT_MESSAGE_BUFFER = {
+    'ENABLED': os.environ.get('CONTACT_MESSAGE_BUFFER', 'False') == 'True',
+    'MAX_SIZE': int(os.environ.get('CONTACT_MESSAGE_BUFFER_SIZE', '100')),
+    'MAX_DELAY': float(os.environ.get('CONTACT_MESSAGE_BUFFER_DELAY', '1.0')),
+}
+
+# Saved search alerts are inserted in batches of MAX_SIZE, or after
+# MAX_DELAY seconds; each worker's match index is rebuilt in the background
+# every SAVED_SEARCH_REFRESH seconds to pick up other workers' edits
+SEARCH_ALERT_BUFFER = {
+    'MAX_SIZE': int(os.environ.get('SEARCH_ALERT_BUFFER_SIZE', '500')),
+    'MAX_DELAY': float(os.environ.get('SEARCH_ALERT_BUFFER_DELAY', '2.0')),
+}
+SAVED_SEARCH_REFRESH = int(os.environ.get('SAVED_SEARCH_REFRESH', '300'))
+
+# Similar-listing refreshes wait this many seconds on a background thread so
+# every change made by one request is merged into a single refresh
+SIMILAR_REFRESH_DELAY = float(os.environ.get('SIMILAR_REFRESH_DELAY', '1.0'))
+
+# Seconds between background rebuilds of each worker's autocomplete index
+AUTOCOMPLETE_REFRESH = int(os.environ.get('AUTOCOMPLETE_REFRESH', '300'))
+
+# Queries slower than this are logged to the 'core.slow_queries' logger
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200'))
+
+# /api/metrics/ and /api/cache-stats/ are served to staff users and to
+# these client addresses (e.g. the Prometheus scraper), comma-separated
+METRICS_ALLOWED_IPS = list(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '').split(',')))
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOWED_ORIGINS = [
@@ -16,8 +16,11 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
+    # Uploaded image renditions; a CDN or nginx can serve MEDIA_ROOT instead
+    path('media/<path:path>', serve_media, name='media'),
 ]
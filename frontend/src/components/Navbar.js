@@ -1,6 +1,7 @@
 import { Link, useLocation, useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence } from 'framer-motion';
 import { useState } from 'react';
+import { logoutUser } from '../services/api';
 
 const Navbar = ({ isAuthenticated, user, setUser }) => {
   const [menuOpen, setMenuOpen] = useState(false);
@@ -17,6 +18,7 @@ const Navbar = ({ isAuthenticated, user, setUser }) => {
   ];
 
   const handleLogout = () => {
+    logoutUser().catch(() => {});
     setUser(null);
     navigate('/');
   };
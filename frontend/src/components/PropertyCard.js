@@ -20,7 +20,7 @@ const PropertyCard = ({ property }) => {
     >
       <Link to={`/property/${property.id}`}>
         <img
-          src={property.images?.[0]?.image || property.images?.[0] || 'https://images.unsplash.com/photo-1506744038136-46273834b3fb?auto=format&fit=crop&w=600&q=80'}
+          src={property.images?.[0]?.renditions?.card || property.images?.[0]?.image || property.images?.[0] || 'https://images.unsplash.com/photo-1506744038136-46273834b3fb?auto=format&fit=crop&w=600&q=80'}
           alt={property.title}
           className="h-48 w-full object-cover"
         />
@@ -2,11 +2,13 @@ import { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import PropertyCard from '../components/PropertyCard';
 import { useNavigate } from 'react-router-dom';
-import { getUserProperties, updateProperty, deleteProperty } from '../services/api';
+import { getUserProperties, getPropertiesPage, getUserDashboard, updateProperty, deleteProperty } from '../services/api';
 
 const Dashboard = ({ user }) => {
   const navigate = useNavigate();
   const [properties, setProperties] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [editId, setEditId] = useState(null);
@@ -14,15 +16,37 @@ const Dashboard = ({ user }) => {
   const [showEditModal, setShowEditModal] = useState(false);
   const [editLoading, setEditLoading] = useState(false);
 
+  const refreshSummary = async () => {
+    if (!user) return;
+    try {
+      const res = await getUserDashboard(user.id);
+      setSummary(res.data);
+    } catch (err) {
+      console.error('Error fetching dashboard summary:', err);
+    }
+  };
+
   const refreshProperties = async () => {
     if (!user) return;
     
     try {
       const res = await getUserProperties(user.id);
-      setProperties(res.data);
+      setProperties(res.data.results);
+      setNextPage(res.data.next);
     } catch (err) {
       console.error('Error refreshing properties:', err);
     }
+    refreshSummary();
+  };
+
+  const loadMore = () => {
+    if (!nextPage) return;
+    getPropertiesPage(nextPage)
+      .then(res => {
+        setProperties(prev => [...prev, ...res.data.results]);
+        setNextPage(res.data.next);
+      })
+      .catch(err => console.error('Error loading more properties:', err));
   };
 
   useEffect(() => {
@@ -34,12 +58,14 @@ const Dashboard = ({ user }) => {
     
     setLoading(true);
     setError('');
+    refreshSummary();
     
     getUserProperties(user.id)
       .then(res => {
         console.log('Fetched properties for user:', user.email);
-        console.log('Properties:', res.data);
-        setProperties(res.data);
+        console.log('Properties:', res.data.results);
+        setProperties(res.data.results);
+        setNextPage(res.data.next);
         setLoading(false);
       })
       .catch(err => {
@@ -47,12 +73,14 @@ const Dashboard = ({ user }) => {
         setError('Failed to load your properties. Please try again.');
         setLoading(false);
       });
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [user]);
 
-  // Summary
-  const total = properties.length;
-  const buyCount = properties.filter(p => p.type === 'Buy').length;
-  const rentCount = properties.filter(p => p.type === 'Rent').length;
+  // Summary, counted server-side across all listings
+  const total = summary ? summary.total : 0;
+  const buyCount = summary?.by_type?.Buy?.count || 0;
+  const rentCount = summary?.by_type?.Rent?.count || 0;
+  const enquiryCount = summary ? summary.enquiries.total : 0;
 
   // Greeting
   const userName = user?.first_name || user?.name || 'User';
@@ -170,6 +198,10 @@ const Dashboard = ({ user }) => {
             <div className="text-2xl font-bold text-pink-600">{rentCount}</div>
             <div className="text-gray-700">Rent</div>
           </div>
+          <div className="bg-white rounded-xl shadow p-6 flex-1 min-w-[180px] border border-amber-100">
+            <div className="text-2xl font-bold text-amber-600">{enquiryCount}</div>
+            <div className="text-gray-700">Enquiries</div>
+          </div>
           <button onClick={handleAddProperty} className="bg-gradient-to-r from-teal-400 to-blue-500 text-white px-6 py-4 rounded-xl font-bold shadow hover:scale-105 transition min-w-[180px]">+ Add New Property</button>
         </div>
 
@@ -207,6 +239,11 @@ const Dashboard = ({ user }) => {
             )}
           </motion.div>
         )}
+        {!loading && !error && nextPage && (
+          <div className="flex justify-center mt-8">
+            <button onClick={loadMore} className="bg-gradient-to-r from-teal-400 to-blue-500 text-white px-6 py-2 rounded-full font-semibold shadow hover:scale-105 transition">Load More</button>
+          </div>
+        )}
 
         {/* Edit Modal */}
         {showEditModal && (
@@ -2,6 +2,7 @@ import { useState } from 'react';
 import { motion } from 'framer-motion';
 import { Link, useNavigate } from 'react-router-dom';
 import PropertyCard from '../components/PropertyCard';
+import { getSuggestions } from '../services/api';
 
 const featuredProperties = [
   {
@@ -178,9 +179,21 @@ const testimonials = [
 
 const Home = () => {
   const [search, setSearch] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
   const [openFaq, setOpenFaq] = useState(null);
   const navigate = useNavigate();
 
+  const handleSearchChange = (value) => {
+    setSearch(value);
+    if (!value.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    getSuggestions(value)
+      .then(res => setSuggestions(res.data))
+      .catch(() => setSuggestions([]));
+  };
+
   const handleSearch = (e) => {
     e.preventDefault();
     if (search.trim()) {
@@ -213,10 +226,14 @@ const Home = () => {
             <input
               type="text"
               placeholder="Search by city, type, or keyword..."
+              list="search-suggestions"
               value={search}
-              onChange={e => setSearch(e.target.value)}
+              onChange={e => handleSearchChange(e.target.value)}
               className="w-full px-6 py-4 rounded-l-full bg-white/90 text-gray-900 focus:outline-none focus:ring-2 focus:ring-teal-400 shadow-xl text-lg"
             />
+            <datalist id="search-suggestions">
+              {suggestions.map(s => <option key={`${s.kind}-${s.value}`} value={s.value}>{`${s.kind} · ${s.count} listings`}</option>)}
+            </datalist>
             <button type="submit" className="px-8 py-4 rounded-r-full bg-gradient-to-r from-teal-400 to-blue-500 text-white font-bold text-lg shadow-xl hover:scale-105 transition">Search</button>
           </form>
         </motion.div>
@@ -2,7 +2,7 @@ import { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import PropertyCard from '../components/PropertyCard';
 import { useLocation } from 'react-router-dom';
-import { getProperties } from '../services/api';
+import { getProperties, getPropertiesPage, getPropertyFacets, getSuggestions } from '../services/api';
 
 const amenitiesList = ['Gym', 'Parking', 'Pool', 'Sea View', 'Garden', 'WiFi', 'Furnished'];
 
@@ -21,21 +21,76 @@ const Listings = () => {
   const [filters, setFilters] = useState({ city: initialCity, type: initialType, minPrice: '', maxPrice: '', amenities: [] });
   const [sort, setSort] = useState('date');
   const [properties, setProperties] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [featureCounts, setFeatureCounts] = useState({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [citySuggestions, setCitySuggestions] = useState([]);
 
-  useEffect(() => {
+  const handleCityChange = (value) => {
+    setFilters(f => ({ ...f, city: value }));
+    if (!value.trim()) {
+      setCitySuggestions([]);
+      return;
+    }
+    getSuggestions(value, 'city')
+      .then(res => setCitySuggestions(res.data))
+      .catch(() => setCitySuggestions([]));
+  };
+
+  // Filtering and sorting run on the server; only the current page is downloaded
+  const buildParams = () => {
+    const query = {};
+    if (searchQuery) query.q = searchQuery;
+    if (sort === 'price') query.ordering = 'price';
+    else if (!searchQuery) query.ordering = '-created_at';
+    if (filters.city) query.city = filters.city;
+    if (filters.type) query.type = filters.type;
+    if (filters.minPrice) query.min_price = filters.minPrice;
+    if (filters.maxPrice) query.max_price = filters.maxPrice;
+    if (filters.amenities.length) query.features = filters.amenities.join(',');
+    return query;
+  };
+
+  const loadProperties = () => {
     setLoading(true);
-    getProperties()
+    setError('');
+    getProperties(buildParams())
       .then(res => {
-        setProperties(res.data);
+        setProperties(res.data.results);
+        setNextPage(res.data.next);
         setLoading(false);
       })
       .catch(() => {
         setError('Failed to load properties.');
         setLoading(false);
       });
-  }, []);
+  };
+
+  const loadFacets = () => {
+    const { ordering, ...query } = buildParams();
+    getPropertyFacets(query)
+      .then(res => {
+        setFeatureCounts(Object.fromEntries(res.data.features.map(f => [f.name, f.count])));
+      })
+      .catch(() => setFeatureCounts({}));
+  };
+
+  const loadMore = () => {
+    if (!nextPage) return;
+    getPropertiesPage(nextPage)
+      .then(res => {
+        setProperties(prev => [...prev, ...res.data.results]);
+        setNextPage(res.data.next);
+      })
+      .catch(() => setError('Failed to load properties.'));
+  };
+
+  useEffect(() => {
+    loadProperties();
+    loadFacets();
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [sort, searchQuery, filters.type, filters.amenities]);
 
   const handleAmenityChange = (amenity) => {
     setFilters((prev) => ({
@@ -46,50 +101,16 @@ const Listings = () => {
     }));
   };
 
-  // Helper function to get feature names from different data structures
-  const getFeatureNames = (features) => {
-    if (!features) return [];
-    if (Array.isArray(features)) {
-      return features.map(f => typeof f === 'string' ? f : f.name);
-    }
-    return [];
-  };
-
-  let filtered = properties.filter((p) => {
-    if (filters.city && p.city !== filters.city) return false;
-    if (filters.type && p.type !== filters.type) return false;
-    if (filters.minPrice && p.price < Number(filters.minPrice)) return false;
-    if (filters.maxPrice && p.price > Number(filters.maxPrice)) return false;
-    
-    // Handle amenities filtering
-    if (filters.amenities.length) {
-      const propertyFeatures = getFeatureNames(p.features);
-      if (!filters.amenities.every(a => propertyFeatures.includes(a))) return false;
-    }
-    
-    if (searchQuery) {
-      const q = searchQuery.toLowerCase();
-      const inTitle = p.title.toLowerCase().includes(q);
-      const inCity = p.city.toLowerCase().includes(q);
-      const inType = p.type.toLowerCase().includes(q);
-      const inDesc = (p.description || '').toLowerCase().includes(q);
-      const propertyFeatures = getFeatureNames(p.features);
-      const inFeatures = propertyFeatures.some(f => f.toLowerCase().includes(q));
-      if (!(inTitle || inCity || inType || inDesc || inFeatures)) return false;
-    }
-    return true;
-  });
-
-  if (sort === 'price') filtered = filtered.sort((a, b) => a.price - b.price);
-  else filtered = filtered.sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
-
   return (
     <div className="min-h-screen bg-gradient-to-br from-blue-50 via-teal-100 to-white py-20 px-4">
       <div className="container mx-auto">
         <h1 className="text-3xl font-bold text-gray-900 mb-8">Browse Properties</h1>
         {/* Filters */}
         <motion.div className="bg-white rounded-2xl p-8 mb-8 flex flex-wrap gap-4 items-center shadow-lg border border-teal-100" initial={{ opacity: 0, y: 20 }} animate={{ opacity: 1, y: 0 }}>
-          <input type="text" placeholder="City" value={filters.city} onChange={e => setFilters(f => ({ ...f, city: e.target.value }))} className="px-4 py-2 rounded bg-teal-50 text-gray-900 focus:ring-2 focus:ring-teal-400 border border-teal-200" />
+          <input type="text" placeholder="City" list="city-suggestions" value={filters.city} onChange={e => handleCityChange(e.target.value)} className="px-4 py-2 rounded bg-teal-50 text-gray-900 focus:ring-2 focus:ring-teal-400 border border-teal-200" />
+          <datalist id="city-suggestions">
+            {citySuggestions.map(s => <option key={s.value} value={s.value}>{`${s.count} listings`}</option>)}
+          </datalist>
           <select value={filters.type} onChange={e => setFilters(f => ({ ...f, type: e.target.value }))} className="px-4 py-2 rounded bg-teal-50 text-gray-900 border border-teal-200">
             <option value="">Type</option>
             <option value="Buy">Buy</option>
@@ -107,15 +128,15 @@ const Listings = () => {
             {amenitiesList.map(a => (
               <label key={a} className="flex items-center text-gray-700 text-xs bg-teal-100 px-2 py-1 rounded cursor-pointer border border-teal-200">
                 <input type="checkbox" checked={filters.amenities.includes(a)} onChange={() => handleAmenityChange(a)} className="mr-1 accent-teal-400" />
-                {a}
+                {a}{featureCounts[a] !== undefined && <span className="ml-1 text-gray-500">({featureCounts[a]})</span>}
               </label>
             ))}
           </div>
           <select value={sort} onChange={e => setSort(e.target.value)} className="px-4 py-2 rounded bg-teal-50 text-gray-900 border border-teal-200">
-            <option value="date">Sort by Date</option>
+            <option value="date">{searchQuery ? 'Sort by Relevance' : 'Sort by Date'}</option>
             <option value="price">Sort by Price</option>
           </select>
-          <button className="ml-auto bg-gradient-to-r from-teal-400 to-blue-500 text-white px-6 py-2 rounded-full font-semibold shadow hover:scale-105 transition">Apply Filters</button>
+          <button onClick={() => { loadProperties(); loadFacets(); }} className="ml-auto bg-gradient-to-r from-teal-400 to-blue-500 text-white px-6 py-2 rounded-full font-semibold shadow hover:scale-105 transition">Apply Filters</button>
         </motion.div>
         {/* Property List */}
         {loading ? (
@@ -124,13 +145,18 @@ const Listings = () => {
           <div className="text-red-500 col-span-3">{error}</div>
         ) : (
           <motion.div className="grid grid-cols-1 sm:grid-cols-2 md:grid-cols-3 gap-8" initial="hidden" animate="visible" variants={{ hidden: {}, visible: { transition: { staggerChildren: 0.1 } } }}>
-            {filtered.length ? filtered.map(property => (
+            {properties.length ? properties.map(property => (
               <motion.div key={property.id} variants={{ hidden: { opacity: 0, y: 30 }, visible: { opacity: 1, y: 0 } }}>
                 <PropertyCard property={property} />
               </motion.div>
             )) : <div className="text-gray-700 col-span-3 text-center w-full py-16 text-xl font-semibold">No properties found. Try adjusting your filters or check back later!</div>}
           </motion.div>
         )}
+        {!loading && nextPage && (
+          <div className="flex justify-center mt-8">
+            <button onClick={loadMore} className="bg-gradient-to-r from-teal-400 to-blue-500 text-white px-6 py-2 rounded-full font-semibold shadow hover:scale-105 transition">Load More</button>
+          </div>
+        )}
       </div>
     </div>
   );
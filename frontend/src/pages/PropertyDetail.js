@@ -1,7 +1,8 @@
 import { useParams } from 'react-router-dom';
 import { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
-import { getPropertyById, sendContactMessage } from '../services/api';
+import { getPropertyById, getSimilarProperties, sendContactMessage } from '../services/api';
+import PropertyCard from '../components/PropertyCard';
 import PropertyMap from '../components/PropertyMap';
 
 const Spinner = () => (
@@ -18,6 +19,7 @@ const PropertyDetail = () => {
   const [contact, setContact] = useState({ name: '', email: '', message: '' });
   const [imgIdx, setImgIdx] = useState(0);
   const [submitStatus, setSubmitStatus] = useState('');
+  const [similar, setSimilar] = useState([]);
 
   useEffect(() => {
     setLoading(true);
@@ -30,6 +32,9 @@ const PropertyDetail = () => {
         setError('Property not found.');
         setLoading(false);
       });
+    getSimilarProperties(id, 4)
+      .then(res => setSimilar(res.data))
+      .catch(() => setSimilar([]));
   }, [id]);
 
   if (loading) return <Spinner />;
@@ -39,7 +44,7 @@ const PropertyDetail = () => {
   const getImageUrls = (images) => {
     if (!images) return [];
     if (Array.isArray(images)) {
-      return images.map(img => typeof img === 'string' ? img : img.image);
+      return images.map(img => typeof img === 'string' ? img : img.renditions?.full || img.image);
     }
     return [];
   };
@@ -147,6 +152,14 @@ const PropertyDetail = () => {
           </form>
         </motion.div>
       </div>
+      {similar.length > 0 && (
+        <div className="container mx-auto mt-10">
+          <h2 className="text-2xl font-bold text-gray-900 mb-4">Similar Listings</h2>
+          <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-6">
+            {similar.map(p => <PropertyCard key={p.id} property={p} />)}
+          </div>
+        </div>
+      )}
     </div>
   );
 };
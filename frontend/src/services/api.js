@@ -7,16 +7,61 @@ const api = axios.create({
   },
 });
 
+// Bearer token issued by login/register, sent with every later request
+const setAuthToken = (token) => {
+  if (token) {
+    api.defaults.headers.common.Authorization = `Bearer ${token}`;
+  } else {
+    delete api.defaults.headers.common.Authorization;
+  }
+};
+
 export const registerUser = async (firstName, lastName, email, password) => {
-  return api.post('register/', { first_name: firstName, last_name: lastName, email, password });
+  const res = await api.post('register/', { first_name: firstName, last_name: lastName, email, password });
+  setAuthToken(res.data.token);
+  return res;
 };
 
 export const loginUser = async (email, password) => {
-  return api.post('login/', { email, password });
+  const res = await api.post('login/', { email, password });
+  setAuthToken(res.data.token);
+  return res;
+};
+
+export const logoutUser = async () => {
+  try {
+    await api.post('logout/');
+  } finally {
+    setAuthToken(null);
+  }
+};
+
+export const getProperties = async (params = {}) => {
+  return api.get('properties/', { params });
+};
+
+export const getPropertiesPage = async (url) => {
+  return api.get(url);
 };
 
-export const getProperties = async () => {
-  return api.get('properties/');
+export const getPropertyFacets = async (params = {}) => {
+  return api.get('properties/facets/', { params });
+};
+
+export const getNearbyProperties = async (lat, lng, radiusKm = 3) => {
+  return api.get('properties/nearby/', { params: { lat, lng, radius_km: radiusKm } });
+};
+
+export const getMapClusters = async ({ south, west, north, east }, zoom) => {
+  return api.get('properties/clusters/', { params: { south, west, north, east, zoom } });
+};
+
+// Long id lists go in a POST body to stay clear of URL length limits
+export const getPropertiesByIds = async (ids, params = {}) => {
+  if (ids.length > 50) {
+    return api.post('properties/batch/', { ids }, { params });
+  }
+  return api.get('properties/batch/', { params: { ...params, ids: ids.join(',') } });
 };
 
 export const getPropertyById = async (id) => {
@@ -39,8 +84,43 @@ export const sendContactMessage = async (data) => {
   return api.post('contact-messages/', data);
 };
 
-export const getUserProperties = async (userId) => {
-  return api.get(`properties/?owner=${userId}`);
+export const getSavedSearches = async () => {
+  return api.get('saved-searches/');
+};
+
+export const createSavedSearch = async (data) => {
+  return api.post('saved-searches/', data);
+};
+
+export const deleteSavedSearch = async (id) => {
+  return api.delete(`saved-searches/${id}/`);
+};
+
+export const getSearchAlerts = async (params = {}) => {
+  return api.get('saved-searches/alerts/', { params });
+};
+
+// First page of one owner's listings; follow `next` with getPropertiesPage
+export const getUserProperties = async (userId, params = {}) => {
+  return api.get('properties/', { params: { owner: userId, ...params } });
+};
+
+export const getSuggestions = async (q, kind) => {
+  return api.get('autocomplete/', { params: { q, kind } });
+};
+
+export const getSimilarProperties = async (id, limit = 10) => {
+  return api.get(`properties/${id}/similar/`, { params: { limit } });
+};
+
+export const uploadPropertyImages = async (id, files) => {
+  const form = new FormData();
+  Array.from(files).forEach(file => form.append('images', file));
+  return api.post(`properties/${id}/images/`, form, { headers: { 'Content-Type': 'multipart/form-data' } });
+};
+
+export const getUserDashboard = async (userId) => {
+  return api.get(`users/${userId}/dashboard/`);
 };
 
 export default api; 
\ No newline at end of file